@@ -339,7 +339,7 @@ const MunicipalDashboard = ({ navigation }) => {
                     <View style={styles.imageThumbnailWrapper}>
                                              <Image
                          source={{
-                           uri: `${apiEndpoints?.BASE_URL || 'https://waste-segregation-production.up.railway.app'}/api/requests/${report._id || report.id}/image`
+                           uri: `${apiEndpoints?.BASE_URL || 'https://waste-segregation-production.up.railway.app'}/api/requests/${report._id || report.id}/image?variant=thumbnail`
                          }}
                          style={styles.imageThumbnail}
                          resizeMode="cover"
@@ -449,7 +449,7 @@ const MunicipalDashboard = ({ navigation }) => {
                   >
                                          <Image
                        source={{
-                         uri: `${apiEndpoints?.BASE_URL || 'https://waste-segregation-production.up.railway.app'}/api/requests/${selectedReport._id || selectedReport.id}/image`
+                         uri: `${apiEndpoints?.BASE_URL || 'https://waste-segregation-production.up.railway.app'}/api/requests/${selectedReport._id || selectedReport.id}/image?variant=medium`
                        }}
                        style={styles.modalImageContent}
                        resizeMode="cover"
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { SafeAreaView, StatusBar, StyleSheet, Text, TouchableOpacity, View, Image, Alert, ActivityIndicator, ScrollView, TextInput, PermissionsAndroid, Linking, NetInfo } from 'react-native';
 import Feather from 'react-native-vector-icons/Feather';
 import { launchCamera, launchImageLibrary } from 'react-native-image-picker';
@@ -17,6 +17,8 @@ const ReportGarbage = ({ navigation }) => {
   const [hasLocationPermission, setHasLocationPermission] = useState(false);
   const [hasCameraPermission, setHasCameraPermission] = useState(false);
   const [locationMethod, setLocationMethod] = useState(''); // GPS, Network, Cached, IP
+  // Sent with every attempt to submit the current report, so a retry never creates a duplicate
+  const submissionKey = useRef(null);
 
   useEffect(() => {
     requestLocationPermission();
@@ -666,6 +668,9 @@ const ReportGarbage = ({ navigation }) => {
     }
 
     setIsLoading(true);
+    if (!submissionKey.current) {
+      submissionKey.current = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
     try {
       const formData = new FormData();
       formData.append('image', {
@@ -700,6 +705,7 @@ const ReportGarbage = ({ navigation }) => {
         body: formData,
         headers: {
           'Content-Type': 'multipart/form-data',
+          'Idempotency-Key': submissionKey.current,
         },
       });
 
@@ -718,6 +724,7 @@ const ReportGarbage = ({ navigation }) => {
   };
 
   const resetForm = () => {
+    submissionKey.current = null;
     setSelectedImage(null);
     setDescription('');
     setLocation('');
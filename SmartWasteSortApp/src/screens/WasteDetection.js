@@ -121,6 +121,9 @@ const WasteDetection = ({ navigation }) => {
         // Use the results directly from the backend (they already have binDescription and tips)
         setDetectionResults(results);
         setShowResults(true);
+      } else if (data.retake) {
+        // The photo was too dark, blank or blurry to analyse
+        Alert.alert('Retake Photo', data.error);
       } else {
         throw new Error(data.error || 'Detection failed');
       }
@@ -0,0 +1,159 @@
+import functools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+# --- Admission Control for Gemini-Bound Endpoints ---
+# Detections that get a slot are served at normal latency; everything beyond what the
+# upstream can absorb is turned away at once instead of queueing behind Gemini.
+#
+# Global limits (shared by every guarded endpoint in this worker process):
+#   ADMISSION_MAX_IN_FLIGHT      requests allowed to run at once
+#   ADMISSION_MAX_QUEUE          requests allowed to wait for a slot
+#   ADMISSION_QUEUE_TIMEOUT_MS   longest a queued request waits before being shed
+# Per endpoint, where NAME is DETECT, MOBILE_DETECT or GEMINI_CLASSIFY:
+#   ADMISSION_<NAME>_RATE        sustained requests per minute per client
+#   ADMISSION_<NAME>_BURST       requests a client may make back to back
+#   ADMISSION_<NAME>_MAX_IN_FLIGHT  requests of this endpoint allowed to run at once
+MAX_TRACKED_CLIENTS = 10000
+
+
+def _env_number(name, default):
+    return float(os.getenv(name, str(default)))
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets, keeping only the most recently seen clients"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Spend one token, returning 0 if allowed or the seconds until a token is available"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class ConcurrencyLimiter:
+    """Bounded in-flight slots with a short, bounded wait queue"""
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def acquire(self):
+        """Take a slot, waiting at most queue_timeout; returns False if the request is shed"""
+        if self._slots.acquire(blocking=False):
+            self._started()
+            return True
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                return False
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if acquired:
+            self._started()
+        return acquired
+
+    def _started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+global_limiter = ConcurrencyLimiter(
+    max_in_flight=int(_env_number("ADMISSION_MAX_IN_FLIGHT", 64)),
+    max_queue=int(_env_number("ADMISSION_MAX_QUEUE", 32)),
+    queue_timeout=_env_number("ADMISSION_QUEUE_TIMEOUT_MS", 500) / 1000
+)
+
+
+def client_key():
+    """Identify the caller by its address as seen by the trusted proxy
+
+    remote_addr is set by ProxyFix (see TRUSTED_PROXY_HOPS in main.py). The first
+    X-Forwarded-For entry is never used: clients can put anything there.
+    """
+    return request.remote_addr or "unknown"
+
+
+def _retry_after_response(status, error, retry_after):
+    response = jsonify({"error": error, "retry_after": retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_control(name, rate_per_minute, burst, max_in_flight):
+    """Guard an endpoint with a per-client token bucket and in-flight limits
+
+    Clients over their rate get 429, and requests that cannot get a slot within the short
+    queue timeout get 503; both carry Retry-After. Defaults can be overridden per endpoint
+    through ADMISSION_<NAME>_* environment variables.
+    """
+    prefix = f"ADMISSION_{name.upper()}"
+    rate_limiter = TokenBucketLimiter(
+        _env_number(f"{prefix}_RATE", rate_per_minute),
+        _env_number(f"{prefix}_BURST", burst)
+    )
+    endpoint_limiter = ConcurrencyLimiter(
+        max_in_flight=int(_env_number(f"{prefix}_MAX_IN_FLIGHT", max_in_flight)),
+        max_queue=global_limiter.max_queue,
+        queue_timeout=global_limiter.queue_timeout
+    )
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            wait = rate_limiter.take(client_key())
+            if wait:
+                return _retry_after_response(429, "Too many requests, please slow down", math.ceil(wait))
+
+            if not endpoint_limiter.acquire():
+                return _retry_after_response(503, "Server is busy, please retry shortly", 1)
+            try:
+                if not global_limiter.acquire():
+                    return _retry_after_response(503, "Server is busy, please retry shortly", 1)
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    global_limiter.release()
+            finally:
+                endpoint_limiter.release()
+
+        return wrapper
+
+    return decorator
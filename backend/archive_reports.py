@@ -0,0 +1,36 @@
+"""Archive approved and rejected reports older than ARCHIVE_AFTER_DAYS
+
+Run from the backend folder, e.g. as a daily cron job:
+
+  python archive_reports.py
+  python archive_reports.py --older-than-days 180 --dry-run
+
+Reports move from the requests collection to requests_archive when MongoDB is reachable,
+and from reports.jsonl to reports-archive.jsonl.gz otherwise. The API still serves them
+with ?include_archived=true, and /api/requests/stats keeps counting them.
+"""
+import argparse
+import json
+import sys
+
+import main
+from report_archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count the reports that would be archived")
+    args = parser.parse_args()
+
+    # Connect once in this thread; without MongoDB the file fallback is archived instead
+    if not main.connect_mongodb():
+        print(f"MongoDB unavailable ({main.mongodb_state['last_error']}); archiving the file fallback", file=sys.stderr)
+    summary = main.archive_resolved_reports(args.older_than_days, args.batch_size, args.dry_run)
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,97 @@
+"""Compare JSON serialization throughput for report list responses
+
+Run from the backend folder:  python benchmarks/bench_json.py [--docs 10000] [--rounds 5]
+
+"legacy" is the old path: convert every document by hand, then Flask's default stdlib
+encoder. "stdlib" and "orjson" are FastJSONProvider serializing the raw documents.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_provider import FastJSONProvider
+
+
+def make_reports(count):
+    """Report documents shaped like the ones MongoDB returns (images projected out)"""
+    now = datetime.utcnow()
+    statuses = ["pending", "approved", "rejected"]
+    return [
+        {
+            "_id": ObjectId(),
+            "type": "Garbage Report",
+            "location": f"Ward {i % 40}, Market Road {i}",
+            "latitude": 12.9 + (i % 1000) / 10000,
+            "longitude": 77.5 + (i % 1000) / 10000,
+            "description": "Overflowing bin near the market, plastic bags spilling onto the road",
+            "submittedBy": "Mobile App User",
+            "image_filename": f"photo_{i}.jpg",
+            "status": statuses[i % 3],
+            "createdAt": now - timedelta(minutes=i),
+            "updatedAt": now - timedelta(minutes=i // 2),
+            "source": "mobile_app"
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_serialize(provider, reports):
+    requests_list = [dict(req) for req in reports]
+    for req in requests_list:
+        req["_id"] = str(req["_id"])
+        req["createdAt"] = req["createdAt"].isoformat()
+        req["updatedAt"] = req["updatedAt"].isoformat()
+    return provider.dumps({"requests": requests_list})
+
+
+def run(name, serialize, rounds, count):
+    best = None
+    size = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        size = len(serialize())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<8} {best * 1000:9.1f} ms  {count / best:12,.0f} docs/s  {size / 1e6:6.2f} MB")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    reports = make_reports(args.docs)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+
+    print(f"Serializing {args.docs:,} report documents (best of {args.rounds})")
+    legacy = run("legacy", lambda: legacy_serialize(default_provider, reports), args.rounds, args.docs)
+
+    orjson_module = json_provider.orjson
+    json_provider.orjson = None
+    try:
+        run("stdlib", lambda: fast_provider.dumps({"requests": reports}), args.rounds, args.docs)
+    finally:
+        json_provider.orjson = orjson_module
+
+    if orjson_module is None:
+        print("orjson   not installed (pip install orjson)")
+        return
+    fast = run("orjson", lambda: fast_provider.dumps({"requests": reports}), args.rounds, args.docs)
+    print(f"orjson is {legacy / fast:.1f}x faster than the legacy path")
+
+
+if __name__ == "__main__":
+    main()
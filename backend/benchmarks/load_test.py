@@ -0,0 +1,303 @@
+"""Offline load test of the backend against local Gemini/YouTube stand-ins
+
+Run from the backend folder:
+
+  python benchmarks/load_test.py --storage memory --label before
+  python benchmarks/load_test.py --storage memory --label after --compare benchmarks/results/before-memory.json
+
+The app is served over real HTTP from a scratch directory, with upstream calls going to
+stub_upstream.py. Storage is either "memory" (mongomock stands in for MongoDB, so reports
+go through the spool and MongoDB code paths) or "file" (no database: the JSONL report log
+and blob store). Each endpoint receives --requests requests from --concurrency clients.
+Throughput and p50/p95/p99 latency are printed and written to benchmarks/results/ as
+JSON, and --compare prints the change against an earlier run.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from stub_upstream import add_stub_arguments, start_stub_server, stub_config_from_args
+
+SCENARIOS = (
+    "mobile_detect", "gemini_classify", "youtube_suggestions", "report_garbage",
+    "list_requests", "stats", "dashboard", "image_thumbnail",
+)
+
+
+def make_test_image():
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        sys.exit("Pillow is required to generate the test image (pip install Pillow)")
+    # Shapes with hard edges, so the photo passes the blank/blurry quality checks
+    image = Image.new("RGB", (1600, 1200), (90, 140, 60))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, 1600, 200):
+        for y in range(0, 1200, 200):
+            draw.rectangle((x + 20, y + 20, x + 120, y + 160), fill=(230, 220, 200))
+            draw.ellipse((x + 110, y + 60, x + 190, y + 140), fill=(30, 40, 90))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+def configure_environment(args, workdir, gemini_base_url):
+    """Environment for main.py; must be set before it is imported"""
+    os.environ.update({
+        "GEMINI_API_KEY": "stub",
+        "YOUTUBE_API_KEY": "stub",
+        "GEMINI_API_BASE_URL": gemini_base_url,
+        "YOUTUBE_API_BASE_URL": f"{gemini_base_url}/youtube/v3",
+        "REPORT_SPOOL_DIR": os.path.join(workdir, "spool"),
+        "TIMING_LOG_MIN_MS": "1e12",
+        "MONGODB_URI": "mongodb://127.0.0.1:1/",
+        "MONGODB_SERVER_SELECTION_TIMEOUT_MS": "200",
+        "MONGODB_STARTUP_WAIT_MS": "1000",
+    })
+    if not args.admission:
+        for name in ("DETECT", "MOBILE_DETECT", "GEMINI_CLASSIFY"):
+            os.environ[f"ADMISSION_{name}_RATE"] = "0"
+
+
+def start_app(storage):
+    """Import the app and serve it from a background thread, returning its base URL"""
+    from werkzeug.serving import make_server
+
+    import main
+
+    if storage == "memory":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--storage memory needs mongomock (pip install mongomock)")
+        main.MongoClient = mongomock.MongoClient
+
+    # Keep the per-request access log out of the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return main, f"http://127.0.0.1:{server.server_port}"
+
+
+def seed_reports(base_url, image, count):
+    """Submit reports so list, stats and image endpoints have data; returns a report id"""
+    report_id = None
+    session = requests.Session()
+    for i in range(count):
+        response = session.post(
+            f"{base_url}/api/mobile/report-garbage",
+            data={"description": f"Overflowing bin {i}", "location": f"Ward {i % 40}"},
+            files={"image": ("photo.jpg", image, "image/jpeg")},
+        )
+        response.raise_for_status()
+        report_id = response.json()["report_id"]
+
+    # Spooled reports reach the database asynchronously
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if session.get(f"{base_url}/api/requests/stats").json().get("total", 0) >= count:
+            break
+        time.sleep(0.1)
+    return report_id
+
+
+def build_requests(base_url, image, report_id):
+    """Per-scenario callables taking a session and returning the response"""
+    detect_file = lambda: {"image": ("photo.jpg", image, "image/jpeg")}
+    return {
+        "mobile_detect": lambda s: s.post(f"{base_url}/api/mobile/detect", files=detect_file()),
+        "gemini_classify": lambda s: s.post(
+            f"{base_url}/api/gemini-classify",
+            json={"items": [{"name": "plastic bottle", "confidence": 90}, {"name": "old phone", "confidence": 70}]}),
+        "youtube_suggestions": lambda s: s.post(
+            f"{base_url}/api/youtube-suggestions", json={"items": ["plastic bottle", "cardboard box"]}),
+        "report_garbage": lambda s: s.post(
+            f"{base_url}/api/mobile/report-garbage",
+            data={"description": "Overflowing bin", "location": "Market Road"}, files=detect_file()),
+        "list_requests": lambda s: s.get(f"{base_url}/api/requests"),
+        "stats": lambda s: s.get(f"{base_url}/api/requests/stats"),
+        "dashboard": lambda s: s.get(f"{base_url}/api/mobile/dashboard"),
+        "image_thumbnail": lambda s: s.get(f"{base_url}/api/requests/{report_id}/image?variant=thumbnail"),
+    }
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(send, total, concurrency):
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def one(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            status = send(local.session).status_code
+        except requests.RequestException:
+            status = "error"
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            results.append((elapsed, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2") and status != "304")
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 2) if wall else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "error_rate": round(errors / total, 4) if total else 0,
+        "statuses": statuses,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{'endpoint':<22}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['throughput_rps']:>9}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+              f"{result['p99_ms']:>10}{result['error_rate']:>9.1%}")
+
+
+def compare(results, baseline_path, max_regression):
+    """Print changes against a previous run; returns the endpoints whose p95 regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressed = []
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'endpoint':<22}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+
+        def change(key):
+            if not previous.get(key) or result.get(key) is None:
+                return None
+            return (result[key] - previous[key]) / previous[key]
+
+        changes = [change(key) for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{name:<22}" + "".join(f"{c:>+10.1%}" if c is not None else f"{'-':>10}" for c in changes))
+        if max_regression is not None and changes[2] is not None and changes[2] > max_regression:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storage", choices=("memory", "file"), default="memory")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--seed-reports", type=int, default=200, help="reports created before measuring")
+    parser.add_argument("--admission", action="store_true", help="keep per-client rate limits (off by default)")
+    parser.add_argument("--label", default=None, help="results file name (default: git revision)")
+    parser.add_argument("--output", default=None, help="results path (default: benchmarks/results/<label>-<storage>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare with")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="exit with status 1 if any p95 grew by more than this fraction, e.g. 0.2")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # The app runs from a scratch directory, so resolve user paths first
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    stub_config = stub_config_from_args(args)
+    stub_server, stub_url = start_stub_server(stub_config)
+
+    workdir = tempfile.mkdtemp(prefix="waste-loadtest-")
+    configure_environment(args, workdir, stub_url)
+    os.chdir(workdir)
+    app_module, base_url = start_app(args.storage)
+
+    image = make_test_image()
+    print(f"Serving from {workdir} ({args.storage} storage), stub upstream at {stub_url}")
+    report_id = seed_reports(base_url, image, args.seed_reports)
+    senders = build_requests(base_url, image, report_id)
+
+    results = {}
+    for name in scenarios:
+        results[name] = run_scenario(senders[name], args.requests, args.concurrency)
+        print(f"  {name}: {results[name]['throughput_rps']} req/s, p95 {results[name]['p95_ms']} ms")
+    print()
+    print_results(results)
+
+    revision = git_revision()
+    label = args.label or revision or time.strftime("%Y%m%dT%H%M%S")
+    output = output or os.path.join(RESULTS_DIR, f"{label}-{args.storage}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "label": label,
+            "git_revision": revision,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "storage": args.storage,
+            "database_status": app_module.mongodb_state["status"],
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "upstream_calls": stub_config.calls,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    stub_server.shutdown()
+    if baseline:
+        regressed = compare(results, baseline, args.max_regression)
+        if regressed:
+            print(f"\np95 regressed by more than {args.max_regression:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
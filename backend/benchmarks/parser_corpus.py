@@ -0,0 +1,66 @@
+"""Run gemini_parser over the corpus of recorded Gemini outputs
+
+Run from the backend folder:
+
+  python benchmarks/parser_corpus.py
+  python benchmarks/parser_corpus.py --verbose
+
+Each line of fixtures/gemini_outputs.jsonl holds a generateContent response that one of
+the call sites has had to handle (fenced, prose-wrapped, truncated, blocked, ...) and the
+outcome and number of usable items expected from it. Exits non-zero on any mismatch, so
+add a line here whenever a new kind of malformed output turns up.
+"""
+import argparse
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(BACKEND_DIR, "benchmarks", "fixtures", "gemini_outputs.jsonl")
+sys.path.insert(0, BACKEND_DIR)
+
+from gemini_parser import (
+    CLASSIFICATION_SCHEMA, DETECTION_SCHEMA, candidate_text, parse_response, parse_short_answer, parse_tips,
+)
+
+SCHEMAS = {"detection": DETECTION_SCHEMA, "classification": CLASSIFICATION_SCHEMA}
+
+
+def run_case(case):
+    """(outcome, usable item count) for one corpus entry"""
+    if case["kind"] == "items":
+        parsed = parse_response(case["response"], schema=SCHEMAS[case["schema"]])
+        return parsed.outcome, len(parsed.items)
+    text, _, blocked = candidate_text(case["response"])
+    if case["kind"] == "tips":
+        tips = [] if blocked else parse_tips(text)
+        return None, len(tips)
+    answer = None if blocked else parse_short_answer(text)
+    return None, 1 if answer else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--verbose", action="store_true", help="print every case, not just mismatches")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    failures = recovered = 0
+    for case in cases:
+        outcome, count = run_case(case)
+        expect = case["expect"]
+        ok = count == expect["items"] and expect.get("outcome", outcome) == outcome
+        failures += not ok
+        recovered += outcome == "recovered"
+        if args.verbose or not ok:
+            print(f"{'ok  ' if ok else 'FAIL'} {case['name']:<36} outcome={outcome} items={count} expected={expect}")
+
+    print(f"{len(cases) - failures}/{len(cases)} cases as expected, {recovered} partially recovered")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Compare the full and compact Gemini prompts of each call site
+
+Run from the backend folder:
+
+  python benchmarks/prompt_compare.py                       # real Gemini (needs GEMINI_API_KEY)
+  python benchmarks/prompt_compare.py --images photos/      # detection photos for the vision site
+  python benchmarks/prompt_compare.py --stub --latency-ms 0 # offline, against stub_upstream.py
+
+Every case in fixtures/prompt_cases.json (and every photo for the vision site) is sent
+with both prompt modes. The report shows, per call site and mode, the mean prompt and
+output tokens from usageMetadata, p50/p95 latency and how many answers parsed into
+something usable, then the change compact makes. The stub's answers are canned, so
+offline runs only compare prompt tokens; latency and parse rates need the real API.
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES = os.path.join(BACKEND_DIR, "benchmarks", "fixtures", "prompt_cases.json")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from gemini_parser import (
+    CLASSIFICATION_SCHEMA, DETECTION_SCHEMA, candidate_text, parse_response, parse_short_answer, parse_tips, token_usage,
+)
+from gemini_prompts import (
+    CALL_SITES, PROMPT_MODES, classify_prompt, disposal_prompt, text_payload, tips_prompt, vision_payload,
+)
+from load_test import make_test_image, percentile
+from stub_upstream import add_stub_arguments, start_stub_server, stub_config_from_args
+
+IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+
+def load_images(directory):
+    """[(name, mime_type, base64 data)] of the photos in directory, or one generated test photo"""
+    if not directory:
+        return [("generated.jpg", "image/jpeg", base64.b64encode(make_test_image()).decode("ascii"))]
+    images = []
+    for name in sorted(os.listdir(directory)):
+        mime_type = IMAGE_TYPES.get(os.path.splitext(name)[1].lower())
+        if mime_type:
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append((name, mime_type, base64.b64encode(f.read()).decode("ascii")))
+    return images
+
+
+def usable(call_site, result):
+    """Whether the answer parses into something the call site can use, as the app parses it"""
+    if call_site == "vision":
+        parsed = parse_response(result, schema=DETECTION_SCHEMA)
+        return parsed.outcome in ("ok", "recovered") or parsed.value == []
+    if call_site == "classify":
+        return bool(parse_response(result, schema=CLASSIFICATION_SCHEMA).items)
+    text, _, blocked = candidate_text(result)
+    if blocked:
+        return False
+    if call_site == "tips":
+        return bool(parse_tips(text))
+    return bool(parse_short_answer(text))
+
+
+def build_payloads(call_site, mode, cases, images):
+    if call_site == "vision":
+        return [vision_payload(mode, mime_type, data) for _, mime_type, data in images]
+    build = {"disposal": disposal_prompt, "tips": tips_prompt, "classify": classify_prompt}[call_site]
+    return [text_payload(build(case, mode)) for case in cases[call_site]]
+
+
+def run(session, url, call_site, mode, payloads, repeat, timeout):
+    latencies, prompt_tokens, output_tokens = [], [], []
+    calls = parsed_ok = failed = 0
+    for _ in range(repeat):
+        for payload in payloads:
+            started = time.perf_counter()
+            try:
+                response = session.post(url, json=payload, timeout=timeout)
+            except requests.exceptions.RequestException:
+                failed += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                failed += 1
+                continue
+            result = response.json()
+            usage = token_usage(result)
+            calls += 1
+            parsed_ok += usable(call_site, result)
+            prompt_tokens.append(usage.get("prompt", 0))
+            output_tokens.append(usage.get("output", 0))
+
+    latencies.sort()
+    return {
+        "calls": calls,
+        "failed": failed,
+        "parse_success": round(parsed_ok / calls, 3) if calls else None,
+        "prompt_tokens": round(statistics.mean(prompt_tokens), 1) if prompt_tokens else None,
+        "output_tokens": round(statistics.mean(output_tokens), 1) if output_tokens else None,
+        "p50_ms": round(percentile(latencies, 0.50), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 1) if latencies else None,
+    }
+
+
+def change(full, compact, key):
+    if not full.get(key) or compact.get(key) is None:
+        return "n/a"
+    return f"{(compact[key] - full[key]) / full[key]:+.0%}"
+
+
+def print_results(results):
+    print(f"{'site':<10}{'mode':<9}{'calls':>6}{'parsed':>8}{'prompt tok':>12}{'output tok':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    for call_site, modes in results.items():
+        for mode, row in modes.items():
+            parsed = f"{row['parse_success']:.0%}" if row["parse_success"] is not None else "-"
+            print(f"{call_site:<10}{mode:<9}{row['calls']:>6}{parsed:>8}{row['prompt_tokens'] or '-':>12}"
+                  f"{row['output_tokens'] or '-':>12}{row['p50_ms'] or '-':>9}{row['p95_ms'] or '-':>9}")
+    print()
+    for call_site, modes in results.items():
+        full, compact = modes["full"], modes["compact"]
+        print(f"{call_site}: compact prompt tokens {change(full, compact, 'prompt_tokens')}, "
+              f"output tokens {change(full, compact, 'output_tokens')}, p50 {change(full, compact, 'p50_ms')}, "
+              f"parse success {full['parse_success']} -> {compact['parse_success']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", default=CASES)
+    parser.add_argument("--images", default=None, help="folder of detection photos (default: one generated photo)")
+    parser.add_argument("--sites", default=",".join(CALL_SITES), help="comma-separated subset of: " + ", ".join(CALL_SITES))
+    parser.add_argument("--repeat", type=int, default=1, help="times each case is sent per mode")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--stub", action="store_true", help="call stub_upstream.py instead of Gemini")
+    parser.add_argument("--output", default=None, help="also write the results as JSON here")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    sites = [site.strip() for site in args.sites.split(",") if site.strip()]
+    unknown = set(sites) - set(CALL_SITES)
+    if unknown:
+        parser.error(f"unknown sites: {', '.join(sorted(unknown))}")
+
+    if args.stub:
+        stub_server, base_url = start_stub_server(stub_config_from_args(args))
+        api_key = "stub"
+    else:
+        base_url = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            parser.error("GEMINI_API_KEY is not set (use --stub to run offline)")
+    url = f"{base_url}/v1/models/gemini-1.5-flash:generateContent?key={api_key}"
+
+    with open(args.cases) as f:
+        cases = json.load(f)
+    images = load_images(args.images) if "vision" in sites else []
+
+    session = requests.Session()
+    results = {}
+    for call_site in sites:
+        results[call_site] = {}
+        for mode in PROMPT_MODES:
+            payloads = build_payloads(call_site, mode, cases, images)
+            results[call_site][mode] = run(session, url, call_site, mode, payloads, args.repeat, args.timeout)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "stub": args.stub, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.stub:
+        stub_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Local stand-in for the Gemini and YouTube APIs, for load tests that must not spend quota
+
+Run from the backend folder:  python benchmarks/stub_upstream.py [--port 8765] [--latency-ms 800]
+
+Serves the three upstream calls the backend makes:
+
+  POST /v1/models/<model>:generateContent   Gemini (vision, enrichment and classification)
+  GET  /youtube/v3/search                   YouTube search
+  GET  /youtube/v3/videos                   YouTube video details
+
+Point the backend at it with GEMINI_API_BASE_URL=http://127.0.0.1:<port> and
+YOUTUBE_API_BASE_URL=http://127.0.0.1:<port>/youtube/v3. Latency is drawn from a normal
+distribution around --latency-ms; --rate-503, --rate-429 and --error-rate inject failures.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ITEMS = [
+    ("plastic bottle", "Blue recycling bin for plastics or plastic bottle bank", True),
+    ("banana peel", "Green waste bin for organic materials or compost bin", False),
+    ("aluminum can", "Metal recycling bin", True),
+    ("cardboard box", "Paper recycling bin or mixed paper collection", True),
+    ("battery", "Battery recycling collection point or hazardous waste facility", False),
+]
+
+
+class StubConfig:
+    """Latency and failure injection shared by every handler thread"""
+
+    def __init__(self, latency_ms=800, jitter_ms=200, vision_latency_ms=None, error_rate=0.0,
+                 rate_503=0.0, rate_429=0.0, items=3, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.vision_latency_ms = latency_ms * 2 if vision_latency_ms is None else vision_latency_ms
+        self.error_rate = error_rate
+        self.rate_503 = rate_503
+        self.rate_429 = rate_429
+        self.items = items
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def draw(self):
+        with self._lock:
+            return self._random.random(), self._random.gauss(0, 1)
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+
+# Gemini bills an image as a flat 258 tokens; text is estimated at 4 characters a token
+IMAGE_TOKENS = 258
+
+
+def _estimate_tokens(text):
+    return -(-len(text) // 4)
+
+
+def _gemini_text(text, prompt_tokens):
+    output_tokens = _estimate_tokens(text)
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens
+        }
+    }
+
+
+def _gemini_response(payload, config):
+    parts = payload["contents"][0]["parts"]
+    prompt = " ".join(part.get("text", "") for part in parts)
+    images = sum(1 for part in parts if "inline_data" in part or "inlineData" in part)
+    if images:
+        kind = "gemini_vision"
+        detections = [
+            {"name": name, "confidence": 85, "binDescription": bin_description,
+             "tips": ["Rinse before recycling", "Check local guidelines"],
+             "location": "center", "isReusable": reusable}
+            for name, bin_description, reusable in ITEMS[:config.items]
+        ]
+        text = "```json\n" + json.dumps(detections) + "\n```"
+    elif "Detected items:" in prompt:
+        kind = "gemini_classify"
+        match = re.search(r"Detected items: (\[.*?\])\s*\n", prompt, re.S)
+        items = json.loads(match.group(1)) if match else []
+        text = json.dumps([
+            {"name": item.get("name"), "confidence": item.get("confidence", 0),
+             "is_waste": True, "reasoning": "Stub classification"}
+            for item in items
+        ])
+    elif "eco tips" in prompt:
+        kind = "gemini_tips"
+        text = '["Rinse thoroughly before recycling", "Remove caps and labels"]'
+    else:
+        kind = "gemini_disposal"
+        text = "Blue recycling bin or local recycling facility"
+    return kind, _gemini_text(text, _estimate_tokens(prompt) + images * IMAGE_TOKENS)
+
+
+def _youtube_search():
+    return {"items": [{"id": {"videoId": f"stub{i:07d}"}} for i in range(5)]}
+
+
+def _youtube_videos(video_ids):
+    return {"items": [
+        {
+            "id": video_id,
+            "snippet": {
+                "title": f"DIY upcycling tutorial {video_id}",
+                "channelTitle": "Stub Crafts",
+                "thumbnails": {"medium": {"url": f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"}}
+            },
+            "contentDetails": {"duration": "PT8M30S"},
+            "statistics": {"viewCount": "123456"}
+        }
+        for video_id in video_ids
+    ]}
+
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _inject(self, kind, latency_ms):
+            """Sleep for the simulated latency, returning a failure status to send or None"""
+            config.count(kind)
+            roll, noise = config.draw()
+            time.sleep(max(0.0, latency_ms + noise * config.jitter_ms) / 1000)
+            if roll < config.rate_503:
+                return 503
+            if roll < config.rate_503 + config.rate_429:
+                return 429
+            if roll < config.rate_503 + config.rate_429 + config.error_rate:
+                return 500
+            return None
+
+        def do_POST(self):
+            if not self.path.split("?")[0].endswith(":generateContent"):
+                return self._send(404, {"error": {"code": 404, "message": "Not found"}})
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            kind, body = _gemini_response(payload, config)
+            latency = config.vision_latency_ms if kind == "gemini_vision" else config.latency_ms
+            failure = self._inject(kind, latency)
+            if failure:
+                return self._send(failure, {"error": {"code": failure, "message": "Injected failure"}})
+            self._send(200, body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.endswith("/search"):
+                kind, body = "youtube_search", _youtube_search()
+            elif url.path.endswith("/videos"):
+                video_ids = parse_qs(url.query).get("id", [""])[0].split(",")
+                kind, body = "youtube_videos", _youtube_videos([v for v in video_ids if v])
+            else:
+                return self._send(404, {"error": {"code": 404, "message": "Not found"}})
+            failure = self._inject(kind, config.latency_ms)
+            if failure:
+                return self._send(failure, {"error": {"code": failure, "message": "Injected failure"}})
+            self._send(200, body)
+
+    return StubHandler
+
+
+def start_stub_server(config, host="127.0.0.1", port=0):
+    """Start the stub in a daemon thread, returning (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-upstream", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_stub_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=800, help="mean enrichment/YouTube latency")
+    parser.add_argument("--vision-latency-ms", type=float, default=None, help="mean vision latency (default 2x)")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 500")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--items", type=int, default=3, help="detections per vision response (max 5)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def stub_config_from_args(args):
+    return StubConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, vision_latency_ms=args.vision_latency_ms,
+        error_rate=args.error_rate, rate_503=args.rate_503, rate_429=args.rate_429,
+        items=min(args.items, len(ITEMS)), seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(stub_config_from_args(args), args.host, args.port)
+    print(f"Stub upstream listening on {base_url}")
+    print(f"  GEMINI_API_BASE_URL={base_url}")
+    print(f"  YOUTUBE_API_BASE_URL={base_url}/youtube/v3")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import glob
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+
+# --- Content-Addressed Blob Store ---
+CHUNK_SIZE = 65536
+
+
+class BlobStore:
+    """Stores files by the SHA-256 of their content in a two-level sharded directory tree
+
+    uploads/blobs/ab/cd/abcd1234... - identical uploads share one file, names never collide,
+    and no directory grows beyond a few hundred entries per shard level.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        """Location of a blob on disk (whether or not it exists)"""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def variant_path(self, digest, variant):
+        """Location of a generated image variant, kept next to its blob and deleted with it"""
+        return f"{self.path(digest)}.{variant}.jpg"
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put_stream(self, stream):
+        """Stream data to disk while hashing it, returning (digest, size, created)
+
+        The data goes to a temporary file first and is renamed into place atomically, so
+        readers never see a partial blob. created is False when the content was already stored;
+        the existing blob's mtime is then bumped, so delete_if_untouched can tell it is in use.
+        """
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+            digest = hasher.hexdigest()
+            final_path = self.path(digest)
+            try:
+                os.utime(final_path)
+                os.remove(tmp_path)
+                return digest, size, False
+            except FileNotFoundError:
+                pass  # Not stored yet, or deleted meanwhile: store it
+
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+            return digest, size, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, data):
+        """Store an in-memory blob, returning (digest, size, created)"""
+        return self.put_stream(BytesIO(data))
+
+    def delete(self, digest):
+        """Remove a blob and its variants, returning False if the blob was not stored"""
+        for path in glob.glob(f"{glob.escape(self.path(digest))}.*"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        try:
+            os.remove(self.path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_if_untouched(self, digest, since):
+        """Delete a blob unless it was stored or reused at or after the timestamp since
+
+        For cleanup jobs that decided a blob is unreferenced: an upload of the same content
+        while the job ran may not have saved its report yet.
+        """
+        try:
+            if os.stat(self.path(digest)).st_mtime >= since:
+                return False
+        except FileNotFoundError:
+            return False
+        return self.delete(digest)
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get the in-process lock
+    fcntl = None
+
+# --- Detection History ---
+# Every successful detection is kept as one compact record per item: name, confidence,
+# reusable flag, a short image hash and optional coordinates with their region. Records
+# are queued in memory and written by a background thread in batches, so a detection
+# request never waits on storage. Each batch also adds to daily rollups keyed by
+# (day, region, item), and analytics are answered from those rollups alone.
+DETECTION_HISTORY = os.getenv("DETECTION_HISTORY", "on")
+DETECTION_QUEUE_SIZE = int(os.getenv("DETECTION_QUEUE_SIZE", "10000"))
+DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "200"))
+DETECTION_FLUSH_INTERVAL = float(os.getenv("DETECTION_FLUSH_INTERVAL", "2"))
+# Raw records expire after this many days; rollups are kept
+DETECTION_RETENTION_DAYS = int(os.getenv("DETECTION_RETENTION_DAYS", "180"))
+# Size cap of the file fallback; once reached, batches fail until MongoDB takes the log over
+DETECTION_LOG_MAX_BYTES = int(os.getenv("DETECTION_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+
+ANALYTICS_PERIODS = ("day", "week", "month")
+ITEM_NAME_MAX_LENGTH = 80
+
+
+def normalize_item(name):
+    """Lower-case, single-spaced item name, so "Plastic  Bottle" and "plastic bottle" count together"""
+    return " ".join(str(name).lower().split())[:ITEM_NAME_MAX_LENGTH]
+
+
+def image_hash(image_bytes):
+    """Short content hash; enough to spot repeat photos without keeping the image"""
+    return hashlib.sha256(image_bytes).hexdigest()[:16]
+
+
+def detection_records(detections, image_digest, latitude=None, longitude=None, region=None, at=None):
+    """One compact record per detected item"""
+    at = at or datetime.utcnow()
+    records = []
+    for item in detections:
+        name = normalize_item(item.get("name", ""))
+        if not name:
+            continue
+        record = {
+            "item": name,
+            "confidence": int(item.get("confidence") or 0),
+            "reusable": bool(item.get("isReusable")),
+            "image": image_digest,
+            "region": region,
+            "at": at,
+        }
+        if latitude is not None and longitude is not None:
+            # About 11 m: plenty for area statistics without pinpointing a home
+            record["lat"] = round(latitude, 4)
+            record["lng"] = round(longitude, 4)
+        records.append(record)
+    return records
+
+
+def rollup_key(record):
+    at = record["at"]
+    day = at[:10] if isinstance(at, str) else at.date().isoformat()
+    return day, record.get("region"), record["item"]
+
+
+def rollup(records):
+    """{(day, region, item): [count, reusable, confidence_sum]} for a batch of records"""
+    totals = {}
+    for record in records:
+        counts = totals.setdefault(rollup_key(record), [0, 0, 0])
+        counts[0] += 1
+        counts[1] += int(bool(record.get("reusable")))
+        counts[2] += record.get("confidence") or 0
+    return totals
+
+
+def period_of(day, period):
+    """The day, ISO week (2024-W05) or month (2024-01) an ISO date falls in"""
+    if period == "day":
+        return day
+    if period == "month":
+        return day[:7]
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def summarize(rows, period="day", limit=10):
+    """Top items and per-period counts from rollup rows (day, item, count, reusable, confidence_sum)"""
+    items = {}
+    periods = {}
+    total = 0
+    for day, item, count, reusable, confidence_sum in rows:
+        totals = items.setdefault(item, [0, 0, 0])
+        totals[0] += count
+        totals[1] += reusable
+        totals[2] += confidence_sum
+        key = period_of(day, period)
+        periods[key] = periods.get(key, 0) + count
+        total += count
+
+    top = sorted(items.items(), key=lambda entry: (-entry[1][0], entry[0]))[:limit]
+    return {
+        "total": total,
+        "top_items": [
+            {
+                "item": item,
+                "count": count,
+                "share": round(count / total, 4),
+                "reusable": reusable,
+                "avg_confidence": round(confidence_sum / count, 1),
+            }
+            for item, (count, reusable, confidence_sum) in top
+        ],
+        "periods": [{"period": key, "count": periods[key]} for key in sorted(periods)],
+    }
+
+
+class DetectionRecorder:
+    """Bounded queue of detection records, written by a background thread in batches
+
+    record() never blocks: when the queue is full (storage down or too slow) records
+    are dropped and counted. The thread is started on first use and again after a fork.
+    """
+
+    def __init__(self, sink, batch_size=DETECTION_BATCH_SIZE, flush_interval=DETECTION_FLUSH_INTERVAL,
+                 max_queued=DETECTION_QUEUE_SIZE):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def record(self, records):
+        self._ensure_thread()
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                metrics.detection_history_records_total.inc("dropped")
+
+    def _ensure_thread(self):
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid != os.getpid():
+                threading.Thread(target=self._run, name="detection-history", daemon=True).start()
+                self._thread_pid = os.getpid()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.sink(batch)
+                metrics.detection_history_records_total.inc("written", amount=len(batch))
+            except Exception:
+                # Analytics are best effort: a failed batch is counted, not retried
+                metrics.detection_history_records_total.inc("failed", amount=len(batch))
+
+    def pending(self):
+        return self._queue.qsize()
+
+
+class DetectionLogFull(Exception):
+    """The detection log has reached its size cap"""
+
+
+class DetectionLog:
+    """JSONL detection history (file storage fallback) with in-memory daily rollups
+
+    Each process keeps the rollups of everything it has read and catches up with batches
+    appended by other processes from the last offset it has seen, so a query only reads
+    the lines written since the previous one. The file is capped at max_bytes and is
+    emptied by drain() once MongoDB can hold the history.
+    """
+
+    def __init__(self, path, max_bytes=DETECTION_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._rollups = {}
+        self._end = 0
+        self._inode = None
+
+    def _refresh(self):
+        if not os.path.exists(self.path):
+            self._rollups, self._end, self._inode = {}, 0, None
+            return
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            self._rollups, self._end, self._inode = {}, 0, stat.st_ino
+        if stat.st_size == self._end:
+            return
+
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(self._end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A batch still being written
+                    break
+                self._end += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        self._add(rollup(records))
+
+    def _add(self, totals):
+        for key, (count, reusable, confidence_sum) in totals.items():
+            counts = self._rollups.setdefault(key, [0, 0, 0])
+            counts[0] += count
+            counts[1] += reusable
+            counts[2] += confidence_sum
+
+    def append(self, records):
+        """Append a batch in one write; rollups pick it up on the next refresh"""
+        data = b"".join(
+            (json.dumps(
+                {**record, "at": record["at"].isoformat()} if isinstance(record["at"], datetime) else record,
+                separators=(",", ":")
+            ) + "\n").encode("utf-8")
+            for record in records
+        )
+        with self._lock, open(self.path, "ab") as f:
+            # History is best effort, so the batch is not fsynced; the lock keeps
+            # batches from different workers from interleaving
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_size + len(data) > self.max_bytes:
+                raise DetectionLogFull(f"{self.path} has reached {self.max_bytes} bytes")
+            f.write(data)
+            f.flush()
+
+    def drain(self, handler, batch_size):
+        """Pass every logged record to handler in batches, then empty the log
+
+        Used to move the history into MongoDB once it is reachable. If handler raises,
+        the records it has not taken stay in the log and the exception propagates.
+        Returns the number of records handled.
+        """
+        handled = 0
+        with self._lock:
+            try:
+                f = open(self.path, "r+b")
+            except FileNotFoundError:
+                return 0
+            with f:
+                # Appends wait until the log has been emptied
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                done = end = 0
+                batch = []
+                try:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        end += len(line)
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if isinstance(record.get("at"), str):
+                            record["at"] = datetime.fromisoformat(record["at"])
+                        batch.append(record)
+                        if len(batch) >= batch_size:
+                            handler(batch)
+                            handled += len(batch)
+                            batch, done = [], end
+                    if batch:
+                        handler(batch)
+                        handled += len(batch)
+                    done = end
+                finally:
+                    # Keep only what handler has not taken
+                    f.seek(done)
+                    rest = f.read()
+                    f.seek(0)
+                    f.write(rest)
+                    f.truncate()
+                    f.flush()
+        return handled
+
+    def rollup_rows(self, since, until, region=None):
+        """(day, item, count, reusable, confidence_sum) rows for days in [since, until]"""
+        with self._lock:
+            self._refresh()
+            return [
+                (day, item, *counts)
+                for (day, row_region, item), counts in self._rollups.items()
+                if since <= day <= until and (region is None or row_region == region)
+            ]
+
+
+def default_window(days=30):
+    """(since, until) ISO dates covering the last days days, today included"""
+    today = datetime.utcnow().date()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
@@ -0,0 +1,247 @@
+import itertools
+import json
+import os
+import queue
+import threading
+import uuid
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get the in-process lock
+    fcntl = None
+
+# --- Server-Sent Events Bus ---
+# Number of recent events kept so reconnecting clients can catch up via Last-Event-ID
+EVENT_HISTORY_SIZE = 1000
+# Events buffered per client before a slow client is told to reload
+SUBSCRIBER_QUEUE_SIZE = 256
+# With EVENT_JOURNAL set (gunicorn.conf.py does) events are appended to that file and every
+# worker tails it, so a dashboard sees reports submitted through any worker and can resume
+# on any worker: event ids are positions in the journal. It starts over past this size.
+EVENT_JOURNAL = os.getenv("EVENT_JOURNAL")
+EVENT_JOURNAL_MAX_BYTES = int(os.getenv("EVENT_JOURNAL_MAX_BYTES", str(4 * 1024 * 1024)))
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.25"))
+
+
+class Subscription:
+    """A single client's queue of pending events"""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def get(self, timeout):
+        """Next event, or None if the client fell too far behind; raises queue.Empty on timeout"""
+        if self.overflowed:
+            return None
+        return self.queue.get(timeout=timeout)
+
+
+class EventJournal:
+    """Append-only JSONL file of events shared by all worker processes
+
+    The first line names the journal's generation; an event's id is the generation and
+    the offset just past its line, so any worker can resume a client from it. A full
+    journal is replaced by an empty one with a new generation.
+    """
+
+    def __init__(self, path, max_bytes=EVENT_JOURNAL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def _create(self, replace=False):
+        """Atomically put an empty journal of a new generation in place
+
+        Without replace, a journal another process created first is kept.
+        """
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write((json.dumps({"generation": uuid.uuid4().hex[:8]}) + "\n").encode("utf-8"))
+        if replace:
+            os.replace(temporary, self.path)
+            return
+        try:
+            os.link(temporary, self.path)
+        except FileExistsError:
+            pass
+        os.remove(temporary)
+
+    def append(self, event_type, data):
+        line = (json.dumps({"type": event_type, "data": data}, default=str) + "\n").encode("utf-8")
+        while True:
+            if not os.path.exists(self.path):
+                self._create()
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino:
+                        continue  # Replaced while waiting for the lock
+                except FileNotFoundError:
+                    continue
+                if os.fstat(f.fileno()).st_size + len(line) > self.max_bytes:
+                    self._create(replace=True)
+                    continue
+                f.write(line)
+                f.flush()
+                return
+
+    def read(self, generation=None, offset=None):
+        """(generation, events, end) for the events after offset
+
+        Starts at the end of the journal when offset is None, and reads the whole journal
+        when generation is not the current one (it was replaced). events are
+        (event_id, event_type, data) tuples.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            # Nothing published yet: everything in the journal once it exists is new
+            return None, [], 0
+        with f:
+            header = f.readline()
+            try:
+                current = json.loads(header)["generation"]
+            except (ValueError, KeyError, TypeError):
+                return generation, [], offset  # Being created
+            if offset is None:
+                f.seek(0, os.SEEK_END)
+                return current, [], f.tell()
+            if current != generation:
+                offset = len(header)
+            f.seek(offset)
+            events = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # An event still being written
+                offset += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                events.append((f"{current}-{offset}", event.get("type"), event.get("data")))
+            return current, events, offset
+
+
+class EventBus:
+    """Publish/subscribe bus that remembers recent events for resuming clients
+
+    In-process by default. With a journal, published events go through the shared file and
+    a tailer thread delivers them, to this worker's subscribers as to every other worker's.
+    Events given an explicit id (the change stream's) are always delivered in-process.
+    """
+
+    def __init__(self, history_size=EVENT_HISTORY_SIZE, journal=None, poll_interval=EVENT_POLL_INTERVAL):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        # Ids are prefixed per process so a restarted server never matches a stale Last-Event-ID
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._counter = itertools.count(1)
+        self.journal = journal
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._tailer_pid = None
+        self._generation = None
+        self._offset = None
+
+    @property
+    def shared(self):
+        """Whether other workers' subscribers receive what this worker publishes"""
+        return self.journal is not None
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event_type, data, event_id=None):
+        """Deliver an event to every subscriber and record it in the history"""
+        if self.journal is not None and event_id is None:
+            self.journal.append(event_type, data)
+            self._wake.set()
+            return None
+        with self._lock:
+            if event_id is None:
+                event_id = f"{self._boot_id}-{next(self._counter)}"
+            event = (event_id, event_type, data)
+            self._history.append(event)
+        self._deliver([event])
+        return event_id
+
+    def _deliver(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    subscription.overflowed = True
+
+    def _ensure_tailer(self):
+        # Called with the lock held; started once per process (again after a fork)
+        if self._tailer_pid == os.getpid():
+            return
+        self._generation, _, self._offset = self.journal.read()
+        self._tailer_pid = os.getpid()
+        threading.Thread(target=self._tail, name="event-journal-tailer", daemon=True).start()
+
+    def _tail(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                with self._lock:
+                    self._generation, events, self._offset = self.journal.read(self._generation, self._offset)
+            except OSError:
+                continue
+            if events:
+                self._deliver(events)
+
+    def _journal_backlog(self, last_event_id):
+        """Journal events after last_event_id up to what the tailer has delivered, or None"""
+        generation, _, offset = last_event_id.rpartition("-")
+        if self._offset is None or generation != self._generation or not offset.isdigit() or int(offset) > self._offset:
+            return None
+        _, events, _ = self.journal.read(generation, int(offset))
+        # Later events reach the subscriber through the tailer
+        return [event for event in events if int(event[0].rpartition("-")[2]) <= self._offset]
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber, returning (subscription, backlog, resumed)
+
+        The backlog holds the events published after last_event_id. resumed is False when
+        last_event_id is no longer in the history and the client needs a full reload.
+        """
+        subscription = Subscription()
+        with self._lock:
+            if self.journal is not None:
+                self._ensure_tailer()
+            backlog = []
+            resumed = True
+            if last_event_id:
+                history = list(self._history)
+                ids = [event[0] for event in history]
+                journal_backlog = self._journal_backlog(last_event_id) if self.journal is not None else None
+                if last_event_id in ids:
+                    backlog = history[ids.index(last_event_id) + 1:]
+                elif journal_backlog is not None:
+                    backlog = journal_backlog
+                else:
+                    resumed = False
+            self._subscribers.add(subscription)
+        return subscription, backlog, resumed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+def format_sse(event_id, event_type, data):
+    """Encode an event in the text/event-stream wire format"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
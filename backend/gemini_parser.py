@@ -0,0 +1,285 @@
+import json
+import math
+import re
+
+# --- Gemini Response Parsing ---
+# One parser for every Gemini call site. Model output is often almost JSON: wrapped in
+# ```json fences, preceded by a sentence of prose, left with trailing commas, or cut off
+# by the token limit in the middle of the last item. Everything that can be recovered is
+# recovered, because each usable item is one fewer retry or fallback.
+
+# finishReason values that mean the candidate carries no usable answer
+BLOCKED_FINISH_REASONS = {"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII"}
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.S)
+_CLOSING = re.compile(r"\s*[\]}]")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_decoder = json.JSONDecoder()
+
+
+class ParsedResponse:
+    """Outcome of parsing one Gemini response
+
+    text            the candidate text ("" if there was none)
+    finish_reason   Gemini's finishReason, if given
+    blocked         no candidate, or one withheld for safety/recitation
+    value           the decoded JSON value, or None if nothing could be decoded
+    truncated       value is an array recovered from output that was cut off
+    items           the items of value that satisfy the schema (all of them without one)
+    """
+
+    __slots__ = ("text", "finish_reason", "blocked", "value", "truncated", "items")
+
+    def __init__(self, text="", finish_reason=None, blocked=False, value=None, truncated=False, items=None):
+        self.text = text
+        self.finish_reason = finish_reason
+        self.blocked = blocked
+        self.value = value
+        self.truncated = truncated
+        self.items = items or []
+
+    @property
+    def outcome(self):
+        """One of blocked, invalid (no usable items), recovered (items lost or repaired) or ok"""
+        if self.blocked:
+            return "blocked"
+        if not self.items and self.value != []:
+            return "invalid"
+        if self.truncated or len(self.items) < len(self.value):
+            return "recovered"
+        return "ok"
+
+
+def candidate_text(result):
+    """(text, finish_reason, blocked) of the first candidate in a generateContent response"""
+    candidates = (result or {}).get("candidates") or []
+    if not candidates:
+        return "", None, True
+    candidate = candidates[0] or {}
+    finish_reason = candidate.get("finishReason")
+    parts = (candidate.get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts if isinstance(part, dict))
+    blocked = finish_reason in BLOCKED_FINISH_REASONS and not text.strip()
+    return text, finish_reason, blocked
+
+
+# usageMetadata fields, by the name they are counted under
+USAGE_FIELDS = {
+    "promptTokenCount": "prompt",
+    "cachedContentTokenCount": "cached",
+    "candidatesTokenCount": "output",
+    "thoughtsTokenCount": "thoughts",
+    "totalTokenCount": "total",
+}
+
+
+def token_usage(result):
+    """{prompt, cached, output, thoughts, total: token count} from a response's usageMetadata
+
+    Fields Gemini left out (cached and thoughts usually are) are left out here too.
+    """
+    usage = (result or {}).get("usageMetadata") or {}
+    counts = {}
+    for field, kind in USAGE_FIELDS.items():
+        value = usage.get(field)
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            counts[kind] = value
+    return counts
+
+
+def strip_fences(text):
+    """Contents of the first ``` fenced block, or the text itself if there is none"""
+    match = _FENCE.search(text)
+    return match.group(1) if match else text
+
+
+def _remove_trailing_commas(text):
+    # String-aware, so commas inside values are left alone
+    out = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "," and _CLOSING.match(text, index + 1):
+            continue
+        out.append(char)
+    return "".join(out)
+
+
+def _recover_array_items(text, start):
+    """Decode the complete leading elements of an array that was cut off"""
+    items = []
+    index = start + 1
+    while True:
+        while index < len(text) and text[index] in " \t\r\n,":
+            index += 1
+        if index >= len(text) or text[index] == "]":
+            return items
+        try:
+            item, index = _decoder.raw_decode(text, index)
+        except ValueError:
+            return items
+        items.append(item)
+
+
+def decode_json(text, expect=list):
+    """Decode the JSON value in model output, returning (value, truncated)
+
+    expect is list or dict: the first "[" or "{" starts the value, so leading and
+    trailing prose is ignored. When a list is expected, a lone object is returned as a
+    one-item list. Returns (None, False) when nothing can be decoded.
+    """
+    body = _remove_trailing_commas(strip_fences(text))
+    array_start, object_start = body.find("["), body.find("{")
+    if expect is list and array_start != -1 and (object_start == -1 or array_start < object_start):
+        start = array_start
+    elif object_start != -1:
+        start = object_start
+    else:
+        return None, False
+
+    try:
+        value, _ = _decoder.raw_decode(body, start)
+    except ValueError:
+        value = None
+    if isinstance(value, expect):
+        return value, False
+    if expect is list and isinstance(value, dict):
+        return [value], False
+
+    if expect is list and start == array_start:
+        items = _recover_array_items(body, start)
+        if items:
+            return items, True
+    return None, False
+
+
+def parse_response(result, expect=list, schema=None):
+    """Parse a generateContent response whose answer is a JSON array (or object)
+
+    With a schema, the array's items are validated into ParsedResponse.items.
+    """
+    text, finish_reason, blocked = candidate_text(result)
+    if blocked:
+        return ParsedResponse(text, finish_reason, blocked=True)
+    value, truncated = decode_json(text, expect)
+    if isinstance(value, list):
+        items = validate_items(value, schema) if schema else value
+    else:
+        items = []
+    return ParsedResponse(text, finish_reason, value=value, truncated=truncated, items=items)
+
+
+# --- Schema Validation ---
+# field -> (type, required); numbers and booleans given as strings are coerced
+DETECTION_SCHEMA = {
+    "name": (str, True),
+    "confidence": (float, False),
+    "binDescription": (str, False),
+    "tips": (list, False),
+    "location": (str, False),
+    "isReusable": (bool, False),
+}
+
+# Items sent to /api/gemini-classify by the app
+DETECTED_ITEM_SCHEMA = {
+    "name": (str, True),
+    "confidence": (float, False),
+}
+
+CLASSIFICATION_SCHEMA = {
+    "name": (str, True),
+    "confidence": (float, False),
+    "is_waste": (bool, True),
+    "reasoning": (str, False),
+}
+
+
+def _coerce(value, kind):
+    """Convert value to kind, or raise ValueError"""
+    if kind is str:
+        if isinstance(value, (dict, list)) or value is None:
+            raise ValueError(value)
+        value = str(value).strip()
+        if not value:
+            raise ValueError(value)
+        return value
+    if kind is float:
+        if isinstance(value, bool):
+            raise ValueError(value)
+        if isinstance(value, str):
+            value = value.strip().rstrip("%")
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(value)
+        return int(number) if number.is_integer() else number
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "yes"):
+            return True
+        if isinstance(value, str) and value.strip().lower() in ("false", "no"):
+            return False
+        raise ValueError(value)
+    if kind is list:
+        if isinstance(value, str):
+            return [value]
+        if not isinstance(value, list):
+            raise ValueError(value)
+        return [str(entry).strip() for entry in value if str(entry).strip()]
+    raise ValueError(kind)
+
+
+def validate_items(items, schema):
+    """Keep the items that satisfy schema, coercing field types
+
+    Items missing a required field are dropped; optional fields of the wrong type are
+    removed from the item. Unknown fields are kept as they are.
+    """
+    valid = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        cleaned = dict(item)
+        for field, (kind, required) in schema.items():
+            if field not in cleaned:
+                if required:
+                    break
+                continue
+            try:
+                cleaned[field] = _coerce(cleaned[field], kind)
+            except (TypeError, ValueError):
+                if required:
+                    break
+                del cleaned[field]
+        else:
+            valid.append(cleaned)
+    return valid
+
+
+# --- Plain-Text Answers ---
+def parse_tips(text, limit=3):
+    """Tips from a JSON array of strings, or from one tip per line"""
+    value, _ = decode_json(text, list)
+    if value:
+        tips = [str(tip).strip() for tip in value if isinstance(tip, (str, int, float)) and str(tip).strip()]
+    else:
+        lines = strip_fences(text).splitlines()
+        tips = [_BULLET.sub("", line).strip().strip('"').strip() for line in lines]
+        # Fence lines and headings such as "Here are some tips:" are not tips
+        tips = [tip for tip in tips if tip and not tip.startswith("```") and not tip.endswith(":")]
+    return tips[:limit]
+
+
+def parse_short_answer(text, max_length=300):
+    """A short free-text answer without fences, bullets or quotes, or None if empty"""
+    lines = [_BULLET.sub("", line).strip().strip('"').strip() for line in strip_fences(text).splitlines()]
+    answer = " ".join(line for line in lines if line and not line.startswith("```"))
+    return answer[:max_length] or None
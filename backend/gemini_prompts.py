@@ -0,0 +1,186 @@
+import json
+import os
+
+# --- Gemini Prompts ---
+# Each call site has two prompt modes. "full" is the original wording with its worked
+# examples. "compact" asks for the same output with a short instruction set and compact
+# JSON. All of a compact prompt's fixed text is a prefix built once at import, so every
+# call to a site starts with identical text (Gemini's implicit context caching can reuse
+# it) and only the short item-specific tail differs. GEMINI_PROMPT_MODE picks the mode
+# for every site; GEMINI_PROMPT_MODE_<SITE> overrides it for one (VISION, DISPOSAL, TIPS
+# or CLASSIFY).
+PROMPT_MODES = ("full", "compact")
+CALL_SITES = ("vision", "disposal", "tips", "classify")
+GEMINI_PROMPT_MODE = os.getenv("GEMINI_PROMPT_MODE", "full")
+
+
+def _configured_mode(call_site):
+    mode = os.getenv(f"GEMINI_PROMPT_MODE_{call_site.upper()}", GEMINI_PROMPT_MODE).lower()
+    # Anything unrecognised keeps the original prompts
+    return mode if mode in PROMPT_MODES else "full"
+
+
+PROMPT_MODE_BY_SITE = {call_site: _configured_mode(call_site) for call_site in CALL_SITES}
+
+
+def prompt_mode(call_site):
+    """The configured prompt mode of a call site"""
+    return PROMPT_MODE_BY_SITE[call_site]
+
+
+# --- Detection (vision) ---
+VISION_PROMPT_FULL = (
+    "Analyze this image and identify ALL visible waste items. "
+    "For each waste item you can see, identify the item, estimate your confidence (0-100), "
+    "provide its specific disposal method (be detailed and specific), 2-3 helpful disposal tips, describe its location in the image, "
+    "and determine if it's reusable for crafting (true/false). "
+    "Respond with ONLY a valid JSON array containing ALL waste items visible in the image (up to 5 items maximum). "
+    "Each item should have: name, confidence (number), binDescription, tips (array), location (string), and isReusable (boolean). "
+    "IMPORTANT: For binDescription, you MUST be very specific and detailed. DO NOT use generic terms like 'Recycling Bin'. Instead use specific descriptions like: "
+    "- For medicine/pills: 'Household Hazardous Waste or designated pharmaceutical waste disposal' "
+    "- For plastic bottles: 'Blue recycling bin for plastics or plastic bottle bank' "
+    "- For electronics: 'Special electronics recycling facility or e-waste collection point' "
+    "- For glass: 'Glass recycling bin or bottle bank for glass containers' "
+    "- For batteries: 'Battery recycling collection point or hazardous waste facility' "
+    "- For paper: 'Paper recycling bin or mixed paper collection' "
+    "- For organic waste: 'Green waste bin for organic materials or compost bin' "
+    "Example format: [{\"name\": \"Medicine blister pack\", \"confidence\": 90, \"binDescription\": \"Household Hazardous Waste or designated pharmaceutical waste disposal\", \"tips\": [\"Do not flush medication down the toilet\", \"Check with your local pharmacy for proper disposal\"], \"location\": \"center\", \"isReusable\": false}]. "
+    "Include location descriptions like 'top left', 'center', 'bottom right', etc."
+)
+
+# binDescription and tips are always replaced by the enrichment calls, so the compact
+# prompt does not spend output tokens on them
+VISION_PROMPT_COMPACT = (
+    "List every visible waste item (at most 5). Reply with only a JSON array of "
+    '{"name":str,"confidence":0-100,"location":str,"isReusable":bool}, '
+    "where location is e.g. top left, center or bottom right and isReusable means usable for crafts. "
+    "Reply [] if there is no waste."
+)
+
+
+def vision_payload(mode, mime_type, base64_image):
+    """generateContent body for a detection photo"""
+    prompt = VISION_PROMPT_COMPACT if mode == "compact" else VISION_PROMPT_FULL
+    return {
+        "contents": [
+            {
+                "parts": [
+                    {"text": prompt},
+                    {
+                        "inline_data": {
+                            "mime_type": mime_type,
+                            "data": base64_image
+                        }
+                    }
+                ]
+            }
+        ],
+        "generationConfig": {
+            "temperature": 0.1,
+            "topK": 1,
+            "topP": 1,
+            "maxOutputTokens": 2048
+        }
+    }
+
+
+def text_payload(prompt):
+    """generateContent body for a text-only prompt"""
+    return {
+        "contents": [{
+            "parts": [{"text": prompt}]
+        }]
+    }
+
+
+# --- Enrichment ---
+_DISPOSAL_PREFIX = (
+    "Waste disposal expert. Give the specific disposal method for the item below in one short line, "
+    "naming the stream (e.g. Blue recycling bin, Green waste/compost, Battery collection point, "
+    "E-waste facility, Household Hazardous Waste). Reply with only the method.\nItem: "
+)
+
+_TIPS_PREFIX = (
+    "Environmental expert. Give 2-3 short eco tips (one line each) for disposing of the item below. "
+    'Reply with only a JSON array like ["tip 1","tip 2"].\nItem: '
+)
+
+
+def disposal_prompt(item_name, mode):
+    if mode == "compact":
+        return _DISPOSAL_PREFIX + item_name
+    return f"""
+        You are a waste management expert. For the specific waste item "{item_name}", provide a SHORT disposal method (1-2 lines maximum).
+
+        CRITICAL: Keep it concise and specific to this exact item.
+
+        EXAMPLES BY ITEM TYPE:
+        - For "banana peel": "Green waste bin or home composting system"
+        - For "plastic bottle": "Blue recycling bin or plastic bottle bank"
+        - For "medicine": "Household Hazardous Waste facility"
+        - For "battery": "Battery recycling collection point"
+        - For "glass bottle": "Glass recycling bin or bottle bank"
+        - For "paper": "Paper recycling bin"
+        - For "electronics": "E-waste recycling facility"
+        - For "food waste": "Green waste bin or composting"
+        - For "aluminum can": "Metal recycling bin"
+        - For "cardboard": "Paper recycling bin"
+
+        For "{item_name}", provide a SHORT disposal method (1-2 lines only).
+        Respond with ONLY the disposal method, nothing else.
+        """
+
+
+def tips_prompt(item_name, mode):
+    if mode == "compact":
+        return _TIPS_PREFIX + item_name
+    return f"""
+        You are an environmental expert. For the specific waste item "{item_name}", provide 2-3 SHORT eco tips (1 line each).
+
+        CRITICAL: Keep tips concise and specific to this exact item.
+
+        EXAMPLES BY ITEM TYPE:
+        - For "banana peel": ["Use as natural fertilizer for plants", "Add to compost bin for organic waste"]
+        - For "plastic bottle": ["Rinse thoroughly before recycling", "Remove cap and recycle separately"]
+        - For "medicine": ["Do not flush down toilet", "Check pharmacy for disposal programs"]
+        - For "battery": ["Never throw in regular trash", "Use battery recycling points"]
+        - For "glass bottle": ["Rinse before recycling", "Remove labels and caps"]
+        - For "paper": ["Keep clean and dry", "Remove plastic attachments"]
+        - For "electronics": ["Donate if working", "Use e-waste facilities"]
+
+        For "{item_name}", provide 2-3 SHORT eco tips (1 line each).
+        Respond with ONLY a JSON array like: ["tip 1", "tip 2"]
+        """
+
+
+# --- Classification ---
+_CLASSIFY_PREFIX = (
+    "Classify each detected object as waste (disposable, broken, empty, food scraps) or a useful "
+    "object (phones, laptops, books, furniture, clothing, tools). Reply with only a JSON array of "
+    '{"name":str,"confidence":number,"is_waste":bool,"reasoning":str}, keeping each name and '
+    "confidence, with a few words of reasoning.\nDetected items: "
+)
+
+
+def classify_prompt(items, mode):
+    if mode == "compact":
+        # Only the fields the answer echoes back, without whitespace
+        compact_items = [{"name": item.get("name"), "confidence": item.get("confidence")} for item in items]
+        return _CLASSIFY_PREFIX + json.dumps(compact_items, separators=(",", ":")) + "\n"
+    return f"""
+        You are a waste classification expert. Analyze the following detected objects and determine if they are actual waste (items that should be disposed of or recycled) or useful objects (items that are still functional and valuable).
+
+        Detected items: {json.dumps(items, indent=2)}
+
+        For each item, respond with a JSON object containing:
+        - name: the item name
+        - confidence: the original confidence score
+        - is_waste: true if it's actual waste, false if it's a useful object
+        - reasoning: brief explanation of your classification
+
+        Consider:
+        - Waste: bottles, cans, wrappers, broken items, expired food, disposable items
+        - Useful objects: phones, laptops, books, furniture, clothing, tools, electronics
+
+        Return only the JSON array of classified items.
+        """
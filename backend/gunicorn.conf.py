@@ -0,0 +1,58 @@
+# --- Gunicorn Configuration ---
+# Used by the Procfile:  gunicorn -c gunicorn.conf.py "main:create_app()"
+#
+# Detection requests spend almost all of their time waiting on Gemini (one vision call
+# plus two enrichment calls per detected item), so workers are sized for concurrent
+# in-flight requests rather than CPU:
+#
+#   gevent  (default when installed) - every request is a greenlet; one worker holds
+#           GUNICORN_WORKER_CONNECTIONS in-flight requests. 1-2 workers per CPU core.
+#   gthread - GUNICORN_THREADS threads per worker; use when gevent is unavailable.
+#
+# Each in-flight detection keeps the upload and its base64 copy in memory (about 3.5x the
+# image size), so 500 concurrent 2 MB photos need roughly 3.5 GB across all workers.
+# GEMINI_ENRICHMENT_CONCURRENCY should be at least the per-worker concurrency.
+import glob
+import multiprocessing
+import os
+import tempfile
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS")
+if worker_class is None:
+    try:
+        import gevent  # noqa: F401
+        worker_class = "gevent"
+    except ImportError:
+        worker_class = "gthread"
+
+if worker_class == "gevent":
+    # Patch before the app is preloaded so its locks, threads and sockets are cooperative
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2, 8))))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# Gemini retries (3 attempts, 30 s timeout, exponential backoff) can take well over a minute
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# The app connects to MongoDB lazily after fork, so preloading is safe and saves memory
+preload_app = True
+
+# Workers write their metrics here so /metrics can answer for all of them (see metrics.py).
+# Set before the app is preloaded, which reads it at import.
+metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "waste-segregation-metrics"))
+# Likewise for the live-event journal every worker tails (see events.py)
+os.environ.setdefault("EVENT_JOURNAL", os.path.join(tempfile.gettempdir(), "waste-segregation-events.jsonl"))
+
+accesslog = "-"
+
+
+def on_starting(server):
+    # Counters start from zero with each server, like in a single process
+    for path in glob.glob(os.path.join(metrics_dir, "*.json")):
+        os.remove(path)
@@ -0,0 +1,133 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# --- Hedged Upstream Requests ---
+# When a call has not answered by the Nth percentile of recently observed latency, an
+# identical second call is sent and whichever answers first is used. The slower call is
+# left to finish in the background and its result ignored (requests cannot be aborted
+# mid-flight). A budget caps hedges at a fraction of all calls, so a slow upstream never
+# sees more than (1 + budget) times the normal load.
+LATENCY_WINDOW = 200
+# Counts are halved once this many calls have been seen, so the budget follows recent traffic
+BUDGET_WINDOW = 1000
+
+
+class LatencyTracker:
+    """Recent latencies (seconds) of successful calls, with a cached percentile"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._cached = {}
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._cached = {}
+
+    def percentile(self, fraction):
+        with self._lock:
+            if fraction not in self._cached:
+                ordered = sorted(self._samples)
+                index = min(len(ordered) - 1, int(fraction * len(ordered)))
+                self._cached[fraction] = ordered[index] if ordered else None
+            return self._cached[fraction]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class Hedger:
+    """Send a second identical request when the first is slower than usual
+
+    call(target, send) runs send() (a zero-argument function returning a response) and,
+    once enough latencies have been seen for target, hedges it. on_outcome(target, outcome)
+    is told "primary_won", "hedge_won", "both_failed" or "budget_exhausted" for every
+    call that outlived the hedge delay.
+    """
+
+    def __init__(self, percentile=0.95, budget=0.05, min_delay=0.05, min_samples=20,
+                 max_workers=32, on_outcome=None):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.on_outcome = on_outcome or (lambda target, outcome: None)
+        self._trackers = {}
+        self._calls = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+        # Threads are only started on first use, so this is safe to create before gunicorn forks
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-call")
+
+    def _tracker(self, target):
+        tracker = self._trackers.get(target)
+        if tracker is None:
+            tracker = self._trackers.setdefault(target, LatencyTracker())
+        return tracker
+
+    def _count_call(self):
+        with self._lock:
+            self._calls += 1
+            if self._calls > BUDGET_WINDOW:
+                self._calls //= 2
+                self._hedges //= 2
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._hedges + 1 > self.budget * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+    def hedge_delay(self, target):
+        """Seconds to wait before hedging, or None while there are too few samples"""
+        tracker = self._tracker(target)
+        if len(tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.percentile))
+
+    def _timed(self, tracker, send):
+        started = time.perf_counter()
+        response = send()
+        if getattr(response, "status_code", None) == 200:
+            tracker.observe(time.perf_counter() - started)
+        return response
+
+    def _submit(self, tracker, send):
+        # Carry the caller's context (request timings) into the worker thread
+        return self._executor.submit(contextvars.copy_context().run, self._timed, tracker, send)
+
+    def call(self, target, send):
+        self._count_call()
+        tracker = self._tracker(target)
+        delay = self.hedge_delay(target)
+        if delay is None:
+            return self._timed(tracker, send)
+
+        primary = self._submit(tracker, send)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self._take_hedge():
+            self.on_outcome(target, "budget_exhausted")
+            return primary.result()
+
+        hedge = self._submit(tracker, send)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and getattr(future.result(), "status_code", 500) < 500:
+                    self.on_outcome(target, "primary_won" if future is primary else "hedge_won")
+                    return future.result()
+
+        # Both failed: answer like an unhedged call would have
+        self.on_outcome(target, "both_failed")
+        if primary.exception() is None or hedge.exception() is not None:
+            return primary.result()
+        return hedge.result()
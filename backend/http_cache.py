@@ -0,0 +1,79 @@
+import functools
+import gzip
+import hashlib
+import os
+
+from flask import make_response, request
+
+from metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional - gzip is always available
+    brotli = None
+
+# --- Conditional GET and Compression for Polled JSON Endpoints ---
+# Responses smaller than this are sent uncompressed; the headers would eat the savings
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _accepted_encodings():
+    return {
+        value.lower()
+        for value, quality in request.accept_encodings
+        if quality > 0
+    }
+
+
+def compress_response(response):
+    """Compress a buffered response with brotli or gzip if the client accepts it"""
+    response.vary.add('Accept-Encoding')
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+
+    accepted = _accepted_encodings()
+    if brotli is not None and 'br' in accepted:
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accepted:
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def conditional_json(view):
+    """Add a weak ETag, 304 Not Modified handling and negotiated compression to a JSON view
+
+    The ETag is a hash of the serialized payload, so pollers that already hold the latest
+    data get an empty 304 instead of the full body.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+            return response
+
+        etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+        response.set_etag(etag, weak=True)
+        # Clients may keep the payload but must revalidate before every use
+        response.cache_control.no_cache = True
+        response.vary.add('Accept-Encoding')
+
+        not_modified = request.if_none_match.contains_weak(etag)
+        if request.if_none_match:
+            record_cache("json_revalidation", not_modified)
+        if not_modified:
+            response.status_code = 304
+            response.set_data(b'')
+            response.headers.pop('Content-Type', None)
+            return response
+
+        return compress_response(response)
+
+    return wrapper
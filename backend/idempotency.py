@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+
+# --- Idempotent Report Submissions ---
+# A client retrying a report sends the same Idempotency-Key header (or client_report_id
+# field) as the first attempt. The report id is derived from the key and the client's
+# address, so every store rejects the second copy by id alone: MongoDB's unique _id index,
+# the spool flusher's duplicate skip and the report log's id index, and another client
+# using the same key gets a report of its own. Recent responses are also kept in memory
+# for IDEMPOTENCY_KEY_TTL seconds, which covers reports still waiting in the spool.
+# Each report stores a fingerprint of its submission, so reusing a key for a different
+# report is refused instead of answered with the first one.
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+CLIENT_REPORT_ID_FIELD = "client_report_id"
+IDEMPOTENCY_KEY_TTL = float(os.getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+# Printable ASCII without spaces, as sent by UUID and ULID generators
+_VALID_KEY = re.compile(r"^[\x21-\x7e]{1,128}$")
+_LOCK_STRIPES = 64
+
+
+class InvalidIdempotencyKey(ValueError):
+    pass
+
+
+def idempotency_key(request):
+    """The client's idempotency key for this submission, or None if it did not send one
+
+    The header is checked first so a retry can be answered without parsing the upload.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        body = request.get_json(silent=True) if request.is_json else None
+        if isinstance(body, dict):
+            key = body.get(CLIENT_REPORT_ID_FIELD)
+        else:
+            key = request.form.get(CLIENT_REPORT_ID_FIELD)
+    if key is None:
+        return None
+    key = str(key).strip()
+    if not _VALID_KEY.match(key):
+        raise InvalidIdempotencyKey(
+            f"{IDEMPOTENCY_HEADER} must be 1-128 printable characters without spaces")
+    return key
+
+
+def request_fingerprint(request):
+    """SHA-256 of what a submission says: its form fields and files, or its JSON body
+
+    Multipart boundaries change between attempts, so the raw body is not hashed. Uploaded
+    files are rewound for the view to read.
+    """
+    hasher = hashlib.sha256()
+    if request.is_json:
+        hasher.update(json.dumps(request.get_json(silent=True), sort_keys=True, default=str).encode("utf-8"))
+        return hasher.hexdigest()
+    for name in sorted(request.form):
+        for value in request.form.getlist(name):
+            hasher.update(f"{name}={value}\0".encode("utf-8"))
+    for name in sorted(request.files):
+        for upload in request.files.getlist(name):
+            hasher.update(f"{name}:{upload.filename}\0".encode("utf-8"))
+            for chunk in iter(lambda: upload.stream.read(65536), b""):
+                hasher.update(chunk)
+            upload.stream.seek(0)
+    return hasher.hexdigest()
+
+
+def report_id_for_key(key):
+    """The ObjectId every attempt carrying this key stores its report under
+
+    Its leading bytes are a hash, not a timestamp, so these ids do not sort by creation
+    time (reports are ordered by createdAt everywhere).
+    """
+    return ObjectId(hashlib.sha256(key.encode("utf-8")).digest()[:12])
+
+
+class RecentResponses:
+    """Expiring key -> (body, status, fingerprint) map of answered submissions
+
+    lock(key) serialises concurrent attempts with the same key within this process, so
+    the second one waits for the first and replays its response.
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_KEY_TTL, max_entries=IDEMPOTENCY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    def lock(self, key):
+        return self._key_locks[hash(key) % _LOCK_STRIPES]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return response
+
+    def put(self, key, body, status, fingerprint=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, (body, status, fingerprint))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,81 @@
+import os
+from io import BytesIO
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # NumPy and Pillow are optional - without them every photo is accepted
+    np = None
+    Image = None
+
+# --- Photo Quality Pre-Filter ---
+# Black frames, pocket shots and motion-blurred photos almost always come back from
+# Gemini as "No waste detected". They are caught here from a small grayscale copy of the
+# image (a few milliseconds) and the user is asked to retake the photo instead.
+#
+# brightness  mean gray level, 0-255
+# contrast    standard deviation of the gray levels
+# sharpness   variance of the Laplacian; low values mean few edges, i.e. blur
+IMAGE_QUALITY_CHECK = os.getenv("IMAGE_QUALITY_CHECK", "on").lower() != "off"
+IMAGE_MIN_BRIGHTNESS = float(os.getenv("IMAGE_MIN_BRIGHTNESS", "30"))
+IMAGE_MAX_BRIGHTNESS = float(os.getenv("IMAGE_MAX_BRIGHTNESS", "245"))
+IMAGE_MIN_CONTRAST = float(os.getenv("IMAGE_MIN_CONTRAST", "12"))
+IMAGE_MIN_SHARPNESS = float(os.getenv("IMAGE_MIN_SHARPNESS", "10"))
+
+# Longest edge of the copy that is analysed
+ANALYSIS_SIZE = 256
+
+RETAKE_MESSAGES = {
+    "too_dark": "The photo is too dark. Turn on a light or the flash and retake it.",
+    "too_bright": "The photo is overexposed. Avoid pointing the camera at a light and retake it.",
+    "low_contrast": "The photo looks blank. Make sure the waste is in frame and retake it.",
+    "blurry": "The photo is blurry. Hold the camera steady, tap to focus and retake it.",
+}
+
+
+def _grayscale_pixels(image_bytes):
+    with Image.open(BytesIO(image_bytes)) as img:
+        # JPEGs are decoded at a reduced scale directly, which skips most of the work
+        img.draft("L", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+        gray = img.convert("L")
+    gray.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE), Image.BILINEAR)
+    return np.asarray(gray, dtype=np.float32)
+
+
+def measure_image_quality(image_bytes):
+    """Brightness, contrast and sharpness of an image, or None if it cannot be analysed"""
+    if np is None or not IMAGE_QUALITY_CHECK:
+        return None
+    try:
+        pixels = _grayscale_pixels(image_bytes)
+    except Exception:
+        # Formats Pillow cannot open (HEIC without a plugin) are passed through
+        return None
+    if pixels.shape[0] < 3 or pixels.shape[1] < 3:
+        return None
+
+    # 4-neighbour Laplacian over the interior pixels
+    laplacian = (
+        pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+        - 4 * pixels[1:-1, 1:-1]
+    )
+    return {
+        "brightness": round(float(pixels.mean()), 1),
+        "contrast": round(float(pixels.std()), 1),
+        "sharpness": round(float(laplacian.var()), 1),
+    }
+
+
+def quality_problem(quality):
+    """The reason a photo should be retaken, or None if it is good enough to analyse"""
+    if quality is None:
+        return None
+    if quality["brightness"] < IMAGE_MIN_BRIGHTNESS:
+        return "too_dark"
+    if quality["brightness"] > IMAGE_MAX_BRIGHTNESS:
+        return "too_bright"
+    if quality["contrast"] < IMAGE_MIN_CONTRAST:
+        return "low_contrast"
+    if quality["sharpness"] < IMAGE_MIN_SHARPNESS:
+        return "blurry"
+    return None
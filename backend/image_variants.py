@@ -0,0 +1,128 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from flask import Response, request
+
+from metrics import record_cache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional - without it every variant serves the original
+    Image = None
+    ImageOps = None
+
+# --- Variant Configuration ---
+# Longest edge (in pixels) of each generated variant; "original" is never resized
+VARIANT_SIZES = {
+    "thumbnail": 256,
+    "medium": 1024,
+}
+VARIANTS = ("thumbnail", "medium", "original")
+VARIANT_JPEG_QUALITY = 82
+
+# Report images never change once stored, so clients may keep them for a year
+IMAGE_CACHE_MAX_AGE = 31536000
+
+# Generated variants of legacy images saved directly in uploads/ (blob variants are kept
+# next to their blob, see BlobStore.variant_path)
+VARIANTS_FOLDER = os.path.join("uploads", "variants")
+
+# (path, mtime, size) -> etag for the most recently served files, so each is hashed once
+FILE_ETAG_CACHE_SIZE = int(os.getenv("FILE_ETAG_CACHE_SIZE", "4096"))
+_file_etag_cache = OrderedDict()
+_file_etag_lock = threading.Lock()
+
+
+def content_etag(data):
+    """Strong ETag derived from the SHA-256 of the content"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def guess_content_type(filename):
+    """Determine the image content type from its filename"""
+    filename = (filename or "").lower()
+    if filename.endswith('.png'):
+        return 'image/png'
+    if filename.endswith('.webp'):
+        return 'image/webp'
+    if filename.endswith('.gif'):
+        return 'image/gif'
+    return 'image/jpeg'  # Default
+
+
+def generate_variant(image_bytes, variant):
+    """Downscale an image to the given variant, returning (data, content_type) or None"""
+    if Image is None or variant not in VARIANT_SIZES:
+        return None
+
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            size = VARIANT_SIZES[variant]
+            img.thumbnail((size, size))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            output = BytesIO()
+            img.save(output, format="JPEG", quality=VARIANT_JPEG_QUALITY, optimize=True, progressive=True)
+            return output.getvalue(), 'image/jpeg'
+    except Exception:
+        return None
+
+
+def file_etag(path):
+    """ETag for a file on disk, cached by path, mtime and size"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _file_etag_lock:
+        etag = _file_etag_cache.get(key)
+        if etag is not None:
+            _file_etag_cache.move_to_end(key)
+    record_cache("file_etag", etag is not None)
+    if etag is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                hasher.update(chunk)
+        etag = hasher.hexdigest()
+        with _file_etag_lock:
+            _file_etag_cache[key] = etag
+            while len(_file_etag_cache) > FILE_ETAG_CACHE_SIZE:
+                _file_etag_cache.popitem(last=False)
+    return etag
+
+
+def variant_path(image_filename, variant):
+    """Location of a generated variant for a legacy image stored directly in uploads/"""
+    return os.path.join(VARIANTS_FOLDER, variant, f"{os.path.basename(image_filename)}.jpg")
+
+
+def is_not_modified(etag):
+    """Check the request's If-None-Match against a known ETag"""
+    if not request.if_none_match:
+        return False
+    not_modified = bool(etag) and request.if_none_match.contains(etag)
+    record_cache("image_revalidation", not_modified)
+    return not_modified
+
+
+def _apply_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def not_modified_response(etag):
+    """Empty 304 response carrying the caching headers"""
+    return _apply_cache_headers(Response(status=304), etag)
+
+
+def image_response(data, content_type, etag):
+    """Serve image bytes with ETag, long-lived caching, 304 and Range support"""
+    response = _apply_cache_headers(Response(data, mimetype=content_type), etag)
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
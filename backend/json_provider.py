@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+import timing
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - the stdlib encoder handles the same types, only slower
+    orjson = None
+
+
+def _default(value):
+    """Encode the MongoDB types that show up in report documents"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson that serializes ObjectId, datetime and bytes
+
+    Endpoints can jsonify raw MongoDB documents: ObjectIds become strings, datetimes
+    ISO 8601 strings (the same format as .isoformat()) and bytes base64 strings. Keys are
+    not sorted, which keeps large list responses cheap.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with timing.stage("serialize"):
+            if orjson is not None:
+                # Hand orjson's bytes straight to the response instead of decoding and re-encoding
+                data = orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+            else:
+                data = self.dumps(obj)
+        return self._app.response_class(data, mimetype=self.mimetype)
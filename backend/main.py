@@ -1,56 +1,383 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Blueprint, Flask, Response, g, request, jsonify, make_response, send_file
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
 import base64
+import heapq
 import json
 import os
+import queue
+import threading
 import time
-from datetime import datetime
-from pymongo import MongoClient
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from pymongo import DESCENDING, TEXT, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from bson import ObjectId
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from events import EVENT_JOURNAL, EventBus, EventJournal, format_sse
+from json_provider import FastJSONProvider
+from http_cache import conditional_json
+import metrics
+import timing
+from admission import admission_control, client_key
+from blob_store import BlobStore
+from report_store import ReportLog
+from regions import DEFAULT_REGION, REGIONS_FILE, InvalidRegion, RegionMap
+from report_archive import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_BLOB_GRACE_SECONDS, ARCHIVE_STATUSES, ArchiveLog, shrink_image
+)
+from spool import ReportSpool
+from detection_history import (
+    ANALYTICS_PERIODS, DETECTION_BATCH_SIZE, DETECTION_HISTORY, DETECTION_RETENTION_DAYS, DetectionLog, DetectionRecorder,
+    default_window, detection_records, image_hash, rollup, summarize
+)
+from upload_gate import (
+    MAX_REQUEST_BYTES, MAX_UPLOAD_BYTES, REQUEST_TOO_LARGE_MESSAGE, UPLOAD_TOO_LARGE_MESSAGE, InvalidUpload,
+    UploadLimitRequest, validate_image_upload
+)
+from image_quality import RETAKE_MESSAGES, measure_image_quality, quality_problem
+from hedging import Hedger
+from idempotency import (
+    IDEMPOTENCY_HEADER, InvalidIdempotencyKey, RecentResponses, idempotency_key, report_id_for_key, request_fingerprint
+)
+from gemini_parser import (
+    CLASSIFICATION_SCHEMA, DETECTED_ITEM_SCHEMA, DETECTION_SCHEMA, candidate_text, parse_response, parse_short_answer,
+    parse_tips, token_usage, validate_items,
+)
+from gemini_prompts import classify_prompt, disposal_prompt, prompt_mode, text_payload, tips_prompt, vision_payload
+from image_variants import (
+    VARIANTS, IMAGE_CACHE_MAX_AGE, content_etag, guess_content_type, generate_variant,
+    file_etag, variant_path, is_not_modified, not_modified_response, image_response
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
 # --- Initialize Flask App ---
-app = Flask(__name__)
-CORS(app)
+# Routes live on a blueprint; create_app() builds the application around it
+api = Blueprint('api', __name__)
+
+# Proxies in front of the app (Railway's edge is one). remote_addr becomes the address the
+# outermost trusted proxy saw; X-Forwarded-For entries added before it are client-supplied.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+def create_app():
+    """Application factory used by gunicorn (see gunicorn.conf.py) and the dev server"""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    # Oversized bodies are refused while streaming, before any of it is buffered; detection
+    # endpoints lower the limit to MAX_UPLOAD_BYTES in read_image_upload()
+    app.request_class = UploadLimitRequest
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+    CORS(app)
+    app.register_blueprint(api)
+    if TRUSTED_PROXY_HOPS > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+    return app
 
 # --- MongoDB Configuration ---
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "smart_waste_segregation")
 
+# Connection pool sizing
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# How long the first request of a process waits for the initial connection attempt
+MONGODB_STARTUP_WAIT_MS = int(os.getenv("MONGODB_STARTUP_WAIT_MS", "2000"))
+# Reconnect backoff ceiling and the interval between pings while connected (seconds)
+MONGODB_RECONNECT_MAX_DELAY = float(os.getenv("MONGODB_RECONNECT_MAX_DELAY", "60"))
+MONGODB_HEALTH_CHECK_INTERVAL = float(os.getenv("MONGODB_HEALTH_CHECK_INTERVAL", "10"))
+
+# Uploaded images are stored by content hash under uploads/blobs
+blob_store = BlobStore(os.path.join("uploads", "blobs"))
+
+# Fields searched by /api/requests/search and their weights, shared by both stores
+REPORT_TEXT_FIELDS = {"description": 2, "location": 1}
+
+# Local report log used while MongoDB is unavailable (imports an existing reports.json once)
+report_log = ReportLog("reports.jsonl", legacy_path="reports.json", text_fields=REPORT_TEXT_FIELDS)
+
+# Municipal regions that reports are assigned to (see regions.py)
+region_map = RegionMap.load(REGIONS_FILE)
+
+# Resolved reports moved out of the hot store by archive_resolved_reports()
+ARCHIVE_COLLECTION = "requests_archive"
+report_archive_log = ArchiveLog("reports-archive.jsonl.gz")
+
+# What detections saw, for /api/analytics/detections (see detection_history.py)
+DETECTION_COLLECTION = "detections"
+DETECTION_ROLLUP_COLLECTION = "detection_rollups"
+detection_log = DetectionLog("detections.jsonl")
+
 # Initialize MongoDB variables
+# These are only set by the connection thread; endpoints fall back to file storage while
+# requests_collection is None, so a slow or missing database never blocks a request.
 client = None
 db = None
 requests_collection = None
 
+mongodb_state = {
+    "status": "not_started",  # not_started, connecting, connected or disconnected
+    "last_error": None,
+    "last_connected_at": None,
+    "reconnect_attempts": 0
+}
+_mongodb_pid = None
+_mongodb_lock = threading.Lock()
+_mongodb_first_attempt = threading.Event()
+
 def connect_mongodb():
+    """Ping MongoDB once, publishing or withdrawing the collection handles"""
     global client, db, requests_collection
     try:
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+        if client is None:
+            # MongoClient connects in the background; only the ping below waits on the server
+            client = MongoClient(
+                MONGODB_URI,
+                serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=MONGODB_MIN_POOL_SIZE,
+                waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                event_listeners=[metrics.MongoCommandMetrics()]
+            )
         # Test the connection
         client.admin.command('ping')
+        was_connected = requests_collection is not None
         db = client[DB_NAME]
         requests_collection = db.requests
+        mongodb_state["status"] = "connected"
+        if not was_connected:
+            mongodb_state["last_connected_at"] = datetime.utcnow().isoformat()
+            mongodb_state["reconnect_attempts"] = 0
+            ensure_report_indexes(requests_collection, db[ARCHIVE_COLLECTION])
+            ensure_detection_indexes(db)
+            import_file_reports()
+            import_file_detections()
+            if report_events.has_subscribers():
+                start_change_stream_watcher()
         return True
     except Exception as e:
-        client = None
         db = None
         requests_collection = None
+        mongodb_state["status"] = "disconnected"
+        mongodb_state["last_error"] = str(e)
         return False
 
-# Try to connect to MongoDB
-connect_mongodb()
+def ensure_report_indexes(collection, archive):
+    """Create the indexes the report queries rely on (a no-op once they exist)"""
+    try:
+        collection.create_index(
+            [(field, TEXT) for field in REPORT_TEXT_FIELDS],
+            weights=REPORT_TEXT_FIELDS, default_language="english", name="report_text"
+        )
+        collection.create_index([("createdAt", DESCENDING)], name="createdAt_desc")
+        # Region-scoped dashboards list by date and count by status within their region
+        collection.create_index([("region", 1), ("createdAt", DESCENDING)], name="region_createdAt_desc")
+        collection.create_index([("region", 1), ("status", 1)], name="region_status")
+        # Archived reports are listed by date and counted by status
+        archive.create_index([("createdAt", DESCENDING)], name="createdAt_desc")
+        archive.create_index([("status", 1)], name="status")
+        archive.create_index([("region", 1), ("createdAt", DESCENDING)], name="region_createdAt_desc")
+        archive.create_index([("region", 1), ("status", 1)], name="region_status")
+    except Exception as e:
+        # Search answers 503 until the text index exists; everything else still works
+        mongodb_state["last_error"] = f"Index creation failed: {e}"
+
+def ensure_detection_indexes(database):
+    """Expire raw detection records and index the rollups by day (a no-op once they exist)"""
+    try:
+        database[DETECTION_COLLECTION].create_index(
+            "at", expireAfterSeconds=DETECTION_RETENTION_DAYS * 86400, name="at_ttl")
+        rollups = database[DETECTION_ROLLUP_COLLECTION]
+        rollups.create_index([("day", 1)], name="day")
+        rollups.create_index([("region", 1), ("day", 1)], name="region_day")
+    except Exception as e:
+        mongodb_state["last_error"] = f"Index creation failed: {e}"
+
+def _mongodb_connection_loop():
+    retry_delay = 1
+    while True:
+        connected = connect_mongodb()
+        _mongodb_first_attempt.set()
+        if connected:
+            retry_delay = 1
+            time.sleep(MONGODB_HEALTH_CHECK_INTERVAL)
+        else:
+            mongodb_state["reconnect_attempts"] += 1
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, MONGODB_RECONNECT_MAX_DELAY)
+
+def ensure_mongodb_connection(wait=True):
+    """Start the connection thread for this process on first use
+
+    The thread is started lazily (never at import time) and restarted after a fork, so the
+    app can be preloaded by gunicorn without sharing a MongoClient between workers.
+    """
+    global _mongodb_pid
+    if _mongodb_pid != os.getpid():
+        with _mongodb_lock:
+            if _mongodb_pid != os.getpid():
+                _mongodb_pid = os.getpid()
+                mongodb_state["status"] = "connecting"
+                threading.Thread(target=_mongodb_connection_loop, name="mongodb-connection", daemon=True).start()
+                if REPORT_SPOOL_MODE != "off":
+                    # Also drains reports left in the spool by a previous process
+                    threading.Thread(target=_report_spool_flusher, name="report-spool-flusher", daemon=True).start()
+    if wait:
+        _mongodb_first_attempt.wait(MONGODB_STARTUP_WAIT_MS / 1000)
+
+def _reset_mongodb_after_fork():
+    # MongoClient is not fork-safe: drop the parent's handles and reconnect in the child
+    global client, db, requests_collection, change_stream_active, _mongodb_pid, _mongodb_lock, _mongodb_first_attempt
+    client = None
+    db = None
+    requests_collection = None
+    change_stream_active = False
+    _mongodb_pid = None
+    _mongodb_lock = threading.Lock()
+    _mongodb_first_attempt = threading.Event()
+    mongodb_state.update({"status": "not_started", "last_error": None, "last_connected_at": None, "reconnect_attempts": 0})
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_mongodb_after_fork)
+
+# --- Request Metrics, Stage Timings and Profiling ---
+# Registered before the MongoDB hook so the first request's connection wait is included
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.registry.start_sharing()
+    g.timings_token = timing.begin_request()
+    g.profiler = timing.RequestProfiler().start() if timing.should_profile(request.headers) else None
+
+@api.after_app_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The URL rule (not the path) keeps the route label bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.http_request_duration_seconds.observe(time.perf_counter() - started, route, request.method)
+        metrics.http_requests_total.inc(route, request.method, str(response.status_code))
+
+        timings = timing.current()
+        if timings is not None:
+            total_ms = timings.total_ms()
+            response.headers['Server-Timing'] = timings.server_timing(total_ms)
+            timing.log_request(timings, total_ms, request.method, route, response.status_code)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            report_path = profiler.stop(route)
+            timing.log_profile(report_path, request.method, route)
+            # Server file names are only shown to the operator
+            if timing.is_debug_request(request.headers):
+                response.headers['X-Profile-Report'] = os.path.basename(report_path)
+    return response
+
+@api.teardown_app_request
+def end_request_timer(exc):
+    # Runs even when the view raised, so a profiler is never left holding the lock
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop(request.url_rule.rule if request.url_rule else "unmatched")
+    token = g.pop('timings_token', None)
+    if token is not None:
+        timing.end_request(token)
+
+@api.before_app_request
+def connect_mongodb_on_first_request():
+    # Health checks report the live state instead of waiting for the first attempt
+    ensure_mongodb_connection(wait=request.endpoint != 'api.health_check')
 
 # --- Configuration ---
 # It's highly recommended to set your API key as an environment variable
 # for security.
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") # Leave empty if not using a key
 
+# Upstream API locations; override the base URLs to point at local stand-ins (see benchmarks/)
+GEMINI_API_BASE_URL = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+YOUTUBE_API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3").rstrip("/")
+
 # Gemini API URL
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent"
+GEMINI_URL = f"{GEMINI_API_BASE_URL}/v1/models/gemini-1.5-flash:generateContent"
+
+# --- Upstream HTTP Clients ---
+# Timeout (seconds) for enrichment, classification and YouTube calls
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "15"))
+# Concurrent enrichment calls per process; size it like the worker's concurrency (see gunicorn.conf.py)
+GEMINI_ENRICHMENT_CONCURRENCY = int(os.getenv("GEMINI_ENRICHMENT_CONCURRENCY", "32"))
+
+# One pooled session so Gemini and YouTube calls reuse keep-alive TLS connections
+http_session = requests.Session()
+upstream_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=GEMINI_ENRICHMENT_CONCURRENCY)
+http_session.mount("https://", upstream_adapter)
+http_session.mount("http://", upstream_adapter)
+
+# Threads are only started on first use, so this is safe to create before gunicorn forks
+enrichment_executor = ThreadPoolExecutor(max_workers=GEMINI_ENRICHMENT_CONCURRENCY, thread_name_prefix="gemini-enrichment")
+
+def upstream_request(target, method, url, **kwargs):
+    """Send a request through http_session, recording its latency and outcome under target"""
+    started = time.perf_counter()
+    status = "error"
+    try:
+        with timing.stage(target):
+            response = http_session.request(method, url, **kwargs)
+        status = str(response.status_code)
+        return response
+    except requests.exceptions.Timeout:
+        status = "timeout"
+        raise
+    finally:
+        metrics.upstream_request_duration_seconds.observe(time.perf_counter() - started, target)
+        metrics.upstream_requests_total.inc(target, status)
+
+# --- Hedged Gemini Requests (opt-in) ---
+# With GEMINI_HEDGING=on, a Gemini call that is slower than the GEMINI_HEDGE_PERCENTILE of
+# recent calls to the same target is sent a second time and the first answer wins. At most
+# GEMINI_HEDGE_BUDGET extra calls (as a fraction of all calls) are made.
+GEMINI_HEDGING = os.getenv("GEMINI_HEDGING", "off").lower() == "on"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05"))
+GEMINI_HEDGE_MIN_DELAY_MS = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_MS", "100"))
+
+gemini_hedger = Hedger(
+    percentile=GEMINI_HEDGE_PERCENTILE / 100,
+    budget=GEMINI_HEDGE_BUDGET,
+    min_delay=GEMINI_HEDGE_MIN_DELAY_MS / 1000,
+    # Every hedged call runs on this pool, so it must cover request threads plus enrichment
+    max_workers=GEMINI_ENRICHMENT_CONCURRENCY * 3,
+    on_outcome=lambda target, outcome: metrics.gemini_hedges_total.inc(target, outcome)
+) if GEMINI_HEDGING else None
+
+def gemini_request(target, url, **kwargs):
+    """POST to Gemini through upstream_request, hedged when GEMINI_HEDGING is on"""
+    def send():
+        return upstream_request(target, "POST", url, **kwargs)
+
+    if gemini_hedger is None:
+        return send()
+    return gemini_hedger.call(target, send)
+
+def record_gemini_usage(call_site, result):
+    """Count the tokens of a Gemini answer under its call site and prompt mode"""
+    mode = prompt_mode(call_site)
+    metrics.gemini_calls_total.inc(call_site, mode)
+    for kind, count in token_usage(result).items():
+        metrics.gemini_tokens_total.inc(call_site, mode, kind, amount=count)
+
+def parse_gemini_items(target, result, schema):
+    """Parse and validate a Gemini answer that should be a JSON array, counting the outcome"""
+    parsed = parse_response(result, schema=schema)
+    metrics.gemini_parse_outcomes_total.inc(target, parsed.outcome)
+    return parsed
 
 
 # --- YouTube API Integration for Video Suggestions ---
@@ -68,7 +395,7 @@ def get_youtube_suggestions(item_name):
         search_query = f"DIY upcycling {item_name} craft tutorial"
         
         # YouTube Data API v3 search endpoint
-        search_url = "https://www.googleapis.com/youtube/v3/search"
+        search_url = f"{YOUTUBE_API_BASE_URL}/search"
         search_params = {
             'part': 'snippet',
             'q': search_query,
@@ -80,7 +407,7 @@ def get_youtube_suggestions(item_name):
             'key': YOUTUBE_API_KEY
         }
         
-        response = requests.get(search_url, params=search_params)
+        response = upstream_request("youtube_search", "GET", search_url, params=search_params, timeout=UPSTREAM_TIMEOUT)
         response.raise_for_status()
         
         search_results = response.json()
@@ -90,14 +417,14 @@ def get_youtube_suggestions(item_name):
         
         # Get video details for the found videos
         video_ids = [item['id']['videoId'] for item in search_results['items']]
-        videos_url = "https://www.googleapis.com/youtube/v3/videos"
+        videos_url = f"{YOUTUBE_API_BASE_URL}/videos"
         videos_params = {
             'part': 'snippet,contentDetails,statistics',
             'id': ','.join(video_ids),
             'key': YOUTUBE_API_KEY
         }
         
-        videos_response = requests.get(videos_url, params=videos_params)
+        videos_response = upstream_request("youtube_videos", "GET", videos_url, params=videos_params, timeout=UPSTREAM_TIMEOUT)
         videos_response.raise_for_status()
         videos_data = videos_response.json()
         
@@ -147,6 +474,7 @@ def get_youtube_suggestions(item_name):
 
 def get_fallback_suggestions(item_name):
     """Fallback suggestions when YouTube API is not available"""
+    metrics.fallback_activations_total.inc("get_fallback_suggestions")
     return [
         {
             "title": f"DIY Upcycling with {item_name} - Creative Recycling",
@@ -166,6 +494,7 @@ def get_fallback_suggestions(item_name):
 
 def get_fallback_detection():
     """Fallback detection when Gemini API is unavailable"""
+    metrics.fallback_activations_total.inc("get_fallback_detection")
     return [
         {
             "name": "Waste Item (API Limited)",
@@ -180,115 +509,60 @@ def get_fallback_detection():
 def get_specific_disposal_info_with_gemini(item_name):
     """Get specific disposal information using Gemini AI"""
     try:
-        prompt = f"""
-        You are a waste management expert. For the specific waste item "{item_name}", provide a SHORT disposal method (1-2 lines maximum).
-
-        CRITICAL: Keep it concise and specific to this exact item.
-
-        EXAMPLES BY ITEM TYPE:
-        - For "banana peel": "Green waste bin or home composting system"
-        - For "plastic bottle": "Blue recycling bin or plastic bottle bank"
-        - For "medicine": "Household Hazardous Waste facility"
-        - For "battery": "Battery recycling collection point"
-        - For "glass bottle": "Glass recycling bin or bottle bank"
-        - For "paper": "Paper recycling bin"
-        - For "electronics": "E-waste recycling facility"
-        - For "food waste": "Green waste bin or composting"
-        - For "aluminum can": "Metal recycling bin"
-        - For "cardboard": "Paper recycling bin"
-
-        For "{item_name}", provide a SHORT disposal method (1-2 lines only).
-        Respond with ONLY the disposal method, nothing else.
-        """
+        prompt = disposal_prompt(item_name, prompt_mode("disposal"))
         
-        response = requests.post(
+        response = gemini_request(
+            "gemini_enrichment",
             f"{GEMINI_URL}?key={GEMINI_API_KEY}",
             headers={'Content-Type': 'application/json'},
-            json={
-                'contents': [{
-                    'parts': [{'text': prompt}]
-                }]
-            }
+            json=text_payload(prompt),
+            timeout=UPSTREAM_TIMEOUT
         )
         
         if response.status_code == 200:
             result = response.json()
-            if 'candidates' in result and len(result['candidates']) > 0:
-                content = result['candidates'][0]['content']['parts'][0]['text']
-                return content.strip()
-            else:
-                pass
-        else:
-            pass
+            record_gemini_usage("disposal", result)
+            text, _, blocked = candidate_text(result)
+            disposal = None if blocked else parse_short_answer(text)
+            if disposal:
+                return disposal
         
+        metrics.fallback_activations_total.inc("default_disposal_info")
         return "General waste bin or local recycling facility"
     except Exception as e:
+        metrics.fallback_activations_total.inc("default_disposal_info")
         return "General waste bin or local recycling facility"
 
 def get_specific_eco_tips_with_gemini(item_name):
     """Get specific eco tips using Gemini AI"""
     try:
-        prompt = f"""
-        You are an environmental expert. For the specific waste item "{item_name}", provide 2-3 SHORT eco tips (1 line each).
-
-        CRITICAL: Keep tips concise and specific to this exact item.
-
-        EXAMPLES BY ITEM TYPE:
-        - For "banana peel": ["Use as natural fertilizer for plants", "Add to compost bin for organic waste"]
-        - For "plastic bottle": ["Rinse thoroughly before recycling", "Remove cap and recycle separately"]
-        - For "medicine": ["Do not flush down toilet", "Check pharmacy for disposal programs"]
-        - For "battery": ["Never throw in regular trash", "Use battery recycling points"]
-        - For "glass bottle": ["Rinse before recycling", "Remove labels and caps"]
-        - For "paper": ["Keep clean and dry", "Remove plastic attachments"]
-        - For "electronics": ["Donate if working", "Use e-waste facilities"]
-
-        For "{item_name}", provide 2-3 SHORT eco tips (1 line each).
-        Respond with ONLY a JSON array like: ["tip 1", "tip 2"]
-        """
+        prompt = tips_prompt(item_name, prompt_mode("tips"))
         
-        response = requests.post(
+        response = gemini_request(
+            "gemini_enrichment",
             f"{GEMINI_URL}?key={GEMINI_API_KEY}",
             headers={'Content-Type': 'application/json'},
-            json={
-                'contents': [{
-                    'parts': [{'text': prompt}]
-                }]
-            }
+            json=text_payload(prompt),
+            timeout=UPSTREAM_TIMEOUT
         )
         
         if response.status_code == 200:
+            # A JSON array of tips, or one tip per line if the model ignored the format
             result = response.json()
-            if 'candidates' in result and len(result['candidates']) > 0:
-                content = result['candidates'][0]['content']['parts'][0]['text']
-                try:
-                    # Clean the content - remove any markdown formatting
-                    cleaned_content = content.strip()
-                    if cleaned_content.startswith('```json'):
-                        cleaned_content = cleaned_content.replace('```json', '').replace('```', '').strip()
-                    elif cleaned_content.startswith('```'):
-                        cleaned_content = cleaned_content.replace('```', '').strip()
-                    
-                    # Try to parse as JSON array
-                    tips = json.loads(cleaned_content)
-                    if isinstance(tips, list) and len(tips) >= 2:
-                        return tips[:3]
-                except Exception as parse_error:
-                    # If not JSON, split by lines and take first 3
-                    lines = content.strip().split('\n')
-                    tips = [line.strip() for line in lines if line.strip() and not line.strip().startswith('```')][:3]
-                    if tips:
-                        return tips
-            else:
-                pass
-        else:
-            pass
+            record_gemini_usage("tips", result)
+            text, _, blocked = candidate_text(result)
+            tips = [] if blocked else parse_tips(text)
+            if tips:
+                return tips
         
+        metrics.fallback_activations_total.inc("default_eco_tips")
         return [
             "Clean the item before recycling",
             "Check local recycling guidelines",
             "Separate different materials"
         ]
     except Exception as e:
+        metrics.fallback_activations_total.inc("default_eco_tips")
         return [
             "Clean the item before recycling",
             "Check local recycling guidelines",
@@ -296,68 +570,30 @@ def get_specific_eco_tips_with_gemini(item_name):
         ]
 
 # --- The Main Detection Function using Gemini API ---
-def detect_waste_from_image_gemini(image_bytes):
+def detect_waste_from_image_gemini(image_bytes, mime_type="image/jpeg", coordinates=(None, None)):
     if not GEMINI_API_KEY:
         return {"error": "Gemini API key is not configured on the server."}
 
     # 1. Encode the image to Base64
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    with timing.stage("base64"):
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
 
     # 2. Note: We removed the schema-based approach since gemini-1.5-flash doesn't support it
     # The prompt now includes explicit JSON formatting instructions
 
-    # 3. Create the prompt for the Gemini API
-    prompt = (
-        "Analyze this image and identify ALL visible waste items. "
-        "For each waste item you can see, identify the item, estimate your confidence (0-100), "
-        "provide its specific disposal method (be detailed and specific), 2-3 helpful disposal tips, describe its location in the image, "
-        "and determine if it's reusable for crafting (true/false). "
-        "Respond with ONLY a valid JSON array containing ALL waste items visible in the image (up to 5 items maximum). "
-        "Each item should have: name, confidence (number), binDescription, tips (array), location (string), and isReusable (boolean). "
-        "IMPORTANT: For binDescription, you MUST be very specific and detailed. DO NOT use generic terms like 'Recycling Bin'. Instead use specific descriptions like: "
-        "- For medicine/pills: 'Household Hazardous Waste or designated pharmaceutical waste disposal' "
-        "- For plastic bottles: 'Blue recycling bin for plastics or plastic bottle bank' "
-        "- For electronics: 'Special electronics recycling facility or e-waste collection point' "
-        "- For glass: 'Glass recycling bin or bottle bank for glass containers' "
-        "- For batteries: 'Battery recycling collection point or hazardous waste facility' "
-        "- For paper: 'Paper recycling bin or mixed paper collection' "
-        "- For organic waste: 'Green waste bin for organic materials or compost bin' "
-        "Example format: [{\"name\": \"Medicine blister pack\", \"confidence\": 90, \"binDescription\": \"Household Hazardous Waste or designated pharmaceutical waste disposal\", \"tips\": [\"Do not flush medication down the toilet\", \"Check with your local pharmacy for proper disposal\"], \"location\": \"center\", \"isReusable\": false}]. "
-        "Include location descriptions like 'top left', 'center', 'bottom right', etc."
-    )
+    # 3. Construct the payload (prompt plus image) for the Gemini API request
+    payload = vision_payload(prompt_mode("vision"), mime_type, base64_image)
 
-    # 4. Construct the payload for the Gemini API request
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {"text": prompt},
-                    {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": base64_image
-                        }
-                    }
-                ]
-            }
-        ],
-        "generationConfig": {
-            "temperature": 0.1,
-            "topK": 1,
-            "topP": 1,
-            "maxOutputTokens": 2048
-        }
-    }
-
-    # 5. Make the API call with retry logic
+    # 4. Make the API call with retry logic
     max_retries = 3
     retry_delay = 2  # seconds
     
     for attempt in range(max_retries):
         try:
-            api_url = f"https://generativelanguage.googleapis.com/v1/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
+            api_url = f"{GEMINI_URL}?key={GEMINI_API_KEY}"
             
-            response = requests.post(
+            response = gemini_request(
+                "gemini_vision",
                 api_url,
                 headers={'Content-Type': 'application/json'},
                 data=json.dumps(payload),
@@ -366,6 +602,7 @@ def detect_waste_from_image_gemini(image_bytes):
             
             if response.status_code == 503:
                 if attempt < max_retries - 1:
+                    metrics.upstream_retries_total.inc("gemini_vision")
                     time.sleep(retry_delay)
                     retry_delay *= 2  # Exponential backoff
                     continue
@@ -377,32 +614,32 @@ def detect_waste_from_image_gemini(image_bytes):
             
             if response.status_code != 200:
                 if attempt < max_retries - 1:
+                    metrics.upstream_retries_total.inc("gemini_vision")
                     time.sleep(retry_delay)
                     retry_delay *= 2
                     continue
                 else:
                     return get_fallback_detection()
             
-            # 6. Extract and parse the content from the response
+            # 5. Extract and parse the content from the response
             try:
+                parse_started = time.perf_counter()
                 result = response.json()
+                record_gemini_usage("vision", result)
+                parsed = parse_gemini_items("gemini_vision", result, DETECTION_SCHEMA)
+
+                if not parsed.blocked:
+                    if parsed.value is None:
+                        # Nothing usable in the answer: retry like any other malformed response
+                        raise ValueError("Unparseable Gemini response")
 
-                if 'candidates' in result and result['candidates']:
-                    content_part = result['candidates'][0]['content']['parts'][0]
-                    # Clean the response text to remove markdown code blocks
-                    response_text = content_part['text']
-                    # Remove markdown code blocks if present
-                    if response_text.startswith('```json'):
-                        response_text = response_text.replace('```json', '').replace('```', '').strip()
-                    elif response_text.startswith('```'):
-                        response_text = response_text.replace('```', '').strip()
-                    
-                    # Parse the cleaned JSON
-                    detections = json.loads(response_text)
-                    
                     # Check if no items were detected
-                    if not detections or len(detections) == 0:
+                    if not parsed.value:
                         return {"message": "No waste detected in the image"}
+
+                    detections = parsed.items[:5]
+                    if not detections:
+                        raise ValueError("No valid items in Gemini response")
                     
                     # Process each detection
                     processed_detections = []
@@ -417,27 +654,34 @@ def detect_waste_from_image_gemini(image_bytes):
                         if 'confidence' in item:
                             item['confidence'] = max(0, min(100, item['confidence']))
                         
-                        # ALWAYS replace disposal info with specific info (force it)
-                        if 'binDescription' in item:
-                            new_disposal = get_specific_disposal_info_with_gemini(item['name'])
-                            item['binDescription'] = new_disposal
-                        
-                        # ALWAYS replace eco tips with specific tips (force it)
-                        if 'tips' in item:
-                            new_tips = get_specific_eco_tips_with_gemini(item['name'])
-                            item['tips'] = new_tips
-                        
                         # Don't add YouTube suggestions here - they will be fetched separately
                         
                         processed_detections.append(item)
+                    timing.record("parse", parse_started)
+                    
+                    # ALWAYS replace disposal info and eco tips with specific info (force it), so
+                    # the compact vision prompt does not ask for them at all.
+                    # The enrichment calls for all items run concurrently rather than one after another.
+                    disposal_futures = {}
+                    tips_futures = {}
+                    for item in processed_detections:
+                        disposal_futures[item['id']] = timing.submit(enrichment_executor, f"disposal_{item['id']}", get_specific_disposal_info_with_gemini, item['name'])
+                        tips_futures[item['id']] = timing.submit(enrichment_executor, f"tips_{item['id']}", get_specific_eco_tips_with_gemini, item['name'])
+                    for item in processed_detections:
+                        item['binDescription'] = disposal_futures[item['id']].result()
+                        item['tips'] = tips_futures[item['id']].result()
+
+                    # Only real answers are recorded, never the canned fallback
+                    record_detections(image_bytes, processed_detections, *coordinates)
                     
                     return processed_detections
                 else:
                     # Handle cases where the API returns no candidates (e.g., safety blocks)
                     return {"error": "Analysis failed. The image might violate safety policies or could not be processed."}
 
-            except (KeyError, IndexError, json.JSONDecodeError) as e:
+            except ValueError as e:
                 if attempt < max_retries - 1:
+                    metrics.upstream_retries_total.inc("gemini_vision")
                     time.sleep(retry_delay)
                     retry_delay *= 2
                     continue
@@ -448,6 +692,7 @@ def detect_waste_from_image_gemini(image_bytes):
             
         except requests.exceptions.Timeout:
             if attempt < max_retries - 1:
+                metrics.upstream_retries_total.inc("gemini_vision")
                 time.sleep(retry_delay)
                 retry_delay *= 2
                 continue
@@ -458,17 +703,50 @@ def detect_waste_from_image_gemini(image_bytes):
     return get_fallback_detection()
 
 
+# --- Upload Validation ---
+def read_image_upload():
+    """Read and validate the 'image' upload of a detection request, returning (bytes, mime_type)
+
+    Raises InvalidUpload (with the status to answer) for anything Gemini could not analyse,
+    including dark, blank or blurry photos, which get a 422 asking the user to retake them.
+    """
+    # Must be set before anything reads the body
+    request.upload_limit = MAX_UPLOAD_BYTES
+    try:
+        file = request.files.get('image')
+    except RequestEntityTooLarge:
+        raise InvalidUpload(UPLOAD_TOO_LARGE_MESSAGE, 413)
+    if file is None:
+        raise InvalidUpload("No image file provided")
+
+    with timing.stage("upload_read"):
+        image_bytes = file.read()
+    with timing.stage("upload_check"):
+        mime_type, _ = validate_image_upload(image_bytes)
+    with timing.stage("quality_check"):
+        quality = measure_image_quality(image_bytes)
+    problem = quality_problem(quality)
+    if problem:
+        metrics.image_quality_rejections_total.inc(problem)
+        raise InvalidUpload(RETAKE_MESSAGES[problem], 422, {"retake": True, "reason": problem, "quality": quality})
+    return image_bytes, mime_type
+
+@api.app_errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    message = UPLOAD_TOO_LARGE_MESSAGE if request.upload_limit is not None else REQUEST_TOO_LARGE_MESSAGE
+    return jsonify({"error": message}), 413
+
 # --- API Endpoint ---
-@app.route('/api/detect', methods=['POST'])
+@api.route('/api/detect', methods=['POST'])
+@admission_control('detect', rate_per_minute=20, burst=5, max_in_flight=32)
 def detect_waste_endpoint():
-    if 'image' not in request.files:
-        return jsonify({"error": "No image file provided"}), 400
-
-    file = request.files['image']
-    image_bytes = file.read()
+    try:
+        image_bytes, mime_type = read_image_upload()
+    except InvalidUpload as e:
+        return jsonify(e.to_dict()), e.status
     
     # Call the new Gemini-based detection function
-    analysis_result = detect_waste_from_image_gemini(image_bytes)
+    analysis_result = detect_waste_from_image_gemini(image_bytes, mime_type, detection_coordinates())
 
     if isinstance(analysis_result, dict) and "error" in analysis_result:
         return jsonify(analysis_result), 500
@@ -497,18 +775,18 @@ def detect_waste_endpoint():
 
 # --- Mobile App Specific Endpoints ---
 
-@app.route('/api/mobile/detect', methods=['POST'])
+@api.route('/api/mobile/detect', methods=['POST'])
+@admission_control('mobile_detect', rate_per_minute=20, burst=5, max_in_flight=32)
 def mobile_detect_waste_endpoint():
     """Mobile-optimized waste detection endpoint"""
     try:
-        if 'image' not in request.files:
-            return jsonify({"error": "No image file provided"}), 400
-
-        file = request.files['image']
-        image_bytes = file.read()
+        try:
+            image_bytes, mime_type = read_image_upload()
+        except InvalidUpload as e:
+            return jsonify(e.to_dict()), e.status
         
         # Call the detection function
-        analysis_result = detect_waste_from_image_gemini(image_bytes)
+        analysis_result = detect_waste_from_image_gemini(image_bytes, mime_type, detection_coordinates())
 
         if isinstance(analysis_result, dict) and "error" in analysis_result:
             return jsonify(analysis_result), 500
@@ -535,7 +813,218 @@ def mobile_detect_waste_endpoint():
     except Exception as e:
         return jsonify({"error": "Detection failed", "details": str(e)}), 500
 
-@app.route('/api/mobile/report-garbage', methods=['POST'])
+# --- Detection History ---
+def detection_coordinates():
+    """Optional latitude/longitude form fields of a detection request, as floats or (None, None)"""
+    try:
+        latitude = float(request.form['latitude'])
+        longitude = float(request.form['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, None
+    return latitude, longitude
+
+def record_detections(image_bytes, detections, latitude=None, longitude=None):
+    """Queue compact records of a detection for the history writer (never blocks)"""
+    if DETECTION_HISTORY == "off":
+        return
+    region, _ = region_map.assign(None, latitude, longitude)
+    detection_recorder.record(detection_records(detections, image_hash(image_bytes), latitude, longitude, region))
+
+def _store_detections(batch):
+    """Insert a batch of detection records into MongoDB and add it to the daily rollups"""
+    db[DETECTION_COLLECTION].insert_many(batch, ordered=False)
+    # One upsert per (day, region, item) in the batch, however many records it holds
+    db[DETECTION_ROLLUP_COLLECTION].bulk_write([
+        UpdateOne(
+            {"_id": f"{day}|{region}|{item}"},
+            {
+                "$setOnInsert": {"day": day, "region": region, "item": item},
+                "$inc": {"count": count, "reusable": reusable, "confidence_sum": confidence_sum}
+            },
+            upsert=True
+        )
+        for (day, region, item), (count, reusable, confidence_sum) in rollup(batch).items()
+    ], ordered=False)
+
+def _write_detections(batch):
+    """Store a batch of detection records and add it to the daily rollups"""
+    if requests_collection is not None:
+        _store_detections(batch)
+    else:
+        detection_log.append(batch)
+
+def import_file_detections():
+    """Fold detections.jsonl, written while MongoDB was unreachable, into MongoDB
+
+    Runs on every (re)connection, so analytics served from the MongoDB rollups include
+    outages. Returns the number of records moved.
+    """
+    if requests_collection is None:
+        return 0
+    try:
+        return detection_log.drain(_store_detections, DETECTION_BATCH_SIZE)
+    except Exception as e:
+        # Batches not stored stay in the log for the next reconnection
+        mongodb_state["last_error"] = f"Importing detection history failed: {e}"
+        return 0
+
+detection_recorder = DetectionRecorder(_write_detections)
+
+DETECTION_ANALYTICS_MAX_LIMIT = 100
+
+@api.route('/api/analytics/detections', methods=['GET'])
+@conditional_json
+def detection_analytics():
+    """Most detected items and detection counts per period, from the daily rollups
+
+    Query parameters: since and until (ISO dates; the last 30 days by default), period
+    (day, week or month), region and limit (top items, at most 100).
+    """
+    period = request.args.get('period', 'day')
+    if period not in ANALYTICS_PERIODS:
+        return jsonify({"error": f"period must be one of {', '.join(ANALYTICS_PERIODS)}"}), 400
+    try:
+        limit = min(DETECTION_ANALYTICS_MAX_LIMIT, max(1, int(request.args.get('limit', 10))))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    since, until = default_window()
+    try:
+        if request.args.get('since'):
+            since = _parse_export_date(request.args['since']).date().isoformat()
+        if request.args.get('until'):
+            until = _parse_export_date(request.args['until']).date().isoformat()
+    except ValueError:
+        return jsonify({"error": "Invalid date. Use ISO 8601, e.g. 2024-01-31"}), 400
+    try:
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        if requests_collection is not None:
+            query = {"day": {"$gte": since, "$lte": until}}
+            if region is not None:
+                query["region"] = region
+            rows = [
+                (row["day"], row["item"], row["count"], row["reusable"], row["confidence_sum"])
+                for row in db[DETECTION_ROLLUP_COLLECTION].find(query, {"_id": 0, "region": 0})
+            ]
+        else:
+            rows = detection_log.rollup_rows(since, until, region)
+    except Exception as e:
+        return jsonify({"error": "Failed to fetch detection analytics"}), 500
+
+    return jsonify({
+        "since": since,
+        "until": until,
+        "period": period,
+        "region": region,
+        **summarize(rows, period, limit)
+    }), 200
+
+# --- Idempotent Report Submissions ---
+recent_submissions = RecentResponses()
+
+def find_submitted_report(report_id):
+    """(report, fingerprint) of a stored submission, or (None, None)
+
+    The report is as serialize_report returns it, without its image data; fingerprint is
+    None for reports stored before submissions were fingerprinted.
+    """
+    try:
+        if requests_collection is not None:
+            found = list(requests_collection.aggregate([
+                {"$match": {"_id": report_id}},
+                {"$addFields": {"has_image": {"$or": ["$image_data", "$image_blob", "$image_filename", "$image"]}}},
+                {"$project": {"image_data": 0, "image_variants": 0, "image_etag": 0}}
+            ]))
+            if found:
+                has_image = found[0].pop("has_image")
+                report = serialize_report(found[0])
+                report["has_image"] = bool(has_image)
+                return report, found[0].get("request_fingerprint")
+        # Also covers reports saved to the file fallback before MongoDB came back
+        record = report_log.get(str(report_id)) or spooled_reports([report_id]).get(str(report_id))
+        if record:
+            return serialize_report(record), record.get("request_fingerprint")
+    except Exception:
+        pass
+    return None, None
+
+def idempotent_submission(replay_response):
+    """Answer retries of a report submission with the report the first attempt created
+
+    Requests without a key run as before. With one, the view finds the report id to use
+    in g.report_id and the submission's fingerprint to store in g.request_fingerprint, and
+    replay_response(report) rebuilds its success body from a stored report when the
+    in-memory copy of the response has expired. Keys are scoped to the client's address,
+    and a key reused with a different submission gets 422.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                key = idempotency_key(request)
+            except InvalidIdempotencyKey as e:
+                return jsonify({"error": str(e)}), 400
+            if key is None:
+                return view(*args, **kwargs)
+
+            scoped_key = f"{client_key()}|{key}"
+            cache_key = f"{request.endpoint}:{scoped_key}"
+            fingerprint = request_fingerprint(request)
+            with recent_submissions.lock(cache_key):
+                replayed = recent_submissions.get(cache_key)
+                if replayed is None:
+                    report, stored_fingerprint = find_submitted_report(report_id_for_key(scoped_key))
+                    if report is not None:
+                        replayed = (replay_response(report), 200, stored_fingerprint)
+                metrics.record_cache("idempotency_key", replayed is not None)
+                if replayed is not None:
+                    if replayed[2] is not None and replayed[2] != fingerprint:
+                        return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used for a different report"}), 422
+                    response = make_response(jsonify(replayed[0]), replayed[1])
+                    response.headers['Idempotent-Replayed'] = 'true'
+                    return response
+
+                g.report_id = report_id_for_key(scoped_key)
+                g.request_fingerprint = fingerprint
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    recent_submissions.put(cache_key, response.get_json(), 200, fingerprint)
+                return response
+        return wrapper
+    return decorator
+
+def mobile_report_response(report, message="Garbage report submitted successfully!"):
+    """Success body of /api/mobile/report-garbage for a serialized report"""
+    report_id = report.get("_id") or report.get("id")
+    return {
+        "success": True,
+        "message": message,
+        "report_id": report_id,
+        "report": {
+            "id": report_id,
+            "type": report.get("type"),
+            "location": report.get("location"),
+            "description": report.get("description"),
+            "status": report.get("status"),
+            "createdAt": report.get("createdAt"),
+            "has_image": report.get("has_image", False)
+        }
+    }
+
+def web_report_response(report):
+    """Success body of /api/report-garbage for a serialized report"""
+    return {
+        "message": "Garbage report submitted successfully! Municipal authorities have been notified.",
+        "report": report
+    }
+
+@api.route('/api/mobile/report-garbage', methods=['POST'])
+@idempotent_submission(mobile_report_response)
 def mobile_report_garbage_endpoint():
     """Mobile-optimized garbage reporting endpoint"""
     try:
@@ -596,6 +1085,11 @@ def mobile_report_garbage_endpoint():
         if not location.strip() and (not latitude or not longitude):
             return jsonify({"error": "Location information is required"}), 400
         
+        try:
+            region, region_source = assign_report_region(latitude, longitude)
+        except InvalidRegion as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Store image in MongoDB if provided
         image_data = None
         image_filename = None
@@ -614,54 +1108,46 @@ def mobile_report_garbage_endpoint():
             "submittedBy": "Mobile App User",
             "image_filename": image_filename,
             "image_data": image_data,  # Store binary image data directly in MongoDB
+            "image_etag": content_etag(image_data) if image_data else None,
             "status": "pending",
+            "region": region,
+            "region_source": region_source,
             "createdAt": datetime.utcnow(),
             "updatedAt": datetime.utcnow(),
             "source": "mobile_app"
         }
         
         # Save to database
-        if requests_collection is not None:
-            result = requests_collection.insert_one(report_data)
-            report_data["_id"] = str(result.inserted_id)
+        if requests_collection is not None or should_spool_reports():
+            if g.get('report_id') is not None:
+                report_data["_id"] = g.report_id
+                report_data["request_fingerprint"] = g.request_fingerprint
+            if should_spool_reports():
+                # Acknowledged once fsynced to the spool; the flusher inserts it into MongoDB
+                spool_report(report_data)
+            else:
+                store_report(report_data)
             
-            return jsonify({
-                "success": True,
-                "message": "Garbage report submitted successfully!",
-                "report_id": str(result.inserted_id),
-                "report": {
-                    "id": str(result.inserted_id),
-                    "type": report_data["type"],
-                    "location": report_data["location"],
-                    "description": report_data["description"],
-                    "status": report_data["status"],
-                    "createdAt": report_data["createdAt"].isoformat(),
-                    "has_image": image_data is not None
-                }
-            }), 200
+            return jsonify(mobile_report_response(serialize_report(report_data))), 200
         else:
             # Fallback to file storage (for development)
-            import json
-            import uuid
-            
-            report_data["id"] = str(uuid.uuid4())
+            # ObjectId strings, so the report keeps its id when imported into MongoDB later
+            report_data["id"] = str(g.report_id) if g.get('report_id') is not None else str(ObjectId())
+            if g.get('report_id') is not None:
+                report_data["request_fingerprint"] = g.request_fingerprint
             report_data["createdAt"] = report_data["createdAt"].isoformat()
             report_data["updatedAt"] = report_data["updatedAt"].isoformat()
             
-            # Remove binary data for JSON storage
+            # Keep the image in the blob store; JSON records only reference it
+            if image_data:
+                report_data["image_blob"], _, _ = blob_store.put_bytes(image_data)
             report_data.pop("image_data", None)
+            report_data.pop("image_etag", None)
             
-            reports_file = "reports.json"
             try:
-                existing_reports = []
-                if os.path.exists(reports_file):
-                    with open(reports_file, 'r') as f:
-                        existing_reports = json.load(f)
-                
-                existing_reports.append(report_data)
-                
-                with open(reports_file, 'w') as f:
-                    json.dump(existing_reports, f, indent=2)
+                report_log.insert(report_data)
+                publish_report_event("report-created", serialize_report(report_data))
+                publish_stats_event()
                 
                 return jsonify({
                     "success": True,
@@ -675,83 +1161,440 @@ def mobile_report_garbage_endpoint():
     except Exception as e:
         return jsonify({"error": "Failed to submit report", "details": str(e)}), 500
 
-@app.route('/api/mobile/dashboard', methods=['GET'])
+@api.route('/api/mobile/dashboard', methods=['GET'])
+@conditional_json
 def mobile_dashboard_endpoint():
-    """Mobile-optimized dashboard data endpoint"""
+    """Mobile-optimized dashboard data endpoint (?region= for one municipality)"""
+    try:
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         if requests_collection is not None:
             # Get statistics
-            total_count = requests_collection.count_documents({})
-            pending_count = requests_collection.count_documents({"status": "pending"})
-            approved_count = requests_collection.count_documents({"status": "approved"})
-            rejected_count = requests_collection.count_documents({"status": "rejected"})
+            stats = compute_report_stats(region)
             
-            # Get recent reports (last 10)
-            recent_reports = list(requests_collection.find().sort("createdAt", -1).limit(10))
-            
-            # Convert ObjectId to string and exclude binary data
-            for req in recent_reports:
-                req["_id"] = str(req["_id"])
-                req["createdAt"] = req["createdAt"].isoformat()
-                req["updatedAt"] = req["updatedAt"].isoformat()
-                # Remove binary image data to prevent JSON serialization error
-                req.pop("image_data", None)
-                # Add a flag to indicate if image exists
-                req["has_image"] = "image_data" in req or "image_filename" in req
+            # Get recent reports (last 10), flagging images without sending the binary data
+            recent_reports = [serialize_report(report) for report in requests_collection.aggregate([
+                {"$match": {"region": region} if region is not None else {}},
+                {"$sort": {"createdAt": -1}},
+                {"$limit": 10},
+                *LISTED_REPORT_STAGES
+            ])]
             
             return jsonify({
                 "success": True,
-                "stats": {
-                    "total": total_count,
-                    "pending": pending_count,
-                    "approved": approved_count,
-                    "rejected": rejected_count
-                },
+                "stats": stats,
                 "recent_reports": recent_reports
             }), 200
         else:
             # Fallback to file storage
-            import json
-            reports_file = "reports.json"
-            
-            if os.path.exists(reports_file):
-                with open(reports_file, 'r') as f:
-                    reports_list = json.load(f)
-                
-                total_count = len(reports_list)
-                pending_count = len([r for r in reports_list if r.get("status") == "pending"])
-                approved_count = len([r for r in reports_list if r.get("status") == "approved"])
-                rejected_count = len([r for r in reports_list if r.get("status") == "rejected"])
-                
-                # Get recent reports
-                recent_reports = sorted(reports_list, key=lambda x: x.get("createdAt", ""), reverse=True)[:10]
-                
-                return jsonify({
-                    "success": True,
-                    "stats": {
-                        "total": total_count,
-                        "pending": pending_count,
-                        "approved": approved_count,
-                        "rejected": rejected_count
-                    },
-                    "recent_reports": recent_reports
-                }), 200
-            else:
-                return jsonify({
-                    "success": True,
-                    "stats": {
-                        "total": 0,
-                        "pending": 0,
-                        "approved": 0,
-                        "rejected": 0
-                    },
-                    "recent_reports": []
-                }), 200
+            return jsonify({
+                "success": True,
+                "stats": compute_report_stats(region),
+                "recent_reports": [serialize_report(report) for report in report_log.list(limit=10, region=region)]
+            }), 200
         
     except Exception as e:
         return jsonify({"error": "Failed to fetch dashboard data"}), 500
 
-@app.route('/api/mobile/update-status', methods=['PUT'])
+# --- Report Statistics and Live Events ---
+report_events = EventBus(journal=EventJournal(EVENT_JOURNAL) if EVENT_JOURNAL else None)
+change_stream_active = False
+_change_stream_thread = None
+
+# Seconds between keep-alive comments on idle SSE connections
+SSE_HEARTBEAT_SECONDS = 15
+
+def compute_report_stats(region=None):
+    """Count reports by status in a single pass, archived reports included
+
+    With a region only that region's reports are counted, using the region indexes.
+    """
+    stats = {"total": 0, "pending": 0, "approved": 0, "rejected": 0}
+    scope = {"region": region} if region is not None else {}
+    if requests_collection is not None:
+        pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+        if scope:
+            pipeline.insert(0, {"$match": scope})
+        for group in requests_collection.aggregate(pipeline):
+            stats["total"] += group["count"]
+            if group["_id"] in stats:
+                stats[group["_id"]] = group["count"]
+        # Only resolved reports are archived; each count is answered from the status index
+        archive = archive_collection()
+        for status in ARCHIVE_STATUSES if archive is not None else ():
+            archived = archive.count_documents({**scope, "status": status})
+            stats[status] += archived
+            stats["total"] += archived
+    else:
+        stats = report_log.stats(region)
+        for status, count in report_archive_log.stats(region).items():
+            stats[status] = stats.get(status, 0) + count
+    return stats
+
+def archive_collection():
+    """The MongoDB collection of archived reports, or None while MongoDB is unavailable"""
+    database = db
+    if requests_collection is None or database is None:
+        return None
+    return database[ARCHIVE_COLLECTION]
+
+def include_archived_requested():
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+def requested_region():
+    """The ?region= of a read endpoint, or None for every region; raises InvalidRegion"""
+    region = request.args.get('region')
+    return region_map.validate(region) if region else None
+
+def assign_report_region(latitude, longitude):
+    """(region, region_source) of a new report, from its region field or its coordinates"""
+    body = request.get_json(silent=True) if request.is_json else None
+    explicit = body.get('region') if isinstance(body, dict) else request.form.get('region')
+    return region_map.assign(explicit, latitude, longitude)
+
+def merge_newest_first(*report_iterables):
+    """Merge report iterables that are each ordered newest first"""
+    return heapq.merge(*report_iterables, key=lambda report: str(report.get("createdAt") or ""), reverse=True)
+
+# Aggregation stages that flag images and drop the fields clients never see, for
+# pipelines whose results go through serialize_report without their image data
+LISTED_REPORT_STAGES = [
+    {"$addFields": {"has_image": {"$or": ["$image_data", "$image_blob", "$image_filename", "$image"]}}},
+    {"$project": {"image_data": 0, "image_variants": 0, "image_etag": 0, "request_fingerprint": 0}}
+]
+
+def serialize_report(report):
+    """Copy of a report that is safe to send to clients (no binary image data)
+
+    A has_image flag already computed by LISTED_REPORT_STAGES is kept, since the image
+    data it was derived from has been projected out.
+    """
+    report = dict(report)
+    has_image = bool(
+        report.pop("image_data", None) or report.pop("has_image", False)
+        or report.get("image_blob") or report.get("image_filename") or report.get("image")
+    )
+    report.pop("image_variants", None)
+    report.pop("image_etag", None)
+    report.pop("request_fingerprint", None)
+    if "_id" in report:
+        report["_id"] = str(report["_id"])
+    for field in ("createdAt", "updatedAt"):
+        if isinstance(report.get(field), datetime):
+            report[field] = report[field].isoformat()
+    report["has_image"] = has_image
+    return report
+
+def publish_report_event(event_type, data):
+    """Publish a report event on the bus unless a change stream is already feeding it"""
+    if change_stream_active or not (report_events.shared or report_events.has_subscribers()):
+        return
+    report_events.publish(event_type, data)
+
+def publish_stats_event():
+    """Push fresh statistics to connected dashboards after a batch of changes"""
+    if change_stream_active:
+        return
+    if report_events.shared:
+        # Workers with open streams compute the statistics when the event reaches them
+        report_events.publish("stats", None)
+    elif report_events.has_subscribers():
+        report_events.publish("stats", compute_report_stats())
+
+@lru_cache(maxsize=64)
+def stats_for_event(event_id, region):
+    """Statistics sent with a stats event, computed once per event and region for all streams"""
+    return compute_report_stats(region)
+
+def start_change_stream_watcher():
+    """Start the background thread that feeds the event bus from a MongoDB change stream"""
+    global _change_stream_thread
+    if requests_collection is None:
+        return
+    if _change_stream_thread is not None and _change_stream_thread.is_alive():
+        return
+    _change_stream_thread = threading.Thread(target=_watch_report_changes, name="report-change-stream", daemon=True)
+    _change_stream_thread.start()
+
+def _watch_report_changes():
+    global change_stream_active
+    # Only new reports and status changes matter; variant generation and other updates are ignored
+    pipeline = [
+        {"$match": {"$or": [
+            {"operationType": "insert"},
+            {"updateDescription.updatedFields.status": {"$exists": True}}
+        ]}},
+        {"$project": {"fullDocument.image_data": 0, "fullDocument.image_variants": 0, "updateDescription": 0}}
+    ]
+    resume_token = None
+    retry_delay = 1
+
+    while requests_collection is not None:
+        try:
+            with requests_collection.watch(pipeline, full_document="updateLookup", resume_after=resume_token, max_await_time_ms=1000) as stream:
+                change_stream_active = True
+                retry_delay = 1
+                while stream.alive:
+                    changes = 0
+                    change = stream.try_next()
+                    while change is not None:
+                        resume_token = stream.resume_token
+                        _publish_change(change, resume_token)
+                        changes += 1
+                        change = stream.try_next()
+                    # One stats event per batch, however many reports changed. Every worker
+                    # watches the same stream, so the id derived from the token is shared.
+                    if changes and report_events.has_subscribers():
+                        report_events.publish("stats", compute_report_stats(), event_id=f"{resume_token.get('_data')}-stats")
+        except OperationFailure:
+            # Change streams need a replica set; standalone servers use the in-process bus
+            change_stream_active = False
+            return
+        except Exception:
+            change_stream_active = False
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+    change_stream_active = False
+
+def _publish_change(change, resume_token):
+    report = change.get("fullDocument")
+    if report is None:
+        return
+    # The change stream resume token doubles as the SSE event id
+    event_id = resume_token.get("_data") if resume_token else None
+    if change["operationType"] == "insert":
+        report_events.publish("report-created", serialize_report(report), event_id=event_id)
+    else:
+        report_events.publish("status-changed", {
+            "id": str(report["_id"]),
+            "status": report.get("status"),
+            "region": report.get("region"),
+            "updatedAt": serialize_report(report).get("updatedAt")
+        }, event_id=event_id)
+
+# --- Durable Report Spool ---
+# "auto" spools whenever MongoDB is the intended store (MONGODB_URI is set, or this process
+# has connected at least once), "always" also spools without either and "off" inserts directly
+REPORT_SPOOL_MODE = os.getenv("REPORT_SPOOL_MODE", "auto")
+REPORT_SPOOL_DIR = os.getenv("REPORT_SPOOL_DIR", "spool")
+REPORT_SPOOL_BATCH_SIZE = int(os.getenv("REPORT_SPOOL_BATCH_SIZE", "100"))
+REPORT_SPOOL_FLUSH_INTERVAL = float(os.getenv("REPORT_SPOOL_FLUSH_INTERVAL", "0.5"))
+
+# A worker that starts while MongoDB is down still spools instead of writing to the file log
+MONGODB_URI_CONFIGURED = bool(os.getenv("MONGODB_URI"))
+
+report_spool = ReportSpool(REPORT_SPOOL_DIR)
+
+def should_spool_reports():
+    """Whether new reports go through the spool instead of a direct insert"""
+    if REPORT_SPOOL_MODE == "off":
+        return False
+    if REPORT_SPOOL_MODE == "always":
+        return True
+    return (
+        MONGODB_URI_CONFIGURED or requests_collection is not None
+        or mongodb_state["last_connected_at"] is not None
+    )
+
+def spool_report(report_data):
+    """Durably queue a report for MongoDB, returning its id"""
+    # The id is assigned up front (unless an idempotency key chose it) so replayed
+    # inserts are recognised as duplicates
+    report_data.setdefault("_id", ObjectId())
+    report_spool.append(report_data)
+    return str(report_data["_id"])
+
+def store_report(report_data):
+    """Insert a report into MongoDB directly, returning its id
+
+    A duplicate id means a retry of the same submission already stored it, which counts
+    as success (and is not announced again).
+    """
+    try:
+        requests_collection.insert_one(report_data)
+    except DuplicateKeyError:
+        return str(report_data["_id"])
+    publish_report_event("report-created", serialize_report(report_data))
+    publish_stats_event()
+    return str(report_data["_id"])
+
+def _flush_spooled_reports(batch):
+    collection = requests_collection
+    if collection is None:
+        raise RuntimeError("MongoDB is not connected")
+
+    remaining = batch
+    while remaining:
+        try:
+            collection.insert_many(remaining, ordered=True)
+            break
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if not errors or errors[0].get("code") != 11000:
+                raise
+            # Ordered inserts stop at the first error; skip the report that is already stored
+            remaining = remaining[errors[0]["index"] + 1:]
+
+    for report in batch:
+        publish_report_event("report-created", serialize_report(report))
+    publish_stats_event()
+
+def spooled_reports(report_ids):
+    """{id: report} for acknowledged reports still waiting in the spool"""
+    if REPORT_SPOOL_MODE == "off" or not report_ids:
+        return {}
+    try:
+        return report_spool.find(report_ids)
+    except Exception:
+        return {}
+
+def _file_report_document(record):
+    """A report_log record as a MongoDB document"""
+    document = dict(record)
+    report_id = document.pop("id", None) or document.get("_id")
+    if ObjectId.is_valid(str(report_id)):
+        document["_id"] = ObjectId(str(report_id))
+    else:
+        # Records from older versions have uuid ids; keep the old id next to the new one
+        document["_id"] = report_id_for_key(f"report-log:{report_id}")
+        document["legacy_id"] = report_id
+    for field in ("createdAt", "updatedAt"):
+        if isinstance(document.get(field), str):
+            try:
+                document[field] = datetime.fromisoformat(document[field])
+            except ValueError:
+                pass
+    return document
+
+def import_file_reports(batch_size=REPORT_SPOOL_BATCH_SIZE):
+    """Move reports saved to the file log while MongoDB was unreachable into MongoDB
+
+    Runs on every (re)connection. Ids are kept, so workers importing at the same time
+    only produce duplicate key errors, which are ignored. Returns the number imported.
+    """
+    collection = requests_collection
+    if collection is None:
+        return 0
+    imported = 0
+    try:
+        records = list(report_log.iter())
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            try:
+                collection.insert_many([_file_report_document(record) for record in batch], ordered=False)
+            except BulkWriteError as e:
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            report_log.delete_many([record.get("id") or record.get("_id") for record in batch])
+            imported += len(batch)
+    except Exception as e:
+        # The rest is retried on the next reconnection
+        mongodb_state["last_error"] = f"Importing file reports failed: {e}"
+    if imported:
+        publish_stats_event()
+    return imported
+
+def _report_spool_flusher():
+    retry_delay = REPORT_SPOOL_FLUSH_INTERVAL
+    while True:
+        time.sleep(retry_delay)
+        if requests_collection is None:
+            continue
+        try:
+            report_spool.rotate()
+            report_spool.drain(_flush_spooled_reports, REPORT_SPOOL_BATCH_SIZE)
+            retry_delay = REPORT_SPOOL_FLUSH_INTERVAL
+        except Exception:
+            retry_delay = min(retry_delay * 2, 30)
+
+# --- Report Status Updates ---
+VALID_STATUSES = ['pending', 'approved', 'rejected']
+MAX_BULK_STATUS_UPDATES = 500
+
+def apply_status_updates(updates):
+    """Apply (report_id, status) pairs in one database round-trip, returning a result per id
+
+    Each report_id may appear only once; callers reject batches that repeat an id.
+    Results are "updated", "not_found", "invalid_id", "invalid_status" or "pending_write"
+    (the report is acknowledged but still in the spool). MongoDB updates are sent as a
+    single unordered bulk_write; the file fallback is read and written once.
+    """
+    results = {}
+    pending = []
+    for report_id, new_status in updates:
+        if new_status not in VALID_STATUSES:
+            results[report_id] = "invalid_status"
+        else:
+            pending.append((report_id, new_status))
+
+    now = datetime.utcnow()
+    # Region of each updated report, so region-filtered streams can route the event
+    regions = {}
+
+    if requests_collection is not None:
+        object_ids = {}
+        for report_id, new_status in pending:
+            try:
+                object_ids[report_id] = ObjectId(report_id)
+            except Exception:
+                results[report_id] = "invalid_id"
+
+        if object_ids:
+            existing = {
+                doc["_id"]: doc.get("region")
+                for doc in requests_collection.find({"_id": {"$in": list(object_ids.values())}}, {"_id": 1, "region": 1})
+            }
+            operations = []
+            for report_id, new_status in pending:
+                if report_id not in object_ids:
+                    continue
+                if object_ids[report_id] not in existing:
+                    results[report_id] = "not_found"
+                    continue
+                operations.append(UpdateOne(
+                    {"_id": object_ids[report_id]},
+                    {"$set": {"status": new_status, "updatedAt": now}}
+                ))
+                results[report_id] = "updated"
+                regions[report_id] = existing[object_ids[report_id]]
+
+            if operations:
+                requests_collection.bulk_write(operations, ordered=False)
+    else:
+        # Fallback to file storage: one append covers the whole batch
+        updated = report_log.update_many({
+            report_id: {"status": new_status, "updatedAt": now.isoformat()}
+            for report_id, new_status in pending
+        })
+        for report_id, new_status in pending:
+            results[report_id] = "updated" if report_id in updated else "not_found"
+        regions = {report_id: record.get("region") for report_id, record in updated.items()}
+
+    missing = [report_id for report_id, result in results.items() if result == "not_found"]
+    for report_id in spooled_reports(missing):
+        results[report_id] = "pending_write"
+
+    # A batch yields one stats event, not one per report
+    changed_reports = [(report_id, new_status) for report_id, new_status in pending if results.get(report_id) == "updated"]
+    for report_id, new_status in changed_reports:
+        publish_report_event("status-changed", {
+            "id": report_id, "status": new_status, "region": regions.get(report_id), "updatedAt": now.isoformat()
+        })
+    if changed_reports:
+        publish_stats_event()
+
+    return results
+
+def report_pending_response():
+    """409 for a report that is acknowledged but not yet written to MongoDB"""
+    response = make_response(jsonify({"error": "Report is still being saved; retry in a moment"}), 409)
+    response.headers['Retry-After'] = '1'
+    return response
+
+@api.route('/api/mobile/update-status', methods=['PUT'])
 def mobile_update_status_endpoint():
     """Mobile-optimized status update endpoint"""
     try:
@@ -765,74 +1608,34 @@ def mobile_update_status_endpoint():
         if not report_id:
             return jsonify({"error": "Report ID is required"}), 400
         
-        if new_status not in ['pending', 'approved', 'rejected']:
+        if new_status not in VALID_STATUSES:
             return jsonify({"error": "Invalid status"}), 400
         
-        if requests_collection is not None:
-            # Update in MongoDB
-            result = requests_collection.update_one(
-                {"_id": ObjectId(report_id)},
-                {
-                    "$set": {
-                        "status": new_status,
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            if result.matched_count == 0:
-                return jsonify({"error": "Report not found"}), 404
-            
-            return jsonify({
-                "success": True,
-                "message": f"Report {new_status} successfully",
-                "report_id": report_id,
-                "status": new_status
-            }), 200
-        else:
-            # Fallback to file storage
-            import json
-            reports_file = "reports.json"
-            
-            if not os.path.exists(reports_file):
-                return jsonify({"error": "Report not found"}), 404
-            
-            with open(reports_file, 'r') as f:
-                reports_list = json.load(f)
-            
-            # Find and update the report
-            report_found = False
-            for req in reports_list:
-                if req.get("_id") == report_id or req.get("id") == report_id:
-                    req["status"] = new_status
-                    req["updatedAt"] = datetime.utcnow().isoformat()
-                    report_found = True
-                    break
-            
-            if not report_found:
-                return jsonify({"error": "Report not found"}), 404
-            
-            # Save back to file
-            with open(reports_file, 'w') as f:
-                json.dump(reports_list, f, indent=2)
-            
-            return jsonify({
-                "success": True,
-                "message": f"Report {new_status} successfully",
-                "report_id": report_id,
-                "status": new_status
-            }), 200
+        result = apply_status_updates([(report_id, new_status)])[report_id]
+        if result == "invalid_id":
+            return jsonify({"error": "Invalid report ID"}), 400
+        if result == "not_found":
+            return jsonify({"error": "Report not found"}), 404
+        if result == "pending_write":
+            return report_pending_response()
+        
+        return jsonify({
+            "success": True,
+            "message": f"Report {new_status} successfully",
+            "report_id": report_id,
+            "status": new_status
+        }), 200
         
     except Exception as e:
         return jsonify({"error": "Failed to update status"}), 500
 
 # --- Health Check Endpoint for Mobile App ---
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint for mobile app"""
     try:
         # Check MongoDB connection
-        db_status = "connected" if requests_collection is not None else "disconnected"
+        db_status = mongodb_state["status"]
         
         # Check uploads directory
         uploads_dir = "uploads"
@@ -842,6 +1645,14 @@ def health_check():
             "status": "healthy",
             "timestamp": datetime.utcnow().isoformat(),
             "database": db_status,
+            "database_details": {
+                "last_error": mongodb_state["last_error"],
+                "last_connected_at": mongodb_state["last_connected_at"],
+                "reconnect_attempts": mongodb_state["reconnect_attempts"],
+                "change_stream_active": change_stream_active,
+                "max_pool_size": MONGODB_MAX_POOL_SIZE,
+                "min_pool_size": MONGODB_MIN_POOL_SIZE
+            },
             "uploads_directory": uploads_status,
             "version": "1.0.0"
         }), 200
@@ -854,7 +1665,13 @@ def health_check():
         }), 500
 
 # --- Existing endpoints with improvements ---
-@app.route('/api/report-garbage', methods=['POST'])
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics, summed over all workers when METRICS_DIR is set"""
+    return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api.route('/api/report-garbage', methods=['POST'])
+@idempotent_submission(web_report_response)
 def report_garbage_endpoint():
     """Endpoint to report garbage with image and location"""
     if 'image' not in request.files:
@@ -874,18 +1691,17 @@ def report_garbage_endpoint():
         if not latitude or not longitude:
             return jsonify({"error": "Location coordinates required"}), 400
         
-        # Save image to local storage (you can modify this to use cloud storage)
-        timestamp = int(time.time())
-        filename = f"garbage_report_{timestamp}_{file.filename}"
-        upload_folder = "uploads"
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
+        try:
+            region, region_source = assign_report_region(latitude, longitude)
+        except InvalidRegion as e:
+            return jsonify({"error": str(e)}), 400
         
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
+        # Save image to the content-addressed blob store (you can modify this to use cloud storage)
+        # Identical photos are stored once and concurrent uploads can never collide
+        image_blob, _, _ = blob_store.put_stream(file.stream)
         
         # Store report in MongoDB (or fallback to file storage)
-        if requests_collection is not None:
+        if requests_collection is not None or should_spool_reports():
             report_data = {
                 "type": "Garbage Report",
                 "location": location_address or f"{latitude}, {longitude}",
@@ -893,52 +1709,52 @@ def report_garbage_endpoint():
                 "longitude": float(longitude),
                 "description": description,
                 "submittedBy": "Anonymous User",
-                "image": filename,
-                "imagePath": file_path,
+                "image_filename": file.filename,
+                "image_blob": image_blob,
                 "status": "pending",
+                "region": region,
+                "region_source": region_source,
                 "createdAt": datetime.utcnow(),
                 "updatedAt": datetime.utcnow()
             }
+            if g.get('report_id') is not None:
+                report_data["_id"] = g.report_id
+                report_data["request_fingerprint"] = g.request_fingerprint
             
-            result = requests_collection.insert_one(report_data)
-            report_data["_id"] = str(result.inserted_id)
+            if should_spool_reports():
+                report_data["_id"] = spool_report(report_data)
+            else:
+                report_data["_id"] = store_report(report_data)
             
             return jsonify({
                 "message": "Garbage report submitted successfully! Municipal authorities have been notified.",
                 "report": report_data
             }), 200
         else:
-            # Fallback: Save to a simple JSON file for testing
-            import json
-            import uuid
-            
+            # Fallback: Save to the local report log for testing
             report_data = {
-                "id": str(uuid.uuid4()),
+                "id": str(g.report_id) if g.get('report_id') is not None else str(ObjectId()),
                 "type": "Garbage Report",
                 "location": location_address or f"{latitude}, {longitude}",
                 "latitude": float(latitude),
                 "longitude": float(longitude),
                 "description": description,
                 "submittedBy": "Anonymous User",
-                "image": filename,
-                "imagePath": file_path,
+                "image_filename": file.filename,
+                "image_blob": image_blob,
                 "status": "pending",
+                "region": region,
+                "region_source": region_source,
                 "createdAt": datetime.utcnow().isoformat(),
                 "updatedAt": datetime.utcnow().isoformat()
             }
+            if g.get('report_id') is not None:
+                report_data["request_fingerprint"] = g.request_fingerprint
             
-            # Save to a JSON file
-            reports_file = "reports.json"
             try:
-                existing_reports = []
-                if os.path.exists(reports_file):
-                    with open(reports_file, 'r') as f:
-                        existing_reports = json.load(f)
-                
-                existing_reports.append(report_data)
-                
-                with open(reports_file, 'w') as f:
-                    json.dump(existing_reports, f, indent=2)
+                report_log.insert(report_data)
+                publish_report_event("report-created", serialize_report(report_data))
+                publish_stats_event()
                 
                 return jsonify({
                     "message": "Garbage report submitted successfully! Municipal authorities have been notified. (Using file storage - MongoDB not available)",
@@ -950,7 +1766,7 @@ def report_garbage_endpoint():
     except Exception as e:
         return jsonify({"error": "Failed to process report"}), 500
 
-@app.route('/api/youtube-suggestions', methods=['POST'])
+@api.route('/api/youtube-suggestions', methods=['POST'])
 def youtube_suggestions_endpoint():
     """Endpoint to get YouTube video suggestions for reusable items"""
     try:
@@ -975,312 +1791,840 @@ def youtube_suggestions_endpoint():
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
-@app.route('/api/gemini-classify', methods=['POST'])
+def classify_items_with_keywords(items):
+    """Fallback classification based on common patterns, used when Gemini is unavailable"""
+    metrics.fallback_activations_total.inc("classify_items_with_keywords")
+    useful_keywords = ['phone', 'laptop', 'computer', 'book', 'chair', 'table', 'clothing', 'shoes']
+    waste_keywords = ['bottle', 'can', 'wrapper', 'packaging', 'trash', 'garbage', 'broken', 'damaged']
+
+    classified_items = []
+    for item in items:
+        item_name = item.get('name', '').lower()
+        confidence = item.get('confidence', 0)
+
+        is_waste = any(keyword in item_name for keyword in waste_keywords)
+        is_useful = any(keyword in item_name for keyword in useful_keywords)
+
+        if is_waste and not is_useful:
+            classification = True  # is_waste
+        elif is_useful and not is_waste:
+            classification = False  # not waste
+        else:
+            # Default to waste if uncertain
+            classification = True
+
+        classified_items.append({
+            'name': item.get('name'),
+            'confidence': confidence,
+            'is_waste': classification,
+            'reasoning': "Fallback classification based on keywords"
+        })
+    return classified_items
+
+@api.route('/api/gemini-classify', methods=['POST'])
+@admission_control('gemini_classify', rate_per_minute=60, burst=20, max_in_flight=32)
 def gemini_classification_endpoint():
     """Use Gemini AI to classify detected items as waste or useful objects"""
     try:
-        data = request.get_json()
-        items = data.get('items', [])
+        data = request.get_json(silent=True)
+        # Entries that are not {"name": ...} objects would break the prompt and the fallback
+        items = validate_items(data.get('items') if isinstance(data, dict) else None, DETECTED_ITEM_SCHEMA)
         
         if not items:
             return jsonify({'error': 'No items provided'}), 400
         
         if not GEMINI_API_KEY:
-            # Fallback: classify based on common patterns
-            classified_items = []
-            for item in items:
-                item_name = item.get('name', '').lower()
-                confidence = item.get('confidence', 0)
-                
-                # Simple fallback classification
-                useful_keywords = ['phone', 'laptop', 'computer', 'book', 'chair', 'table', 'clothing', 'shoes']
-                waste_keywords = ['bottle', 'can', 'wrapper', 'packaging', 'trash', 'garbage', 'broken', 'damaged']
-                
-                is_waste = any(keyword in item_name for keyword in waste_keywords)
-                is_useful = any(keyword in item_name for keyword in useful_keywords)
-                
-                if is_waste and not is_useful:
-                    classification = True  # is_waste
-                elif is_useful and not is_waste:
-                    classification = False  # not waste
-                else:
-                    # Default to waste if uncertain
-                    classification = True
-                
-                classified_items.append({
-                    'name': item.get('name'),
-                    'confidence': confidence,
-                    'is_waste': classification,
-                    'reasoning': f"Fallback classification based on keywords"
-                })
-            
             return jsonify({
                 'success': True,
-                'classified_items': classified_items
+                'classified_items': classify_items_with_keywords(items)
             })
         
         # Use Gemini AI for intelligent classification
-        prompt = f"""
-        You are a waste classification expert. Analyze the following detected objects and determine if they are actual waste (items that should be disposed of or recycled) or useful objects (items that are still functional and valuable).
-
-        Detected items: {json.dumps(items, indent=2)}
-
-        For each item, respond with a JSON object containing:
-        - name: the item name
-        - confidence: the original confidence score
-        - is_waste: true if it's actual waste, false if it's a useful object
-        - reasoning: brief explanation of your classification
-
-        Consider:
-        - Waste: bottles, cans, wrappers, broken items, expired food, disposable items
-        - Useful objects: phones, laptops, books, furniture, clothing, tools, electronics
-
-        Return only the JSON array of classified items.
-        """
+        prompt = classify_prompt(items, prompt_mode("classify"))
         
         # Call Gemini API
         headers = {
             "Content-Type": "application/json",
         }
         
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }]
-        }
-        
-        response = requests.post(
+        response = gemini_request(
+            "gemini_classify",
             f"{GEMINI_URL}?key={GEMINI_API_KEY}",
             headers=headers,
-            json=payload
+            json=text_payload(prompt),
+            timeout=UPSTREAM_TIMEOUT
         )
         
         if response.status_code == 200:
             result = response.json()
-            if 'candidates' in result and result['candidates']:
-                content = result['candidates'][0]['content']['parts'][0]['text']
-                
-                # Extract JSON from Gemini response
-                try:
-                    # Find JSON array in the response
-                    start_idx = content.find('[')
-                    end_idx = content.rfind(']') + 1
-                    if start_idx != -1 and end_idx != 0:
-                        json_str = content[start_idx:end_idx]
-                        classified_items = json.loads(json_str)
-                        
-                        return jsonify({
-                            'success': True,
-                            'classified_items': classified_items
-                        })
-                    else:
-                        raise ValueError("No JSON array found in response")
-                        
-                except (json.JSONDecodeError, ValueError) as e:
-                    # Fallback to simple classification
-                    return gemini_classification_endpoint()
-            else:
-                return gemini_classification_endpoint()
-        else:
-            return gemini_classification_endpoint()
+            record_gemini_usage("classify", result)
+            classified_items = parse_gemini_items("gemini_classify", result, CLASSIFICATION_SCHEMA).items
+            if classified_items:
+                return jsonify({
+                    'success': True,
+                    'classified_items': classified_items
+                })
+        
+        # Gemini failed or returned nothing usable: fall back to simple classification
+        return jsonify({
+            'success': True,
+            'classified_items': classify_items_with_keywords(items)
+        })
             
     except Exception as e:
         return jsonify({'error': 'Failed to classify items'}), 500
 
-@app.route('/api/requests', methods=['GET'])
+@api.route('/api/requests', methods=['GET'])
+@conditional_json
 def get_all_requests():
-    """Get all garbage reports for municipal dashboard"""
+    """Get all garbage reports for municipal dashboard
+
+    Archived reports (resolved and older than ARCHIVE_AFTER_DAYS) are only included with
+    ?include_archived=true; they carry an archivedAt field. ?region= limits the list to
+    one municipality.
+    """
     try:
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        include_archived = include_archived_requested()
         if requests_collection is not None:
             # Get all requests from MongoDB, ordered by creation date (newest first)
-            requests_list = list(requests_collection.find().sort("createdAt", -1))
-            
-            # Convert ObjectId to string for JSON serialization
-            for req in requests_list:
-                req["_id"] = str(req["_id"])
-                req["createdAt"] = req["createdAt"].isoformat()
-                req["updatedAt"] = req["updatedAt"].isoformat()
-            
-            return jsonify({"requests": requests_list}), 200
+            pipeline = [
+                {"$match": {"region": region} if region is not None else {}},
+                {"$sort": {"createdAt": -1}},
+                *LISTED_REPORT_STAGES
+            ]
+            requests_list = requests_collection.aggregate(pipeline)
+            archive = archive_collection() if include_archived else None
+            if archive is not None:
+                requests_list = merge_newest_first(requests_list, archive.aggregate(pipeline))
         else:
-            # Fallback: Read from JSON file
-            import json
-            reports_file = "reports.json"
-            
-            if os.path.exists(reports_file):
-                with open(reports_file, 'r') as f:
-                    requests_list = json.load(f)
-                # Sort by creation date (newest first)
-                requests_list.sort(key=lambda x: x.get("createdAt", ""), reverse=True)
-            else:
-                requests_list = []
-            
-            return jsonify({"requests": requests_list}), 200
+            # Fallback: Read from the local report log (newest first)
+            requests_list = report_log.list(region=region)
+            if include_archived:
+                requests_list = merge_newest_first(requests_list, report_archive_log.iter(region))
+
+        return jsonify({"requests": [serialize_report(report) for report in requests_list]}), 200
         
     except Exception as e:
         return jsonify({"error": "Failed to fetch requests"}), 500
 
-@app.route('/api/requests/<request_id>/status', methods=['PUT'])
+@api.route('/api/requests/<request_id>/status', methods=['PUT'])
 def update_request_status(request_id):
     """Update the status of a garbage report (approve/reject)"""
     try:
         data = request.get_json()
         new_status = data.get('status')
         
-        if new_status not in ['pending', 'approved', 'rejected']:
+        if new_status not in VALID_STATUSES:
             return jsonify({"error": "Invalid status"}), 400
         
-        if requests_collection is not None:
-            # Update in MongoDB
-            result = requests_collection.update_one(
-                {"_id": ObjectId(request_id)},
-                {
-                    "$set": {
-                        "status": new_status,
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            if result.matched_count == 0:
-                return jsonify({"error": "Request not found"}), 404
-            
-            return jsonify({"message": f"Request {new_status} successfully"}), 200
-        else:
-            # Fallback: Update in JSON file
-            import json
-            reports_file = "reports.json"
-            
-            if not os.path.exists(reports_file):
-                return jsonify({"error": "Request not found"}), 404
-            
-            with open(reports_file, 'r') as f:
-                requests_list = json.load(f)
-            
-            # Find and update the request
-            request_found = False
-            for req in requests_list:
-                if req.get("id") == request_id:
-                    req["status"] = new_status
-                    req["updatedAt"] = datetime.utcnow().isoformat()
-                    request_found = True
-                    break
-            
-            if not request_found:
-                return jsonify({"error": "Request not found"}), 404
-            
-            # Save back to file
-            with open(reports_file, 'w') as f:
-                json.dump(requests_list, f, indent=2)
-            
-            return jsonify({"message": f"Request {new_status} successfully"}), 200
+        result = apply_status_updates([(request_id, new_status)])[request_id]
+        if result == "invalid_id":
+            return jsonify({"error": "Invalid request ID"}), 400
+        if result == "not_found":
+            return jsonify({"error": "Request not found"}), 404
+        if result == "pending_write":
+            return report_pending_response()
+        
+        return jsonify({"message": f"Request {new_status} successfully"}), 200
         
     except Exception as e:
         return jsonify({"error": "Failed to update request status"}), 500
 
-@app.route('/api/requests/stats', methods=['GET'])
+@api.route('/api/requests/bulk-status', methods=['POST'])
+def bulk_update_request_status():
+    """Update the status of many garbage reports at once (moderator approve/reject)
+
+    Accepts either {"updates": [{"id": ..., "status": ...}, ...]} or
+    {"ids": [...], "status": ...} and returns a result for every entry. A batch that
+    lists the same id twice is rejected, since only one of its statuses could apply.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        if 'updates' in data:
+            if not isinstance(data['updates'], list):
+                return jsonify({"error": "Updates must be a list"}), 400
+            updates = []
+            for update in data['updates']:
+                if not isinstance(update, dict) or not update.get('id'):
+                    return jsonify({"error": "Each update needs an id and a status"}), 400
+                updates.append((str(update['id']), update.get('status')))
+        elif 'ids' in data:
+            if not isinstance(data['ids'], list):
+                return jsonify({"error": "Ids must be a list"}), 400
+            updates = [(str(report_id), data.get('status')) for report_id in data['ids']]
+        else:
+            return jsonify({"error": "No updates provided"}), 400
+
+        if not updates:
+            return jsonify({"error": "No updates provided"}), 400
+        if len(updates) > MAX_BULK_STATUS_UPDATES:
+            return jsonify({"error": f"At most {MAX_BULK_STATUS_UPDATES} updates per request"}), 400
+        seen_ids = set()
+        for report_id, _ in updates:
+            if report_id in seen_ids:
+                return jsonify({"error": f"Report {report_id} is listed more than once"}), 400
+            seen_ids.add(report_id)
+
+        results = apply_status_updates(updates)
+
+        return jsonify({
+            "success": True,
+            "updated": sum(1 for result in results.values() if result == "updated"),
+            "results": [
+                {"id": report_id, "status": new_status, "result": results[report_id]}
+                for report_id, new_status in updates
+            ]
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to update request statuses"}), 500
+
+# --- Archival of Resolved Reports ---
+def spooled_image_blobs():
+    """Blob digests of reports still waiting in the spool"""
+    if REPORT_SPOOL_MODE == "off":
+        return set()
+    return {document.get("image_blob") for document in report_spool.documents()}
+
+def _archived_copy(report, archived_at, summary, replaced_blobs):
+    """The archive version of a report: no variants and a re-encoded, smaller image"""
+    archived = dict(report)
+    archived.pop("image_variants", None)
+    archived["archivedAt"] = archived_at
+
+    if archived.get("image_data"):
+        original = archived["image_data"]
+        smaller = shrink_image(original)
+        if smaller:
+            archived["image_data"] = smaller
+            archived["image_etag"] = content_etag(smaller)
+            archived["image_content_type"] = "image/jpeg"
+            summary["images_shrunk"] += 1
+            summary["bytes_saved"] += len(original) - len(smaller)
+    elif archived.get("image_blob") and blob_store.exists(archived["image_blob"]):
+        with open(blob_store.path(archived["image_blob"]), "rb") as f:
+            original = f.read()
+        smaller = shrink_image(original)
+        if smaller:
+            replaced_blobs.add(archived["image_blob"])
+            archived["image_blob"], _, _ = blob_store.put_bytes(smaller)
+            archived["image_content_type"] = "image/jpeg"
+            summary["images_shrunk"] += 1
+            summary["bytes_saved"] += len(original) - len(smaller)
+    return archived
+
+def archive_resolved_reports(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """Move approved/rejected reports older than the cutoff out of the hot store
+
+    Returns counts of archived reports and re-encoded images, and the bytes saved. Each
+    batch is written to the archive before it is removed from the hot store, and copying
+    a report twice is a no-op, so an interrupted run is finished by the next one.
+    """
+    started = time.time()
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    summary = {"archived": 0, "images_shrunk": 0, "bytes_saved": 0, "dry_run": dry_run}
+    replaced_blobs = set()
+
+    if requests_collection is not None:
+        collection, archive = requests_collection, archive_collection()
+        query = {"status": {"$in": list(ARCHIVE_STATUSES)}, "createdAt": {"$lt": cutoff}}
+        if dry_run:
+            summary["archived"] = collection.count_documents(query)
+            return summary
+
+        while True:
+            batch = list(collection.find(query, {"image_variants": 0}).sort("createdAt", 1).limit(batch_size))
+            if not batch:
+                break
+            archived_at = datetime.utcnow()
+            try:
+                archive.insert_many([_archived_copy(report, archived_at, summary, replaced_blobs) for report in batch], ordered=False)
+            except BulkWriteError as e:
+                # Reports copied by an interrupted run are already archived
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            collection.delete_many({"_id": {"$in": [report["_id"] for report in batch]}})
+            summary["archived"] += len(batch)
+
+        # The spool is read first: a report drained from it meanwhile is in the collection
+        referenced = spooled_image_blobs()
+        referenced |= set(collection.distinct("image_blob")) | set(archive.distinct("image_blob"))
+    else:
+        cutoff_iso = cutoff.isoformat()
+        candidates = [
+            report for report in report_log.iter()
+            if report.get("status") in ARCHIVE_STATUSES and (report.get("createdAt") or "") < cutoff_iso
+        ]
+        if dry_run:
+            summary["archived"] = len(candidates)
+            return summary
+
+        # Oldest first, so each compressed member holds reports from the same period
+        candidates.reverse()
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            archived_at = datetime.utcnow().isoformat()
+            report_archive_log.append([_archived_copy(report, archived_at, summary, replaced_blobs) for report in batch])
+            report_log.delete_many([report.get("id") or report.get("_id") for report in batch])
+            summary["archived"] += len(batch)
+
+        referenced = spooled_image_blobs()
+        referenced |= {report.get("image_blob") for report in report_log.iter()}
+        referenced |= {report.get("image_blob") for report in report_archive_log.iter()}
+
+    # Originals no report points at any more (identical photos share a blob), unless an
+    # upload reused one while this run was going
+    for digest in replaced_blobs - referenced:
+        blob_store.delete_if_untouched(digest, started - ARCHIVE_BLOB_GRACE_SECONDS)
+    if summary["archived"]:
+        publish_stats_event()
+    return summary
+
+# --- Region Assignment of Existing Reports ---
+def _region_update(report, reassign):
+    """{region, region_source} for a report that needs (re)assigning, or None"""
+    if report.get("region_source") == "explicit" or (report.get("region") and not reassign):
+        return None
+    region, source = region_map.assign(None, report.get("latitude"), report.get("longitude"))
+    if report.get("region") == region and report.get("region_source") == source:
+        return None
+    return {"region": region, "region_source": source}
+
+def assign_report_regions(reassign=False, batch_size=500):
+    """Give every report without a region the one its coordinates fall in
+
+    With reassign=True reports placed by coordinates (or the default) are located again,
+    e.g. after REGIONS_FILE changed; explicitly chosen regions are never touched. Archived
+    reports are included. Returns the number of reports updated per store.
+    """
+    summary = {"reports": 0, "archived": 0}
+
+    if requests_collection is not None:
+        query = {} if reassign else {"region": {"$exists": False}}
+        projection = {"latitude": 1, "longitude": 1, "region": 1, "region_source": 1}
+        for key, collection in (("reports", requests_collection), ("archived", archive_collection())):
+            operations = []
+            for report in collection.find(query, projection):
+                fields = _region_update(report, reassign)
+                if fields is None:
+                    continue
+                operations.append(UpdateOne({"_id": report["_id"]}, {"$set": fields}))
+                if len(operations) >= batch_size:
+                    summary[key] += collection.bulk_write(operations, ordered=False).modified_count
+                    operations = []
+            if operations:
+                summary[key] += collection.bulk_write(operations, ordered=False).modified_count
+    else:
+        updates = {}
+        for report in report_log.iter():
+            fields = _region_update(report, reassign)
+            if fields is not None:
+                updates[report.get("id") or report.get("_id")] = fields
+        pending = list(updates.items())
+        for start in range(0, len(pending), batch_size):
+            summary["reports"] += len(report_log.update_many(dict(pending[start:start + batch_size])))
+
+        def locate(report):
+            fields = _region_update(report, reassign)
+            if fields is not None:
+                report.update(fields)
+            return report
+        summary["archived"] = report_archive_log.rewrite(locate)
+
+    if summary["reports"] or summary["archived"]:
+        publish_stats_event()
+    return summary
+
+@api.route('/api/regions', methods=['GET'])
+def list_regions():
+    """Configured regions, for the dashboards' region picker"""
+    return jsonify({"regions": region_map.describe(), "default": DEFAULT_REGION}), 200
+
+# --- Report Search ---
+SEARCH_DEFAULT_PER_PAGE = 20
+SEARCH_MAX_PER_PAGE = 100
+SEARCH_MAX_QUERY_LENGTH = 200
+
+@api.route('/api/requests/search', methods=['GET'])
+@conditional_json
+def search_requests():
+    """Full-text search over report descriptions and locations, best matches first
+
+    Query parameters: q (required; reports matching any of its words are returned),
+    status (comma separated), since and until (ISO dates on createdAt), region, page (from 1)
+    and per_page (at most 100). MongoDB answers from its text index and the file fallback
+    from an in-memory inverted index, so neither scans the whole history.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Search query (q) is required"}), 400
+    if len(query) > SEARCH_MAX_QUERY_LENGTH:
+        return jsonify({"error": f"Search query must be at most {SEARCH_MAX_QUERY_LENGTH} characters"}), 400
+
+    statuses = [status for status in request.args.get('status', '').split(',') if status]
+    if any(status not in VALID_STATUSES for status in statuses):
+        return jsonify({"error": "Invalid status"}), 400
+
+    try:
+        since = _parse_export_date(request.args.get('since'))
+        until = _parse_export_date(request.args.get('until'))
+    except ValueError:
+        return jsonify({"error": "Invalid date. Use ISO 8601, e.g. 2024-01-31"}), 400
+
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(SEARCH_MAX_PER_PAGE, max(1, int(request.args.get('per_page', SEARCH_DEFAULT_PER_PAGE))))
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    offset = (page - 1) * per_page
+
+    try:
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        if requests_collection is not None:
+            filters = {"$text": {"$search": query}}
+            if region is not None:
+                filters["region"] = region
+            if statuses:
+                filters["status"] = {"$in": statuses}
+            if since or until:
+                filters["createdAt"] = {}
+                if since:
+                    filters["createdAt"]["$gte"] = since
+                if until:
+                    filters["createdAt"]["$lt"] = until
+            try:
+                total = requests_collection.count_documents(filters)
+                cursor = requests_collection.find(
+                    filters, {"score": {"$meta": "textScore"}, "image_data": 0, "image_variants": 0, "image_etag": 0, "request_fingerprint": 0}
+                ).sort([("score", {"$meta": "textScore"}), ("createdAt", -1)]).skip(offset).limit(per_page)
+                results = [serialize_report(report) for report in cursor]
+            except OperationFailure:
+                # The text index is created when MongoDB connects; it may not exist yet
+                return jsonify({"error": "Search is not available yet. Try again shortly."}), 503
+        else:
+            total, matches = report_log.search(
+                query, statuses,
+                since.isoformat() if since else None,
+                until.isoformat() if until else None,
+                offset, per_page, region
+            )
+            results = []
+            for score, report in matches:
+                report = serialize_report(report)
+                report["score"] = round(score, 4)
+                results.append(report)
+
+        return jsonify({
+            "query": query,
+            "results": results,
+            "total": total,
+            "page": page,
+            "per_page": per_page
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to search requests"}), 500
+
+# Columns written by the CSV export, in order
+EXPORT_CSV_FIELDS = [
+    "id", "type", "status", "region", "description", "location", "latitude", "longitude",
+    "submittedBy", "source", "createdAt", "updatedAt", "has_image"
+]
+# Rows buffered per chunk sent to the client
+EXPORT_CHUNK_ROWS = 200
+
+def _parse_export_date(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def iter_export_reports(statuses, since, until, include_archived=False, region=None):
+    """Yield matching reports newest first without holding the whole history in memory"""
+    if requests_collection is not None:
+        query = {"region": region} if region is not None else {}
+        if statuses:
+            query["status"] = {"$in": statuses}
+        if since or until:
+            query["createdAt"] = {}
+            if since:
+                query["createdAt"]["$gte"] = since
+            if until:
+                query["createdAt"]["$lt"] = until
+        collections = [requests_collection]
+        if include_archived and archive_collection() is not None:
+            collections.append(archive_collection())
+        cursors = [
+            collection.find(
+                query, {"image_data": 0, "image_variants": 0, "image_etag": 0, "request_fingerprint": 0}
+            ).sort("createdAt", -1).batch_size(500)
+            for collection in collections
+        ]
+        for report in merge_newest_first(*cursors):
+            yield serialize_report(report)
+    else:
+        reports = report_log.iter(region)
+        if include_archived:
+            reports = merge_newest_first(reports, report_archive_log.iter(region))
+        for report in reports:
+            if statuses and report.get("status") not in statuses:
+                continue
+            created_at = report.get("createdAt") or ""
+            if since and created_at < since.isoformat():
+                continue
+            if until and created_at >= until.isoformat():
+                continue
+            yield serialize_report(report)
+
+@api.route('/api/requests/export', methods=['GET'])
+def export_requests():
+    """Stream every matching report as NDJSON or CSV for municipal analysts
+
+    Query parameters: format=ndjson|csv (default ndjson), status (comma separated),
+    since and until (ISO dates on createdAt), region and include_archived. Rows are
+    streamed from the cursor, so memory stays flat however long the history is.
+    """
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "Invalid format. Use ndjson or csv"}), 400
+
+    statuses = [status for status in request.args.get('status', '').split(',') if status]
+    if any(status not in VALID_STATUSES for status in statuses):
+        return jsonify({"error": "Invalid status"}), 400
+
+    try:
+        since = _parse_export_date(request.args.get('since'))
+        until = _parse_export_date(request.args.get('until'))
+    except ValueError:
+        return jsonify({"error": "Invalid date. Use ISO 8601, e.g. 2024-01-31"}), 400
+
+    try:
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
+    reports = iter_export_reports(statuses, since, until, include_archived_requested(), region)
+    filename = f"reports-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+
+    if export_format == 'csv':
+        import csv
+        from io import StringIO
+
+        def generate():
+            buffer = StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            # The header goes out before the first database round-trip
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            for count, report in enumerate(reports, 1):
+                report["id"] = report.get("_id") or report.get("id")
+                writer.writerow(report)
+                if count % EXPORT_CHUNK_ROWS == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+        mimetype = 'text/csv'
+    else:
+        def generate():
+            chunk = []
+            for report in reports:
+                chunk.append(json.dumps(report, default=str))
+                if len(chunk) >= EXPORT_CHUNK_ROWS:
+                    yield "\n".join(chunk) + "\n"
+                    chunk = []
+            if chunk:
+                yield "\n".join(chunk) + "\n"
+
+        mimetype = 'application/x-ndjson'
+
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'
+    })
+
+@api.route('/api/requests/stats', methods=['GET'])
+@conditional_json
 def get_request_stats():
-    """Get statistics for municipal dashboard"""
+    """Get statistics for municipal dashboard (?region= for one municipality)"""
     try:
-        if not requests_collection:
-            return jsonify({"error": "Database connection failed"}), 500
-        
-        # Count requests by status
-        pending_count = requests_collection.count_documents({"status": "pending"})
-        approved_count = requests_collection.count_documents({"status": "approved"})
-        rejected_count = requests_collection.count_documents({"status": "rejected"})
-        total_count = requests_collection.count_documents({})
-        
-        stats = {
-            "pending": pending_count,
-            "approved": approved_count,
-            "rejected": rejected_count,
-            "total": total_count
-        }
-        
-        return jsonify(stats), 200
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify(compute_report_stats(region)), 200
         
     except Exception as e:
         return jsonify({"error": "Failed to fetch stats"}), 500
 
-@app.route('/api/requests/<request_id>/image', methods=['GET'])
+@api.route('/api/requests/stream', methods=['GET'])
+def stream_requests():
+    """Push report-created, status-changed and stats events to dashboards (Server-Sent Events)
+
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to receive the events they
+    missed; if those are no longer available a "reset" event asks them to reload in full.
+    With ?region= only that region's reports are sent and stats cover that region alone.
+    Each open stream holds a worker thread, so run with threaded or async workers.
+    """
+    try:
+        region = requested_region()
+    except InvalidRegion as e:
+        return jsonify({"error": str(e)}), 400
+
+    start_change_stream_watcher()
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription, backlog, resumed = report_events.subscribe(last_event_id)
+    try:
+        initial_stats = compute_report_stats(region)
+    except Exception:
+        report_events.unsubscribe(subscription)
+        return jsonify({"error": "Failed to fetch stats"}), 500
+
+    def scoped(event):
+        """The event as this client should see it, or None if it belongs to another region"""
+        event_id, event_type, data = event
+        if event_type == "stats" and (data is None or region is not None):
+            # Shared stats events carry no numbers, and published ones cover every region
+            return event_id, event_type, stats_for_event(event_id, region)
+        if region is None:
+            return event
+        if isinstance(data, dict) and "id" in data and data.get("region") != region:
+            return None
+        return event
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            if not resumed:
+                yield format_sse(None, "reset", {"reason": "Missed events are no longer available"})
+            for event in filter(None, map(scoped, backlog)):
+                yield format_sse(*event)
+            yield format_sse(None, "stats", initial_stats)
+
+            while True:
+                try:
+                    event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    yield format_sse(None, "reset", {"reason": "Client fell behind"})
+                    return
+                event = scoped(event)
+                if event is not None:
+                    yield format_sse(*event)
+        finally:
+            report_events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def serve_image_file(image_path, content_type, variant, etag=None, generated_path=None):
+    """Serve an image file from disk, generating variants on first request
+
+    Variants are kept at generated_path (by default under uploads/variants/). send_file
+    hands the open file to the WSGI server's file wrapper, which gunicorn serves with
+    sendfile(2), so image bytes are never copied through Python.
+    """
+    if variant != "original":
+        generated_path = generated_path or variant_path(image_path, variant)
+        variant_exists = os.path.exists(generated_path)
+        metrics.record_cache("image_variant_file", variant_exists)
+        if not variant_exists:
+            with open(image_path, 'rb') as f:
+                generated = generate_variant(f.read(), variant)
+            if generated:
+                os.makedirs(os.path.dirname(generated_path), exist_ok=True)
+                # Write to a temporary file first so concurrent readers never see a partial variant
+                tmp_path = f"{generated_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(generated[0])
+                os.replace(tmp_path, generated_path)
+        if os.path.exists(generated_path):
+            image_path = generated_path
+            content_type = 'image/jpeg'
+            etag = None
+
+    # Blobs are named by their content hash, so only legacy files and variants need hashing
+    etag = etag or file_etag(image_path)
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+
+    response = send_file(os.path.abspath(image_path), mimetype=content_type, conditional=True, etag=etag, max_age=IMAGE_CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def image_lost_response(name):
+    return jsonify({
+        "error": f"Image file not found: {name}",
+        "message": "Image may have been lost during deployment. This is a known issue with Railway's ephemeral file system."
+    }), 404
+
+def serve_blob_image(digest, filename, variant, content_type=None):
+    """Serve an image from the content-addressed blob store"""
+    image_path = blob_store.path(digest)
+    if not os.path.exists(image_path):
+        return image_lost_response(filename or digest)
+    return serve_image_file(image_path, content_type or guess_content_type(filename), variant, etag=digest,
+                            generated_path=blob_store.variant_path(digest, variant))
+
+def serve_archived_image(report, variant):
+    """Serve the image of a whole report document (archived or still spooled)
+
+    Variants are generated per request, not stored.
+    """
+    content_type = report.get("image_content_type") or guess_content_type(report.get("image_filename") or "")
+    image_data = report.get("image_data")
+    if image_data:
+        data, etag = image_data, report.get("image_etag") or content_etag(image_data)
+        if variant != "original":
+            generated = generate_variant(image_data, variant)
+            if generated:
+                data, content_type = generated
+                etag = content_etag(data)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        return image_response(data, content_type, etag)
+    if report.get("image_blob"):
+        return serve_blob_image(report["image_blob"], report.get("image_filename"), variant, content_type)
+    if report.get("image"):
+        return serve_uploaded_image(report["image"], variant)
+    return jsonify({"error": "No image associated with this report"}), 404
+
+def serve_uploaded_image(image_filename, variant):
+    """Serve an image saved directly in the uploads/ folder by older versions"""
+    upload_folder = "uploads"
+    image_path = os.path.join(upload_folder, image_filename)
+
+    if not os.path.exists(image_path):
+        return image_lost_response(image_filename)
+    return serve_image_file(image_path, guess_content_type(image_filename), variant)
+
+@api.route('/api/requests/<request_id>/image', methods=['GET'])
 def get_request_image(request_id):
-    """Get the image for a specific request from MongoDB"""
+    """Get the image for a specific request from MongoDB
+
+    Accepts ?variant=thumbnail|medium|original (default original) and include_archived to
+    also look up archived reports. Responses carry a strong ETag and long-lived cache
+    headers, and honour If-None-Match and Range.
+    """
     try:
+        variant = request.args.get('variant', 'original')
+        if variant not in VARIANTS:
+            return jsonify({"error": f"Invalid variant. Use one of: {', '.join(VARIANTS)}"}), 400
+
         if requests_collection is not None:
-            # Find the request in MongoDB
-            request_data = requests_collection.find_one({"_id": ObjectId(request_id)})
+            # Load only the metadata first so conditional requests never pull the image bytes
+            request_data = requests_collection.find_one(
+                {"_id": ObjectId(request_id)},
+                {"image_data": 0, "image_variants.thumbnail.data": 0, "image_variants.medium.data": 0}
+            )
             if not request_data:
+                archive = archive_collection() if include_archived_requested() else None
+                archived = archive.find_one({"_id": ObjectId(request_id)}) if archive is not None else None
+                if archived:
+                    return serve_archived_image(archived, variant)
+                spooled = spooled_reports([request_id]).get(request_id)
+                if spooled:
+                    return serve_archived_image(spooled, variant)
                 return jsonify({"error": "Request not found"}), 404
-            
+
+            stored_variant = (request_data.get("image_variants") or {}).get(variant)
+            if variant != "original":
+                metrics.record_cache("image_variant_mongodb", bool(stored_variant))
+            if stored_variant:
+                etag = stored_variant["etag"]
+            else:
+                etag = request_data.get("image_etag") if variant == "original" else None
+            if is_not_modified(etag):
+                return not_modified_response(etag)
+
+            if stored_variant:
+                image_doc = requests_collection.find_one({"_id": request_data["_id"]}, {f"image_variants.{variant}.data": 1})
+                return image_response(image_doc["image_variants"][variant]["data"], stored_variant["content_type"], etag)
+
             # Get image data from MongoDB
-            image_data = request_data.get("image_data")
+            image_doc = requests_collection.find_one({"_id": request_data["_id"]}, {"image_data": 1})
+            image_data = image_doc.get("image_data")
             if not image_data:
+                # Reports from /api/report-garbage keep their image in uploads/
+                if request_data.get("image_blob"):
+                    return serve_blob_image(request_data["image_blob"], request_data.get("image_filename"), variant)
+                if request_data.get("image"):
+                    return serve_uploaded_image(request_data["image"], variant)
                 return jsonify({"error": "No image associated with this report"}), 404
-            
-            # Create response with image data
-            from io import BytesIO
-            from flask import Response
-            
-            # Determine content type based on filename
-            filename = request_data.get("image_filename", "")
-            if filename.lower().endswith('.jpg') or filename.lower().endswith('.jpeg'):
-                content_type = 'image/jpeg'
-            elif filename.lower().endswith('.png'):
-                content_type = 'image/png'
-            else:
-                content_type = 'image/jpeg'  # Default
-            
-            # Return image data directly
-            return Response(image_data, mimetype=content_type)
-            
+
+            updates = {}
+            original_etag = request_data.get("image_etag")
+            if not original_etag:
+                # Older reports were stored without a content hash
+                original_etag = content_etag(image_data)
+                updates["image_etag"] = original_etag
+
+            data, content_type, etag = image_data, guess_content_type(request_data.get("image_filename", "")), original_etag
+            if variant != "original":
+                generated = generate_variant(image_data, variant)
+                if generated:
+                    data, content_type = generated
+                    etag = content_etag(data)
+                    updates[f"image_variants.{variant}"] = {"data": data, "content_type": content_type, "etag": etag}
+
+            if updates:
+                requests_collection.update_one({"_id": request_data["_id"]}, {"$set": updates})
+
+            return image_response(data, content_type, etag)
+
         else:
-            # Fallback: Find the request in JSON file (for development)
-            import json
-            reports_file = "reports.json"
-            
-            if not os.path.exists(reports_file):
-                return jsonify({"error": "Request not found"}), 404
-            
-            with open(reports_file, 'r') as f:
-                requests_list = json.load(f)
-            
-            request_data = None
-            for req in requests_list:
-                if req.get("id") == request_id:
-                    request_data = req
-                    break
+            # Fallback: Find the request in the local report log (for development)
+            request_data = report_log.get(request_id)
             
             if not request_data:
+                archived = report_archive_log.get(request_id) if include_archived_requested() else None
+                if archived:
+                    return serve_archived_image(archived, variant)
+                spooled = spooled_reports([request_id]).get(request_id)
+                if spooled:
+                    return serve_archived_image(spooled, variant)
                 return jsonify({"error": "Request not found"}), 404
             
-            # Check for image field (could be 'image' or 'imagePath')
+            if request_data.get("image_blob"):
+                return serve_blob_image(request_data["image_blob"], request_data.get("image_filename"), variant)
+
+            # Older records name the file directly (could be 'image' or 'imagePath')
             image_filename = request_data.get("image") or request_data.get("imagePath")
             
             if not image_filename:
                 return jsonify({"error": "No image associated with this report"}), 404
             
-            # Construct the full path to the image
-            upload_folder = "uploads"
-            image_path = os.path.join(upload_folder, image_filename)
-            
-            if not os.path.exists(image_path):
-                return jsonify({
-                    "error": f"Image file not found: {image_filename}",
-                    "message": "Image may have been lost during deployment. This is a known issue with Railway's ephemeral file system."
-                }), 404
-            
-            # Return the image file
-            return send_file(image_path, mimetype='image/*')
+            return serve_uploaded_image(image_filename, variant)
         
     except Exception as e:
         return jsonify({"error": "Failed to fetch image"}), 500
 
+app = create_app()
+
 # --- Run the Server ---
 if __name__ == '__main__':
-    # For production, consider using a proper WSGI server like Gunicorn or Waitress
+    # Development only - production runs gunicorn with gunicorn.conf.py (see Procfile)
     # host='0.0.0.0' allows connections from all interfaces (needed for mobile devices)
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
@@ -0,0 +1,286 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+
+from pymongo import monitoring
+
+# --- In-Process Metrics (Prometheus text exposition) ---
+# Each gunicorn worker keeps its own counters. With METRICS_DIR set (gunicorn.conf.py does)
+# every worker also writes them to a file there about once a second, and /metrics sums
+# the files of all workers, so any worker answers a scrape with the whole server's totals.
+# Files of exited workers are kept, so their counts never disappear from the totals.
+# A metric accepts at most MAX_SERIES label combinations, after which new combinations
+# are counted under "other" so a misbehaving label can never grow memory without bound.
+MAX_SERIES = 200
+OVERFLOW_LABEL = "other"
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_WRITE_INTERVAL = float(os.getenv("METRICS_WRITE_INTERVAL", "1"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        self._overflow = (OVERFLOW_LABEL,) * len(self.labelnames)
+
+    def _key(self, labels):
+        # Called with the lock held
+        if labels in self._series or len(self._series) < MAX_SERIES:
+            return labels
+        return self._overflow
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: self._snapshot(value) for labels, value in self._series.items()}
+
+    def render(self, series=None):
+        """Exposition lines for series ({labels: value}, default this process's own)"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        series = self.snapshot() if series is None else series
+        for labels, value in sorted(series.items()):
+            lines.extend(self._render_series(labels, value))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter, e.g. counter.inc("api.detect", "200")"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _snapshot(self, value):
+        return value
+
+    @staticmethod
+    def combine(total, value):
+        return total + value
+
+    def _render_series(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram, e.g. histogram.observe(0.42, "gemini_vision")"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket plus +Inf, then the running sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _snapshot(self, value):
+        return list(value)
+
+    @staticmethod
+    def combine(total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def _render_series(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), value[:-1]):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(value[-1])}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self, directory=METRICS_DIR, write_interval=METRICS_WRITE_INTERVAL):
+        self._metrics = []
+        self.directory = directory
+        self.write_interval = write_interval
+        self._lock = threading.Lock()
+        self._writer_pid = None
+        self._path = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def start_sharing(self):
+        """Start writing this process's values to the metrics directory
+
+        Called on every request; the writer thread is started once per process (again
+        after a fork). A no-op without METRICS_DIR.
+        """
+        if not self.directory or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                # The random part keeps a reused pid from overwriting an exited worker's file
+                self._path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+                self._writer_pid = os.getpid()
+                threading.Thread(target=self._write_loop, name="metrics-writer", daemon=True).start()
+                atexit.register(self.write)
+
+    def write(self):
+        """Replace this process's metrics file with its current values"""
+        if self._writer_pid != os.getpid():
+            return
+        data = {
+            metric.name: [[list(labels), value] for labels, value in metric.snapshot().items()]
+            for metric in self._metrics
+        }
+        temporary = f"{self._path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temporary, self._path)
+
+    def _write_loop(self):
+        while True:
+            time.sleep(self.write_interval)
+            try:
+                self.write()
+            except OSError:
+                pass  # Retried on the next tick
+
+    def _merged(self):
+        """{metric name: {labels: value}} summed over every process's file"""
+        self.write()
+        metrics = {metric.name: metric for metric in self._metrics}
+        merged = {name: {} for name in metrics}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed or replaced while listing
+            for metric_name, series in data.items():
+                metric = metrics.get(metric_name)
+                if metric is None:
+                    continue  # Written by an older version of the app
+                totals = merged[metric_name]
+                for labels, value in series:
+                    labels = tuple(labels)
+                    totals[labels] = metric.combine(totals[labels], value) if labels in totals else value
+        return merged
+
+    def render(self):
+        merged = self._merged() if self._writer_pid == os.getpid() else None
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged[metric.name] if merged is not None else None))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- HTTP Requests ---
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status code",
+    ("route", "method", "status")))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to produce the response (streamed bodies excluded)",
+    ("route", "method")))
+
+# --- Upstream APIs ---
+upstream_requests_total = registry.register(Counter(
+    "upstream_requests_total", "Calls to Gemini and YouTube by target and outcome (HTTP status, timeout or error)",
+    ("target", "status")))
+upstream_request_duration_seconds = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Upstream call latency by target",
+    ("target",)))
+upstream_retries_total = registry.register(Counter(
+    "upstream_retries_total", "Upstream calls repeated after a failed attempt",
+    ("target",)))
+gemini_hedges_total = registry.register(Counter(
+    "gemini_hedges_total", "Gemini calls that outlived the hedge delay, by which call answered first",
+    ("target", "outcome")))
+gemini_parse_outcomes_total = registry.register(Counter(
+    "gemini_parse_outcomes_total", "Parsed Gemini answers by call site and outcome (ok, recovered, invalid or blocked)",
+    ("target", "outcome")))
+gemini_calls_total = registry.register(Counter(
+    "gemini_calls_total", "Gemini calls answered with a response body, by call site and prompt mode",
+    ("call_site", "mode")))
+gemini_tokens_total = registry.register(Counter(
+    "gemini_tokens_total", "Tokens reported in Gemini usageMetadata by call site, prompt mode and kind (prompt, cached, output, thoughts or total)",
+    ("call_site", "mode", "kind")))
+fallback_activations_total = registry.register(Counter(
+    "fallback_activations_total", "Responses served from canned fallbacks instead of the upstream API",
+    ("fallback",)))
+
+detection_history_records_total = registry.register(Counter(
+    "detection_history_records_total", "Detection history records by outcome (written, dropped or failed)",
+    ("outcome",)))
+
+image_quality_rejections_total = registry.register(Counter(
+    "image_quality_rejections_total", "Detection photos rejected before Gemini as too dark, bright, blank or blurry",
+    ("reason",)))
+
+# --- MongoDB ---
+mongodb_command_duration_seconds = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by command and outcome",
+    ("command", "outcome")))
+
+# --- Caches ---
+cache_lookups_total = registry.register(Counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit or miss)",
+    ("cache", "result")))
+
+
+def record_cache(cache, hit):
+    cache_lookups_total.inc(cache, "hit" if hit else "miss")
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener that times every command the driver sends"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongodb_command_duration_seconds.observe(event.duration_micros / 1e6, event.command_name, "success")
+
+    def failed(self, event):
+        mongodb_command_duration_seconds.observe(event.duration_micros / 1e6, event.command_name, "failure")
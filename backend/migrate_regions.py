@@ -0,0 +1,35 @@
+"""Assign a region to reports stored before regions existed
+
+Run from the backend folder once after deploying regions, and again with --reassign
+whenever REGIONS_FILE changes:
+
+  python migrate_regions.py
+  python migrate_regions.py --reassign
+
+Reports are located from their coordinates (those outside every region get DEFAULT_REGION).
+Regions chosen explicitly by the submitter are kept. Both the requests collection and the
+archive are updated when MongoDB is reachable, and the report log files otherwise.
+"""
+import argparse
+import json
+import sys
+
+import main
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reassign", action="store_true", help="also re-locate reports that already have a region")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    # Connect once in this thread; without MongoDB the file fallback is migrated instead
+    if not main.connect_mongodb():
+        print(f"MongoDB unavailable ({main.mongodb_state['last_error']}); migrating the file fallback", file=sys.stderr)
+    summary = main.assign_report_regions(args.reassign, args.batch_size)
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
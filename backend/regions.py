@@ -0,0 +1,121 @@
+import json
+import os
+import re
+
+# --- Regions (Municipalities) ---
+# Every report belongs to one region. A client may name it explicitly (region field);
+# otherwise it is found from the report's coordinates using the polygons in REGIONS_FILE,
+# a GeoJSON FeatureCollection whose features carry an "id" (and optionally a "name")
+# property. Reports outside every polygon, or without coordinates, get DEFAULT_REGION.
+REGIONS_FILE = os.getenv("REGIONS_FILE", "regions.geojson")
+DEFAULT_REGION = os.getenv("DEFAULT_REGION", "unassigned")
+
+_REGION_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+class InvalidRegion(ValueError):
+    pass
+
+
+def _ring_contains(ring, lng, lat):
+    # Ray casting; ring is a list of [lng, lat] positions
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class Region:
+    """A named area made of one or more polygons (each an outer ring plus holes)"""
+
+    __slots__ = ("id", "name", "polygons", "bbox")
+
+    def __init__(self, region_id, name, polygons):
+        self.id = region_id
+        self.name = name
+        self.polygons = polygons
+        positions = [position for polygon in polygons for position in polygon[0]]
+        self.bbox = (
+            min(p[0] for p in positions), min(p[1] for p in positions),
+            max(p[0] for p in positions), max(p[1] for p in positions),
+        )
+
+    def contains(self, lat, lng):
+        min_lng, min_lat, max_lng, max_lat = self.bbox
+        if not (min_lng <= lng <= max_lng and min_lat <= lat <= max_lat):
+            return False
+        for outer, *holes in self.polygons:
+            if _ring_contains(outer, lng, lat) and not any(_ring_contains(hole, lng, lat) for hole in holes):
+                return True
+        return False
+
+
+class RegionMap:
+    """The configured regions, checked in file order (the first match wins)"""
+
+    def __init__(self, regions=()):
+        self.regions = list(regions)
+        self._ids = {region.id for region in self.regions}
+
+    @classmethod
+    def from_geojson(cls, data):
+        regions = []
+        for feature in data.get("features", []):
+            properties = feature.get("properties") or {}
+            region_id = str(properties.get("id", "")).strip().lower()
+            if not _REGION_ID.match(region_id):
+                raise ValueError(f"Region feature needs an id matching {_REGION_ID.pattern}: {properties}")
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                raise ValueError(f"Region {region_id} must be a Polygon or MultiPolygon")
+            regions.append(Region(region_id, properties.get("name") or region_id, polygons))
+        return cls(regions)
+
+    @classmethod
+    def load(cls, path):
+        """Regions from a GeoJSON file, or no regions if the file does not exist"""
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_geojson(json.load(f))
+
+    def locate(self, latitude, longitude):
+        """Id of the region containing the point, or None"""
+        for region in self.regions:
+            if region.contains(latitude, longitude):
+                return region.id
+        return None
+
+    def validate(self, region_id):
+        """Normalise a region id from a client, raising InvalidRegion if it is not known"""
+        region_id = str(region_id).strip().lower()
+        if not _REGION_ID.match(region_id):
+            raise InvalidRegion("Invalid region")
+        # Without configured polygons any well-formed id is accepted
+        if self.regions and region_id not in self._ids and region_id != DEFAULT_REGION:
+            raise InvalidRegion(f"Unknown region: {region_id}")
+        return region_id
+
+    def assign(self, explicit=None, latitude=None, longitude=None):
+        """(region, source) for a report, where source is explicit, coordinates or default"""
+        if explicit not in (None, ""):
+            return self.validate(explicit), "explicit"
+        try:
+            region_id = self.locate(float(latitude), float(longitude))
+        except (TypeError, ValueError):
+            region_id = None
+        if region_id is not None:
+            return region_id, "coordinates"
+        return DEFAULT_REGION, "default"
+
+    def describe(self):
+        return [{"id": region.id, "name": region.name} for region in self.regions]
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional - without it archived images keep their original size
+    Image = None
+    ImageOps = None
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get the in-process lock
+    fcntl = None
+
+# --- Archive of Resolved Reports ---
+# Approved and rejected reports older than ARCHIVE_AFTER_DAYS leave the hot store: the
+# requests collection moves them to requests_archive, and the file fallback moves them
+# from the report log to a gzip-compressed JSONL file. Every field except image variants
+# is kept, so stats and date-based totals still count them. Images are re-encoded once
+# at ARCHIVE_IMAGE_MAX_EDGE pixels, which is plenty for reviewing an old report.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_STATUSES = ("approved", "rejected")
+ARCHIVE_IMAGE_MAX_EDGE = int(os.getenv("ARCHIVE_IMAGE_MAX_EDGE", "1024"))
+ARCHIVE_IMAGE_QUALITY = int(os.getenv("ARCHIVE_IMAGE_QUALITY", "70"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+# Replaced originals reused by an upload this long before the run started are kept: the
+# report pointing at them may still be on its way to the store
+ARCHIVE_BLOB_GRACE_SECONDS = 3600
+
+
+def shrink_image(image_bytes):
+    """Re-encode an image for the archive, returning JPEG bytes or None if it would not shrink"""
+    if Image is None or not image_bytes:
+        return None
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((ARCHIVE_IMAGE_MAX_EDGE, ARCHIVE_IMAGE_MAX_EDGE))
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            output = BytesIO()
+            img.save(output, format="JPEG", quality=ARCHIVE_IMAGE_QUALITY, optimize=True, progressive=True)
+    except Exception:
+        return None
+    data = output.getvalue()
+    return data if len(data) < len(image_bytes) else None
+
+
+def _record_id(record):
+    return record.get("id") or record.get("_id")
+
+
+class _ArchiveEntry:
+    """Which gzip member holds an archived report, plus the fields needed for stats, sorting and region filters"""
+
+    __slots__ = ("offset", "length", "status", "created_at", "region")
+
+    def __init__(self, offset, length, record):
+        self.offset = offset
+        self.length = length
+        self.status = record.get("status")
+        self.created_at = record.get("createdAt") or ""
+        self.region = record.get("region")
+
+
+class ArchiveLog:
+    """Compressed, append-only JSONL archive: each append() adds one gzip member
+
+    Concatenated gzip members are still one valid .gz file (zcat reads it whole). The
+    in-memory index maps ids to the member holding them, so get() inflates a single batch,
+    and it catches up with appends by other processes from the last member it has seen.
+    The archival job appends and migrate_regions.py rewrites the file, so both take an
+    exclusive file lock; readers notice a rewritten file by its inode and rebuild the index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._index = {}
+        self._end = 0
+        self._inode = None
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Bring the index up to date with appends or rewrites made by other processes"""
+        if not os.path.exists(self.path):
+            self._index, self._end, self._inode = {}, 0, None
+            return
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            # Rewritten (or replaced) since we last looked: rebuild from the start
+            self._index, self._end, self._inode = {}, 0, stat.st_ino
+        size = stat.st_size
+        if size == self._end:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._end)
+            data = f.read(size - self._end)
+        offset = 0
+        while offset < len(data):
+            inflater = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            try:
+                text = inflater.decompress(data[offset:])
+            except zlib.error:
+                break
+            if not inflater.eof:
+                # A member still being written
+                break
+            length = len(data) - offset - len(inflater.unused_data)
+            for line in text.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    self._index[_record_id(record)] = _ArchiveEntry(self._end + offset, length, record)
+            offset += length
+        self._end += offset
+
+    def _read_member(self, entry, f=None):
+        """Records of the member at entry, read through f if given (an open handle on the indexed file)"""
+        if f is None:
+            with open(self.path, "rb") as f:
+                return self._read_member(entry, f)
+        f.seek(entry.offset)
+        text = zlib.decompress(f.read(entry.length), zlib.MAX_WBITS | 16)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    @staticmethod
+    def _member(records):
+        body = "".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in records)
+        compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        return compressor.compress(body.encode("utf-8")) + compressor.flush()
+
+    def append(self, records):
+        """Archive a batch of reports as one compressed member"""
+        if not records:
+            return
+        member = self._member(records)
+        with self._locked(exclusive=True):
+            self._refresh()
+            with open(self.path, "ab") as f:
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+
+    def get(self, report_id):
+        """An archived report, or None"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            entry = self._index.get(report_id)
+            if entry is None:
+                return None
+            for record in self._read_member(entry):
+                if _record_id(record) == report_id:
+                    return record
+        return None
+
+    def rewrite(self, transform):
+        """Pass every archived record through transform and atomically replace the file
+
+        The batches (members) are kept as they are. Returns how many records changed.
+        """
+        with self._locked(exclusive=True):
+            self._refresh()
+            offsets = sorted({(entry.offset, entry.length) for entry in self._index.values()})
+            changed = 0
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                for offset, length in offsets:
+                    records = []
+                    for record in self._read_member(_ArchiveEntry(offset, length, {})):
+                        updated = transform(dict(record))
+                        changed += updated != record
+                        records.append(updated)
+                    f.write(self._member(records))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._refresh()
+            return changed
+
+    def iter(self, region=None):
+        """Yield archived reports newest first, keeping one inflated member in memory
+
+        The file is opened while the index is current, so a rewrite during iteration
+        (which replaces the file) does not invalidate the offsets being read.
+        """
+        with self._locked(exclusive=False):
+            self._refresh()
+            ordered = sorted(
+                ((report_id, entry) for report_id, entry in self._index.items() if region is None or entry.region == region),
+                key=lambda item: item[1].created_at, reverse=True
+            )
+            if not ordered:
+                return
+            f = open(self.path, "rb")
+        with f:
+            members = {}
+            for report_id, entry in ordered:
+                if entry.offset not in members:
+                    # Batches are archived in date order, so neighbouring reports usually share a member
+                    members = {entry.offset: {_record_id(record): record for record in self._read_member(entry, f)}}
+                record = members[entry.offset].get(report_id)
+                if record is not None:
+                    yield record
+
+    def stats(self, region=None):
+        """Archived report counts by status (optionally for one region), from the index alone"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            stats = {"total": 0, "pending": 0, "approved": 0, "rejected": 0}
+            for entry in self._index.values():
+                if region is not None and entry.region != region:
+                    continue
+                stats["total"] += 1
+                if entry.status in stats:
+                    stats[entry.status] += 1
+            return stats
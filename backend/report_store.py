@@ -0,0 +1,309 @@
+import heapq
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from text_index import InvertedIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get the in-process lock
+    fcntl = None
+
+# --- Append-Only Report Log (file storage fallback) ---
+# Compact once superseded versions outnumber live records by this ratio (and the minimum)
+COMPACTION_RATIO = 1.0
+COMPACTION_MIN_DEAD_RECORDS = 500
+
+
+def _record_id(record):
+    return record.get("id") or record.get("_id")
+
+
+class _IndexEntry:
+    """Where the latest version of a report lives, plus the fields needed for stats, sorting and region filters"""
+
+    __slots__ = ("offset", "length", "status", "created_at", "region")
+
+    def __init__(self, offset, length, record):
+        self.offset = offset
+        self.length = length
+        self.status = record.get("status")
+        self.created_at = record.get("createdAt") or ""
+        self.region = record.get("region")
+
+
+class ReportLog:
+    """JSONL report store: every insert or update appends the full record as one line
+
+    An in-memory id -> offset index points at the latest version of each report, so reads
+    seek straight to the records they need. Writers take an exclusive file lock and fsync
+    each append; other processes notice the file growing (or being compacted) and catch up
+    before they read. Compaction rewrites only the live records and swaps them in with an
+    atomic rename. With text_fields ({field: weight}), an inverted index over those
+    fields is kept up to date the same way and backs search().
+    """
+
+    def __init__(self, path, legacy_path=None, text_fields=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.RLock()
+        self._index = {}
+        self._text = InvertedIndex(text_fields) if text_fields else None
+        self._dead_records = 0
+        self._end = 0
+        self._inode = None
+
+    # --- Locking and index maintenance ---
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _migrate_legacy(self):
+        # One-off import of the old reports.json array
+        if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        with open(self.legacy_path, "r") as f:
+            records = json.load(f)
+        self._write_atomically(records)
+
+    def _refresh(self):
+        """Bring the index up to date with appends or compactions made by other processes"""
+        if not os.path.exists(self.path):
+            self._migrate_legacy()
+            if not os.path.exists(self.path):
+                self._reset_index(None)
+                return
+
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            # Compacted (or replaced) since we last looked: rebuild from the start
+            self._reset_index(stat.st_ino)
+        if stat.st_size == self._end:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._end)
+            offset = self._end
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash or an append still in progress
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if record is not None and _record_id(record):
+                    self._index_record(record, offset, len(line))
+                offset += len(line)
+            self._end = offset
+
+    def _reset_index(self, inode):
+        self._index, self._dead_records, self._end, self._inode = {}, 0, 0, inode
+        if self._text is not None:
+            self._text.clear()
+
+    def _index_record(self, record, offset, length):
+        report_id = _record_id(record)
+        if report_id in self._index:
+            self._dead_records += 1
+        if record.get("_deleted"):
+            # Tombstone: the report was removed (archived); compaction drops both lines
+            self._index.pop(report_id, None)
+            self._dead_records += 1
+            if self._text is not None:
+                self._text.remove(report_id)
+            return
+        self._index[report_id] = _IndexEntry(offset, length, record)
+        if self._text is not None:
+            self._text.add(report_id, record)
+
+    def _repair_tail(self):
+        # Drop a partial last line left by a crash so the next append starts on a fresh line
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self._end:
+            with open(self.path, "r+b") as f:
+                f.truncate(self._end)
+
+    def _read(self, entry):
+        with open(self.path, "rb") as f:
+            f.seek(entry.offset)
+            return json.loads(f.read(entry.length))
+
+    def _append(self, records):
+        self._repair_tail()
+        lines = [(json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8") for record in records]
+        with open(self.path, "ab") as f:
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+        offset = self._end
+        for record, line in zip(records, lines):
+            self._index_record(record, offset, len(line))
+            offset += len(line)
+        self._end = offset
+        if self._inode is None:
+            self._inode = os.stat(self.path).st_ino
+
+    def _write_atomically(self, records):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for record in records:
+                f.write((json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Persist the rename itself
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _maybe_compact(self):
+        if self._dead_records >= COMPACTION_MIN_DEAD_RECORDS and self._dead_records > len(self._index) * COMPACTION_RATIO:
+            self._compact()
+
+    def _compact(self):
+        records = [self._read(entry) for entry in self._sorted_entries(reverse=False)]
+        self._write_atomically(records)
+        self._reset_index(None)
+        self._refresh()
+
+    def _sorted_entries(self, reverse=True, region=None):
+        entries = self._index.values()
+        if region is not None:
+            entries = [entry for entry in entries if entry.region == region]
+        return sorted(entries, key=lambda entry: entry.created_at, reverse=reverse)
+
+    # --- Public API ---
+    def get(self, report_id):
+        """Latest version of a report, or None"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            entry = self._index.get(report_id)
+            return self._read(entry) if entry else None
+
+    def insert(self, record):
+        """Append a new report (it must carry an "id")"""
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._append([record])
+        return record
+
+    def update_many(self, updates):
+        """Apply {report_id: fields} in one append and fsync, returning the updated records by id"""
+        with self._locked(exclusive=True):
+            self._refresh()
+            updated = {}
+            for report_id, fields in updates.items():
+                entry = self._index.get(report_id)
+                if entry is None:
+                    continue
+                record = self._read(entry)
+                record.update(fields)
+                updated[report_id] = record
+            if updated:
+                self._append(list(updated.values()))
+                self._maybe_compact()
+            return updated
+
+    def delete_many(self, report_ids):
+        """Remove reports by appending tombstones in one append and fsync, returning how many existed"""
+        with self._locked(exclusive=True):
+            self._refresh()
+            existing = [report_id for report_id in report_ids if report_id in self._index]
+            if existing:
+                self._append([{"id": report_id, "_deleted": True} for report_id in existing])
+                self._maybe_compact()
+            return len(existing)
+
+    def update(self, report_id, fields):
+        """Apply fields to one report, returning the updated record or None if it does not exist"""
+        return self.update_many({report_id: fields}).get(report_id)
+
+    def list(self, limit=None, region=None):
+        """Reports ordered by creation date (newest first), optionally from one region"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            entries = self._sorted_entries(region=region)
+            if limit is not None:
+                entries = entries[:limit]
+            return [self._read(entry) for entry in entries]
+
+    def iter(self, region=None):
+        """Yield reports newest first, reading one record at a time
+
+        Only the index is sorted in memory; a compaction during iteration is picked up
+        by re-reading the entry for that id.
+        """
+        with self._locked(exclusive=False):
+            self._refresh()
+            report_ids = [
+                report_id for report_id, entry in
+                sorted(self._index.items(), key=lambda item: item[1].created_at, reverse=True)
+                if region is None or entry.region == region
+            ]
+        for report_id in report_ids:
+            record = self.get(report_id)
+            if record is not None:
+                yield record
+
+    def search(self, query, statuses=None, since=None, until=None, offset=0, limit=20, region=None):
+        """(total, [(score, record)]) of reports matching any word of query, best first
+
+        statuses filters on status, since/until (ISO strings) on createdAt and region on
+        region. Ranking and filtering use the indexes alone; only the returned page is read
+        from disk.
+        """
+        if self._text is None:
+            raise RuntimeError("ReportLog was created without text_fields")
+        with self._locked(exclusive=False):
+            self._refresh()
+            matches = []
+            for report_id, score in self._text.search(query).items():
+                entry = self._index.get(report_id)
+                if entry is None:
+                    continue
+                if statuses and entry.status not in statuses:
+                    continue
+                if region is not None and entry.region != region:
+                    continue
+                if since and entry.created_at < since:
+                    continue
+                if until and entry.created_at >= until:
+                    continue
+                matches.append((score, entry.created_at, report_id))
+            # Best score first, newest first among equal scores; only the pages up to this one are ordered
+            page = heapq.nlargest(offset + limit, matches)[offset:]
+            return len(matches), [(score, self._read(self._index[report_id])) for score, _, report_id in page]
+
+    def stats(self, region=None):
+        """Report counts by status (optionally for one region), answered from the index alone"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            stats = {"total": 0, "pending": 0, "approved": 0, "rejected": 0}
+            for entry in self._index.values():
+                if region is not None and entry.region != region:
+                    continue
+                stats["total"] += 1
+                if entry.status in stats:
+                    stats[entry.status] += 1
+            return stats
+
+    def compact(self):
+        """Rewrite the log with only the latest version of each report"""
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._compact()
@@ -0,0 +1,166 @@
+import os
+import struct
+import threading
+import time
+
+import bson
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get the in-process lock
+    fcntl = None
+
+# --- Durable Report Spool ---
+# Segment files hold length-prefixed BSON documents, so image bytes and datetimes
+# round-trip exactly. Each writer holds an exclusive lock on its open segment; any
+# segment that can be locked is finished (rotated, or left by a dead process) and
+# is safe to drain.
+SEGMENT_SUFFIX = ".bson"
+
+
+class ReportSpool:
+    """Append-only on-disk queue of reports waiting to be written to MongoDB"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_pid = None
+        self._sequence = 0
+        # Segment name -> (bytes indexed so far, {str(_id): offset}), for find
+        self._index = {}
+        self._index_lock = threading.Lock()
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        name = f"{int(time.time() * 1000)}-{os.getpid()}-{self._sequence}{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        # Lock under a temporary name first so the flusher can never grab a fresh, empty segment
+        segment = open(f"{path}.tmp", "ab")
+        if fcntl is not None:
+            fcntl.flock(segment, fcntl.LOCK_EX)
+        os.rename(f"{path}.tmp", path)
+        self._segment = segment
+        self._segment_pid = os.getpid()
+
+    def append(self, document):
+        """Write a document and fsync it; once this returns the report survives a crash"""
+        data = bson.encode(document)
+        with self._lock:
+            if self._segment is None or self._segment_pid != os.getpid():
+                # Never write through a segment inherited across fork
+                self._open_segment()
+            self._segment.write(data)
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+
+    def rotate(self):
+        """Close the current segment so the flusher can drain it"""
+        with self._lock:
+            if self._segment is not None and self._segment_pid == os.getpid() and self._segment.tell() > 0:
+                self._segment.close()
+                self._segment = None
+
+    def pending_segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+
+    def drain(self, handler, batch_size):
+        """Pass spooled documents to handler in batches, deleting each segment once it is done
+
+        handler must be idempotent: a segment is replayed from the start if the process dies
+        mid-drain. If handler raises, the segment is kept and the exception propagates.
+        Returns the number of documents handled.
+        """
+        handled = 0
+        for name in self.pending_segments():
+            path = os.path.join(self.directory, name)
+            try:
+                segment = open(path, "rb")
+            except FileNotFoundError:
+                continue  # Drained by another worker
+            with segment:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # Still being written, or drained by another worker
+                elif self._segment is not None and os.path.basename(self._segment.name) == name:
+                    continue
+
+                batch = []
+                for document in _read_documents(segment):
+                    batch.append(document)
+                    if len(batch) >= batch_size:
+                        handler(batch)
+                        handled += len(batch)
+                        batch = []
+                if batch:
+                    handler(batch)
+                    handled += len(batch)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return handled
+
+    def documents(self):
+        """Yield every document still waiting in the spool, oldest segment first"""
+        for name in self.pending_segments():
+            try:
+                segment = open(os.path.join(self.directory, name), "rb")
+            except FileNotFoundError:
+                continue  # Drained meanwhile
+            with segment:
+                yield from _read_documents(segment)
+
+    def find(self, document_ids):
+        """{str(_id): document} for those of document_ids still waiting in the spool
+
+        Segments are indexed by id as they are first read and only bytes appended since are
+        read again, so a miss costs a directory listing rather than a scan of the spool.
+        """
+        wanted = {str(document_id) for document_id in document_ids}
+        found = {}
+        with self._index_lock:
+            names = self.pending_segments()
+            for name in set(self._index) - set(names):
+                del self._index[name]  # Drained
+            for name in names:
+                try:
+                    segment = open(os.path.join(self.directory, name), "rb")
+                except FileNotFoundError:
+                    self._index.pop(name, None)
+                    continue  # Drained meanwhile
+                with segment:
+                    indexed, offsets = self._index.get(name, (0, {}))
+                    for document_id in wanted & offsets.keys():
+                        segment.seek(offsets[document_id])
+                        document = next(_read_documents(segment), None)
+                        if document is not None:
+                            found[document_id] = document
+                    segment.seek(indexed)
+                    for document in _read_documents(segment):
+                        document_id = str(document.get("_id"))
+                        offsets[document_id] = indexed
+                        indexed = segment.tell()
+                        if document_id in wanted:
+                            found[document_id] = document
+                    self._index[name] = (indexed, offsets)
+        return found
+
+def _read_documents(segment):
+    while True:
+        header = segment.read(4)
+        if len(header) < 4:
+            return
+        (length,) = struct.unpack("<i", header)
+        body = segment.read(length - 4)
+        if length < 5 or len(body) < length - 4:
+            return  # Torn write from a crash: everything before it was acknowledged
+        try:
+            yield bson.decode(header + body)
+        except Exception:
+            return
@@ -0,0 +1,109 @@
+import math
+import re
+import threading
+from collections import Counter
+
+# --- In-Memory Full-Text Index (file storage fallback) ---
+# Mirrors what the MongoDB text index does for /api/requests/search closely enough that
+# both stores rank the same reports first: lower-cased words, English stop words dropped,
+# a light suffix stemmer, terms OR'ed together and field weights applied to term counts.
+# Scores are tf-idf sums, so rare words ("market") outweigh common ones ("garbage").
+_WORD = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers him his how i if in into is it its just me more most my
+no nor not of off on once only or other our out over own same she should so some such than
+that the their them then there these they this those through to too under until up very was
+we were what when where which while who whom why will with would you your
+""".split())
+
+
+def stem(word):
+    """Strip common English inflections ("bins" -> "bin", "overflowing" -> "overflow")"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Index terms of a piece of text, in order"""
+    return [stem(word) for word in _WORD.findall((text or "").lower()) if word not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """term -> {doc_id: weighted term count}, updated one document at a time
+
+    fields maps record field names to weights. add() replaces any earlier version of the
+    document, so it can be called for every write without a separate update path.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._postings = {}
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def _terms(self, record):
+        counts = Counter()
+        for field, weight in self.fields.items():
+            value = record.get(field)
+            if isinstance(value, str):
+                for term in tokenize(value):
+                    counts[term] += weight
+        return counts
+
+    def add(self, doc_id, record):
+        terms = self._terms(record)
+        with self._lock:
+            if self._documents.get(doc_id) == terms:
+                return
+            self._remove(doc_id)
+            self._documents[doc_id] = terms
+            for term, count in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        for term in self._documents.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._documents = {}
+
+    def search(self, query):
+        """{doc_id: score} of the documents matching any term of the query"""
+        terms = set(tokenize(query))
+        scores = {}
+        with self._lock:
+            total = len(self._documents)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for doc_id, count in postings.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + (1 + math.log(count)) * idf
+        return scores
+
+    def __len__(self):
+        return len(self._documents)
@@ -0,0 +1,191 @@
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # pyinstrument is optional - cProfile is always available
+    PyinstrumentProfiler = None
+
+# --- Per-Request Stage Timings ---
+# Stages are collected in a context variable, so code anywhere in the request (and in
+# enrichment threads started through submit()) can time itself without the request
+# object. The totals go out as a Server-Timing header and one JSON log line per request.
+#
+#   TIMING_LOG_MIN_MS      only log requests slower than this (default 0: log all)
+#   PROFILE_SAMPLE_RATE    fraction of requests to profile (default 0: off)
+#   PROFILE_DEBUG_TOKEN    profile any request whose X-Debug-Profile header equals this
+#   PROFILE_DIR            where profile reports are written (default profiles/)
+TIMING_LOG_MIN_MS = float(os.getenv("TIMING_LOG_MIN_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DEBUG_TOKEN = os.getenv("PROFILE_DEBUG_TOKEN")
+PROFILE_DEBUG_HEADER = "X-Debug-Profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+logger = logging.getLogger("waste.timing")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RequestTimings:
+    """Durations (ms) and call counts per stage for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, duration_ms):
+        with self._lock:
+            total, count = self.stages.get(name, (0.0, 0))
+            self.stages[name] = (total + duration_ms, count + 1)
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        entries = []
+        with self._lock:
+            stages = list(self.stages.items())
+        for name, (duration, count) in stages:
+            entry = f"{name};dur={duration:.1f}"
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            entries.append(entry)
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+
+def begin_request():
+    """Start collecting stages for the current request, returning the reset token"""
+    return _current.set(RequestTimings())
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current request (no-op outside a request)"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def record(name, started):
+    """Record a stage that began at perf_counter() value started and ends now"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def submit(executor, name, fn, *args):
+    """Submit fn to an executor as a timed stage, carrying the request's timings into the thread"""
+    def timed():
+        with stage(name):
+            return fn(*args)
+    return executor.submit(contextvars.copy_context().run, timed)
+
+
+def log_request(timings, total_ms, method, route, status):
+    if total_ms < TIMING_LOG_MIN_MS:
+        return
+    logger.info(json.dumps({
+        "event": "request_timing",
+        "method": method,
+        "route": route,
+        "status": status,
+        "total_ms": round(total_ms, 1),
+        "stages": {name: round(duration, 1) for name, (duration, _) in timings.stages.items()},
+    }, separators=(",", ":")))
+
+
+# --- Sampled Profiling ---
+# cProfile (and sys.setprofile-based tools) allow one active profiler per process
+_profile_lock = threading.Lock()
+
+
+def is_debug_request(headers):
+    """Whether the request carries the operator's PROFILE_DEBUG_TOKEN"""
+    return bool(PROFILE_DEBUG_TOKEN) and headers.get(PROFILE_DEBUG_HEADER) == PROFILE_DEBUG_TOKEN
+
+
+def should_profile(headers):
+    if is_debug_request(headers):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def log_profile(path, method, route):
+    logger.info(json.dumps({"event": "request_profile", "method": method, "route": route, "report": path},
+                           separators=(",", ":")))
+
+
+class RequestProfiler:
+    """Profile the request thread with pyinstrument if installed, otherwise cProfile
+
+    Returns None from start() if another request is already being profiled.
+    """
+
+    def start(self):
+        if not _profile_lock.acquire(blocking=False):
+            return None
+        try:
+            if PyinstrumentProfiler is not None:
+                self._profiler = PyinstrumentProfiler()
+                self._profiler.start()
+            else:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+        except Exception:
+            _profile_lock.release()
+            return None
+        return self
+
+    def stop(self, route):
+        """Stop profiling and write the report, returning its path"""
+        try:
+            if PyinstrumentProfiler is not None:
+                self._profiler.stop()
+                report, extension = self._profiler.output_html(), "html"
+            else:
+                self._profiler.disable()
+                output = io.StringIO()
+                pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(50)
+                report, extension = output.getvalue(), "txt"
+        finally:
+            _profile_lock.release()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{slug}.{extension}")
+        with open(path, "w") as f:
+            f.write(report)
+        return path
@@ -0,0 +1,124 @@
+import os
+from io import BytesIO
+
+from flask import Request
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional - without it dimensions are not checked
+    Image = None
+
+# --- Upload Validation for Detection Requests ---
+# Everything here runs before Gemini is called, so uploads that can never be analysed
+# are rejected in milliseconds instead of costing a vision round-trip.
+#
+# Detection bodies larger than MAX_UPLOAD_BYTES are refused while they are still streaming
+# in (see UploadLimitRequest). Every other endpoint only has the much larger
+# MAX_REQUEST_BYTES, Flask's MAX_CONTENT_LENGTH set in create_app(), so report photos
+# straight from a camera are still accepted.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_TOO_LARGE_MESSAGE = f"Upload is larger than the {MAX_UPLOAD_BYTES / (1024 * 1024):.3g} MB limit"
+REQUEST_TOO_LARGE_MESSAGE = f"Request body is larger than the {MAX_REQUEST_BYTES / (1024 * 1024):.3g} MB limit"
+MIN_IMAGE_DIMENSION = int(os.getenv("MIN_IMAGE_DIMENSION", "64"))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+
+# Image types Gemini accepts inline
+SUPPORTED_MIME_TYPES = ("image/jpeg", "image/png", "image/webp", "image/heic", "image/heif")
+
+# ISO base media brands used by HEIC/HEIF photos (iPhone camera uploads)
+_HEIC_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis"}
+_HEIF_BRANDS = {b"mif1", b"msf1"}
+
+
+class UploadLimitRequest(Request):
+    """Flask request whose body limit can be lowered by the view before the body is read"""
+
+    upload_limit = None
+
+    @property
+    def max_content_length(self):
+        if self.upload_limit is not None:
+            return self.upload_limit
+        return super().max_content_length
+
+
+class InvalidUpload(Exception):
+    """An upload rejected before analysis; carries the HTTP status and extra response fields"""
+
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details or {}
+
+    def to_dict(self):
+        return {"error": self.message, **self.details}
+
+
+def sniff_image_type(data):
+    """Real MIME type from the file's magic bytes, or None if it is not a known image"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[4:8] == b"ftyp":
+        brand = data[8:12]
+        if brand in _HEIC_BRANDS:
+            return "image/heic"
+        if brand in _HEIF_BRANDS:
+            return "image/heif"
+        if brand == b"avif":
+            return "image/avif"
+    return None
+
+
+def image_dimensions(data):
+    """(width, height) read from the image header without decoding pixels, or None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(BytesIO(data)) as img:
+            return img.size
+    except Image.DecompressionBombError:
+        raise InvalidUpload("Image dimensions are too large", 413)
+    except Exception:
+        return None
+
+
+def validate_image_upload(data):
+    """Check uploaded bytes before analysis, returning (mime_type, dimensions)
+
+    Raises InvalidUpload for empty files, non-images, formats Gemini cannot read,
+    corrupt headers and images that are too small or too large. Dimensions are None
+    for formats Pillow cannot open (HEIC without a plugin).
+    """
+    if not data:
+        raise InvalidUpload("The uploaded image is empty")
+
+    mime_type = sniff_image_type(data[:32])
+    if mime_type is None:
+        raise InvalidUpload("The uploaded file is not an image", 415)
+    if mime_type not in SUPPORTED_MIME_TYPES:
+        raise InvalidUpload(
+            f"Unsupported image type {mime_type}. Use JPEG, PNG, WebP or HEIC", 415)
+
+    dimensions = image_dimensions(data)
+    if dimensions is None:
+        if mime_type in ("image/heic", "image/heif"):
+            return mime_type, None
+        if Image is not None:
+            raise InvalidUpload("The uploaded image is corrupt or truncated")
+        return mime_type, None
+
+    width, height = dimensions
+    if width < MIN_IMAGE_DIMENSION or height < MIN_IMAGE_DIMENSION:
+        raise InvalidUpload(
+            f"Image is too small ({width}x{height}); it must be at least {MIN_IMAGE_DIMENSION}px on each side")
+    if width * height > MAX_IMAGE_PIXELS:
+        raise InvalidUpload(f"Image dimensions are too large ({width}x{height})", 413)
+    return mime_type, dimensions